@@ -1,9 +1,18 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
+from src.instrumentation import profiler, timer
 from src.preprocessing import Preprocessor
-from src.skills import SkillExtractor
-from src.ranking import ResumeRanker
+from src.skills import SkillExtractor, blend_scores, has_all_skills, skill_coverage
+from src.ranking import top_k_indices
+from src.artifacts import open_corpus, open_dedup
+from src.cache import QueryCache
+from src.dense import DenseIndex, hybrid_top_k
+from src.ingest import CSV_PATH, PDF_ROOT
+
+# Candidates per page of a role's results table
+PAGE_SIZE = 10
 
 # Page Configuration
 st.set_page_config(
@@ -35,82 +44,169 @@ st.markdown("""
 # Initialize Classes (Cached)
 @st.cache_resource
 def load_resources():
-    preprocessor = Preprocessor()
+    preprocessor = Preprocessor(fast=True)
     extractor = SkillExtractor()
-    ranker = ResumeRanker()
-    return preprocessor, extractor, ranker
+    return preprocessor, extractor
 
-preprocessor, extractor, ranker = load_resources()
+preprocessor, extractor = load_resources()
 
-# Load Dataset (Cached)
-@st.cache_data
+# Load Dataset and TF-IDF index (Cached)
+# Preprocessed columns and the index are persisted under artifacts/corpus,
+# so a restart only re-reads them instead of re-running preprocessing.
+# The corpus is held compactly (IDs, category codes, skill IDs); raw resume
+# text stays memory-mapped and is only decoded for the displayed snippets
+@st.cache_resource
 def load_data():
     try:
-        df = pd.read_csv('Resume/Resume.csv')
-        # Pre-process resumes once
-        if 'Cleaned_Resume' not in df.columns:
-            df['Cleaned_Resume'] = df['Resume_str'].apply(preprocessor.clean_text)
-            df['Extracted_Skills'] = df['Resume_str'].apply(extractor.extract_skills)
-        return df
+        corpus, ranker = open_corpus()
     except FileNotFoundError:
-        return None
+        return None, None, None, None
+    # Resumes x skills boolean matrix for vectorised gap analysis
+    skill_matrix = corpus.skill_matrix()
+    # Cleaned JDs, JD vectors, scores and per-role results survive reruns
+    # (entries are dropped automatically if the index changes)
+    query_cache = QueryCache(ranker, preprocessor, extractor)
+    return corpus, ranker, skill_matrix, query_cache
 
-def process_single_role(role_title, job_description, df, top_n, selected_category):
-    # Filter by category if selected
-    filtered_df = df.copy()
-    if selected_category != 'All':
-        filtered_df = filtered_df[filtered_df['Category'] == selected_category]
-    
-    if filtered_df.empty:
-        st.warning(f"No candidates found in category: {selected_category}")
-        return
+# Dense (LSA) embeddings and their ANN index, built on first use of the
+# semantic weight and stored under artifacts/dense
+@st.cache_resource
+def load_dense_index(_ranker, fingerprint):
+    return DenseIndex.load_or_build(_ranker)
 
-    # Process JD
-    cleaned_jd = preprocessor.clean_text(job_description)
-    jd_skills = set(extractor.extract_skills(job_description))
+# Near-duplicate clusters of the corpus (MinHash/LSH), stored under artifacts/corpus
+@st.cache_resource
+def load_duplicates(_corpus, fingerprint):
+    return open_dedup(_corpus)
 
-    # Display JD Analysis
-    st.info(f"**Required Skills extracted for '{role_title}':** {', '.join(jd_skills) if jd_skills else 'No specific skills detected'}")
+def rank_role(scores, skill_matrix, mask, jd_vector, top_n, coverage_weight):
+    # Blend cosine similarity with the share of JD skills each resume has
+    with timer('app.coverage'):
+        coverage = skill_coverage(skill_matrix, jd_vector)
+        scores = np.where(mask, blend_scores(scores, coverage, coverage_weight), -np.inf)
     
-    # Rank Candidates
-    scores = ranker.score_resumes(filtered_df['Cleaned_Resume'].tolist(), cleaned_jd)
-    filtered_df['Similarity_Score'] = scores
-    
-    # Sort
-    ranked_df = filtered_df.sort_values(by='Similarity_Score', ascending=False).head(top_n)
+    # Select the top candidates without sorting the whole corpus
+    with timer('app.select_top_k'):
+        top_idx = top_k_indices(scores, top_n)
+        # Filtered-out resumes are never listed, even to fill a short page
+        top_idx = top_idx[np.isfinite(scores[top_idx])]
 
     # Identify Missing Skills
-    def get_missing(candidate_skills):
-        return list(jd_skills - set(candidate_skills))
+    _, missing = extractor.gap_analysis(skill_matrix, jd_vector, top_idx)
+    return top_idx, scores[top_idx], coverage[top_idx], missing
 
-    ranked_df['Missing_Skills'] = ranked_df['Extracted_Skills'].apply(get_missing)
-    
-    st.markdown(f"### 🏆 Top {top_n} Candidates for {role_title}")
-    
-    # Display Results
-    for i, (index, row) in enumerate(ranked_df.iterrows()):
-        score = row['Similarity_Score']
-        skills = row['Extracted_Skills']
-        missing = row['Missing_Skills']
-        
-        with st.expander(f"#{i+1} | ID: {row['ID']} | Match: {score*100:.1f}%"):
-            c1, c2 = st.columns(2)
-            with c1:
-                st.markdown(f"**Category:** {row['Category']}")
-                st.markdown(f"**✅ Matched Skills:**")
-                st.write(", ".join(skills))
-                
-            with c2:
-                    st.markdown(f"**⚠️ Missing Skills:**")
-                    if missing:
-                        st.error(", ".join(missing))
-                    else:
-                        st.success("All required skills found!")
-            
-            # Show resume preview (snippet)
-            st.divider()
-            st.caption("Resume Snippet:")
-            st.text(row['Resume_str'][:500] + "...")
+def hybrid_role_scores(ranker, dense_index, cleaned_jd, rows, top_n, semantic_weight, category, allowed):
+    # Fused lexical + dense scores of the hybrid candidates (inverted index
+    # and ANN, see hybrid_top_k) laid out over the category's `rows`; every
+    # other resume gets -inf. A few times top_n are kept so skill coverage
+    # can still reorder them.
+    top_rows, top_scores = hybrid_top_k(ranker, dense_index, cleaned_jd, 4 * top_n, semantic_weight, category,
+                                        allowed=allowed)
+    scores = np.full(len(rows), -np.inf)
+    scores[np.searchsorted(rows, top_rows)] = top_scores
+    return scores
+
+def process_single_role(role_title, job_description, cleaned_jd, rows, scores, skill_matrix, top_n,
+                        selected_category, must_have, coverage_weight, semantic_weight, query_cache, clusters=None):
+    # `rows` are the corpus rows of the selected category; `scores` and
+    # `skill_matrix` are already restricted to them. With `clusters`, only
+    # canonical resumes are ranked and their duplicates listed with them.
+    # Returns the compact ranking kept in session state (corpus rows, scores,
+    # coverage, missing skills); nothing is rendered here
+    result = {'title': role_title, 'cleaned_jd': cleaned_jd, 'warning': None}
+    if len(rows) == 0:
+        result['warning'] = f"No candidates found in category: {selected_category}"
+        return result
+
+    # Must-have skills filter (boolean mask, no copies)
+    mask = has_all_skills(skill_matrix, must_have)
+    if clusters is not None:
+        mask &= clusters.is_canonical[rows]
+    if not mask.any():
+        result['warning'] = f"No candidates found in category: {selected_category} with all must-have skills"
+        return result
+
+    # Process JD
+    jd_skills = query_cache.extract_skills(job_description)
+    jd_vector = extractor.skill_vector(jd_skills)
+
+    # Ranking and gap analysis for this JD and these settings, reused on reruns
+    key = query_cache.key(cleaned_jd, selected_category, 'role', top_n, coverage_weight, semantic_weight,
+                          clusters is not None,
+                          tuple(np.flatnonzero(must_have)), tuple(np.flatnonzero(jd_vector)))
+    top_idx, top_scores, top_coverage, missing = query_cache.results.get_or_compute(
+        key, lambda: rank_role(scores, skill_matrix, mask, jd_vector, top_n, coverage_weight))
+    result.update(jd_skills=jd_skills, rows=rows[top_idx], scores=top_scores, coverage=top_coverage,
+                  missing=missing)
+    return result
+
+def render_role_results(result, corpus, query_cache, clusters, widget_key):
+    if result['warning']:
+        st.warning(result['warning'])
+        return
+
+    jd_skills = result['jd_skills']
+    st.info(f"**Required Skills extracted for '{result['title']}':** {', '.join(jd_skills) if jd_skills else 'No specific skills detected'}")
+    st.markdown(f"### 🏆 Top {len(result['rows'])} Candidates for {result['title']}")
+
+    # One compact table per page; only IDs and categories are materialised
+    n_pages = max(1, -(-len(result['rows']) // PAGE_SIZE))
+    page = 1
+    if n_pages > 1:
+        page = st.number_input("Page", 1, n_pages, 1, key=f"page_{widget_key}")
+    ranks = np.arange((page - 1) * PAGE_SIZE, min(page * PAGE_SIZE, len(result['rows'])))
+    table = corpus.frame(result['rows'][ranks], columns=('ID', 'Category'))
+    table.insert(0, 'Rank', ranks + 1)
+    table['Match'] = [f"{score * 100:.1f}%" for score in result['scores'][ranks]]
+    if jd_skills:
+        table['Skill Coverage'] = [f"{coverage * 100:.0f}%" for coverage in result['coverage'][ranks]]
+        table['Missing Skills'] = [", ".join(result['missing'][rank]) for rank in ranks]
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+    # Details (skills, explanation, duplicates, snippet) of one candidate on request
+    rank = st.selectbox("Candidate details", ranks.tolist(), index=None, key=f"details_{widget_key}_{page}",
+                        format_func=lambda r: f"#{r + 1} | ID: {table['ID'].iloc[r - ranks[0]]}",
+                        placeholder="Select a candidate to see details")
+    if rank is not None:
+        render_candidate_details(result, rank, corpus, query_cache, clusters)
+
+def render_candidate_details(result, rank, corpus, query_cache, clusters):
+    row = result['rows'][rank]
+    candidate = corpus.frame([row]).iloc[0]
+    missing = result['missing'][rank]
+
+    with st.container(border=True):
+        st.markdown(f"**#{rank + 1} | ID: {candidate['ID']} | Match: {result['scores'][rank] * 100:.1f}%**")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown(f"**Category:** {candidate['Category']}")
+            if result['jd_skills']:
+                st.markdown(f"**Skill Coverage:** {result['coverage'][rank] * 100:.0f}%")
+            st.markdown(f"**✅ Matched Skills:**")
+            st.write(", ".join(candidate['Extracted_Skills']))
+
+        with c2:
+                st.markdown(f"**⚠️ Missing Skills:**")
+                if missing:
+                    st.error(", ".join(missing))
+                else:
+                    st.success("All required skills found!")
+
+        # Terms behind the candidate's TF-IDF score (only this row is read)
+        top_terms = query_cache.explain(result['cleaned_jd'], [row])[0]
+        if top_terms:
+            st.markdown("**🔎 Why this rank** (text-similarity points): " + ", ".join(
+                f"{term} (+{contribution * 100:.1f})" for term, contribution in top_terms))
+
+        if clusters is not None:
+            duplicate_ids = corpus.ids[clusters.duplicates(row)].tolist()
+            if duplicate_ids:
+                st.caption(f"Also submitted as: {', '.join(str(d) for d in duplicate_ids)}")
+
+        # Show resume preview (snippet)
+        st.divider()
+        st.caption("Resume Snippet:")
+        st.text(candidate['Resume_str'][:500] + "...")
 
 def main():
     st.title("📄 Candidate Shortlisting System")
@@ -127,16 +223,26 @@ def main():
         if len(st.session_state.roles) > 1:
             st.session_state.roles.pop(index)
 
-    df = load_data()
-    if df is None:
-        st.error("Dataset not found! Please ensure 'Resume/Resume.csv' exists.")
+    corpus, ranker, skill_matrix, query_cache = load_data()
+    if corpus is None:
+        st.error(f"Dataset not found! Please ensure '{CSV_PATH}' or the '{PDF_ROOT}' PDF tree exists.")
         return
 
     # Sidebar Options
     st.sidebar.header("Global Settings")
-    categories = ['All'] + sorted(df['Category'].unique().tolist())
+    categories = ['All'] + sorted(corpus.category_labels)
     selected_category = st.sidebar.selectbox("Filter by Category (Applied to all)", categories)
     top_n = st.sidebar.slider("Candidates per Role", 5, 50, 10)
+    must_have_skills = st.sidebar.multiselect("Must-have Skills (Applied to all)", extractor.vocabulary)
+    must_have = extractor.skill_vector(must_have_skills)
+    coverage_weight = st.sidebar.slider("Skill Coverage Weight", 0.0, 1.0, 0.0, 0.05,
+                                        help="Share of the score taken from the fraction of JD skills a resume has")
+    semantic_weight = st.sidebar.slider("Semantic Match Weight", 0.0, 1.0, 0.0, 0.05,
+                                        help="Share of the similarity taken from dense (LSA) embeddings, "
+                                             "which also match related terms")
+    collapse_duplicates = st.sidebar.checkbox("Collapse Near-Duplicate Resumes", value=True,
+                                              help="Show re-submissions and template clones once, under the first copy")
+    show_timings = st.sidebar.checkbox("Show Stage Timings", value=False)
 
     # Role Input Section
     st.subheader("1. Define Roles")
@@ -165,22 +271,82 @@ def main():
     st.subheader("2. Analysis")
     analyze_btn = st.button("🔍 Shortlist Candidates for ALL Roles", type="primary")
 
+    # Filter out empty roles
+    valid_roles = [r for r in st.session_state.roles if r['description'].strip()]
+    # Everything the rankings depend on; other widget edits (pages, detail
+    # selection, stage timings) rerun the script without re-ranking
+    inputs = (tuple((r['title'], r['description']) for r in valid_roles), selected_category, top_n,
+              tuple(must_have_skills), coverage_weight, semantic_weight, collapse_duplicates)
+
     if analyze_btn:
-        # Filter out empty roles
-        valid_roles = [r for r in st.session_state.roles if r['description'].strip()]
-        
         if not valid_roles:
             st.warning("⚠️ Please enter at least one job description.")
-            return
-
-        with st.spinner('Analyzing resumes for all roles...'):
-            # Use tabs to display results for each role
-            role_titles = [r['title'] for r in valid_roles]
-            tabs = st.tabs(role_titles)
-            
-            for tab, role in zip(tabs, valid_roles):
+        elif st.session_state.get('results', {}).get('inputs') != inputs:
+            # The profiler is process-wide, so timings cover this run only
+            # when one session is analysing at a time
+            profiler.enabled = show_timings
+            profiler.reset()
+
+            with st.spinner('Analyzing resumes for all roles...'):
+                # Score every role in one sparse matrix product, restricted to
+                # the category's rows (a zero-copy slice of the shared index)
+                cleaned_jds = [query_cache.clean_text(r['description']) for r in valid_roles]
+                rows = ranker.category_rows(selected_category)
+                clusters = load_duplicates(corpus, ranker.fingerprint) if collapse_duplicates else None
+                if semantic_weight > 0:
+                    # Only the ANN and inverted-index candidates are scored,
+                    # restricted up front to the resumes that can be listed
+                    dense_index = load_dense_index(ranker, ranker.fingerprint)
+                    allowed = None
+                    if must_have.any():
+                        allowed = has_all_skills(skill_matrix, must_have)
+                    if clusters is not None:
+                        allowed = clusters.is_canonical if allowed is None else allowed & clusters.is_canonical
+                    role_scores = [
+                        hybrid_role_scores(ranker, dense_index, cleaned_jd, rows, top_n, semantic_weight,
+                                           selected_category, allowed)
+                        for cleaned_jd in cleaned_jds
+                    ]
+                else:
+                    role_scores = query_cache.score_many(cleaned_jds, selected_category)
+                category_skills = skill_matrix if selected_category == 'All' else skill_matrix[rows]
+
+                role_results = [
+                    process_single_role(role['title'], role['description'], cleaned_jd, rows, scores,
+                                        category_skills, top_n, selected_category, must_have, coverage_weight,
+                                        semantic_weight, query_cache, clusters)
+                    for role, cleaned_jd, scores in zip(valid_roles, cleaned_jds, role_scores)
+                ]
+            # Kept across reruns; `run` gives each analysis fresh page/detail widgets
+            run = st.session_state.get('results', {}).get('run', 0) + 1
+            st.session_state.results = {'inputs': inputs, 'roles': role_results, 'clusters': clusters, 'run': run}
+
+    results = st.session_state.get('results')
+    if results:
+        if results['inputs'] != inputs:
+            st.info("Roles or settings changed since this shortlist. Click the button above to update it.")
+        # Use tabs to display results for each role
+        tabs = st.tabs([result['title'] for result in results['roles']])
+        with timer('app.render'):
+            for i, (tab, result) in enumerate(zip(tabs, results['roles'])):
                 with tab:
-                    process_single_role(role['title'], role['description'], df, top_n, selected_category)
+                    render_role_results(result, corpus, query_cache, results['clusters'], f"{results['run']}_{i}")
+
+    results_stats = query_cache.results.stats()
+    st.sidebar.caption(f"Query cache: {results_stats['hit_rate']:.0%} hit rate "
+                       f"({results_stats['entries']} results cached)")
+    if show_timings and results:
+        render_timings(query_cache)
+
+def render_timings(query_cache):
+    snapshot = profiler.snapshot()
+    with st.expander("⏱️ Stage Timings", expanded=True):
+        timings = pd.DataFrame.from_dict(snapshot['timings'], orient='index')
+        if not timings.empty:
+            st.dataframe(timings.sort_values('total_s', ascending=False))
+        st.json({**snapshot['counters'], **snapshot['gauges']})
+        st.caption("Query cache")
+        st.dataframe(pd.DataFrame.from_dict(query_cache.stats(), orient='index'))
 
 if __name__ == "__main__":
     main()
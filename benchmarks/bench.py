@@ -0,0 +1,636 @@
+"""
+Benchmark harness for the shortlisting pipeline.
+
+Runs offline on the bundled PDF corpus (data/data) plus synthetic corpora
+resampled from it, and writes machine-readable JSON:
+
+    python benchmarks/bench.py run --sizes 10000,100000 --output bench.json
+    python benchmarks/bench.py run --sizes 1000000 --dense   (adds dense/hybrid retrieval)
+    python benchmarks/bench.py compare bench.json benchmarks/baseline.json
+    python benchmarks/bench.py startup --budget-ms 300
+    python benchmarks/bench.py features --output features.json
+    python benchmarks/bench.py scorers --sizes 100000
+    python benchmarks/bench.py shards --sizes 100000 --shards 1,2,4
+
+`compare` exits with status 1 if any metric regressed by more than the
+tolerance against the baseline, `startup` if `cli_main.py --help` takes
+longer than the import-time budget. `features` compares the hashing
+feature modes with the fitted TF-IDF vocabulary on the bundled corpus,
+`scorers` the BM25/BM25F backends with cosine scoring, `shards` the
+multi-process scatter-gather index with the in-process ranker.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from src.ingest import load_resumes  # noqa: E402
+from src.pipeline import preprocess_corpus  # noqa: E402
+from src.preprocessing import Preprocessor  # noqa: E402
+from src.bm25 import BM25Ranker  # noqa: E402
+from src.ranking import ResumeRanker, top_k_indices  # noqa: E402
+from src.skills import SkillExtractor  # noqa: E402
+
+# Modules that `cli_main.py --help` and a bare import of src must not load
+HEAVY_MODULES = ('nltk', 'sklearn', 'streamlit')
+
+# Metrics where a larger value is better; all others are lower-is-better
+HIGHER_IS_BETTER = ('docs_per_sec', 'queries_per_sec', 'requests_per_sec', 'recall_at_10',
+                    'overlap_at_10', 'overlap_at_50', 'precision_at_10', 'matches_in_process')
+
+# Feature modes compared by `features` (ResumeRanker keyword arguments)
+FEATURE_CONFIGS = {
+    'tfidf_5000': {},
+    'hashing_2^18': {'features': 'hashing', 'n_features': 2 ** 18},
+    'hashing_2^20_bigrams': {'features': 'hashing', 'n_features': 2 ** 20, 'ngram_range': (1, 2)},
+}
+
+JOB_DESCRIPTIONS = [
+    "Data Scientist with Python, SQL, machine learning and deep learning experience. TensorFlow or PyTorch a plus.",
+    "Senior accountant to manage general ledger, reconciliations, audits, tax filings and financial reporting in Excel.",
+    "Executive chef to lead kitchen staff, plan menus, control food cost and maintain sanitation standards.",
+    "Registered nurse providing patient care, medication administration and care plan documentation.",
+    "Sales manager driving revenue growth, client relationships, negotiation and team leadership.",
+    "Teacher to plan curriculum, deliver lessons, assess students and communicate with parents.",
+    "Java backend developer with Spring Boot, REST APIs, Docker, Kubernetes and AWS.",
+    "HR generalist for recruiting, onboarding, benefits administration and employee relations.",
+    "Civil engineer for construction project management, AutoCAD drawings and site inspections.",
+    "Digital marketing specialist for SEO, social media campaigns, analytics and content creation.",
+    "Business development executive to generate leads, prepare proposals and close partnerships.",
+    "Graphic designer skilled in Adobe Photoshop, Illustrator, branding and layout design.",
+    "Financial analyst for budgeting, forecasting, variance analysis and Power BI dashboards.",
+    "Automotive technician to diagnose engines, perform maintenance and repair vehicles.",
+    "Aviation maintenance technician for aircraft inspections, FAA compliance and repairs.",
+    "Banking operations officer for loans, compliance, KYC and customer account servicing.",
+    "Fitness trainer designing workout programs, nutrition plans and group classes.",
+    "Public relations manager for media relations, press releases and crisis communication.",
+    "Agricultural specialist for crop management, irrigation planning and soil analysis.",
+    "Legal advocate for litigation, contract drafting, legal research and client counseling.",
+]
+
+
+# Bundled category each JOB_DESCRIPTIONS entry is looking for (relevance labels)
+JD_CATEGORIES = [
+    'INFORMATION-TECHNOLOGY', 'ACCOUNTANT', 'CHEF', 'HEALTHCARE', 'SALES', 'TEACHER',
+    'INFORMATION-TECHNOLOGY', 'HR', 'CONSTRUCTION', 'DIGITAL-MEDIA', 'BUSINESS-DEVELOPMENT',
+    'DESIGNER', 'FINANCE', 'AUTOMOBILE', 'AVIATION', 'BANKING', 'FITNESS', 'PUBLIC-RELATIONS',
+    'AGRICULTURE', 'ADVOCATE',
+]
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None where
+    the resource module is unavailable, e.g. on Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def synthetic_corpus(texts, size, seed=0):
+    """
+    Builds `size` documents by stitching together line-sized fragments
+    of randomly chosen source documents, so vocabulary and length
+    distributions follow the bundled corpus without exact duplicates.
+    """
+    rng = random.Random(seed)
+    fragments = [[line for line in text.split('\n') if line.strip()] or [text] for text in texts]
+    corpus = []
+    for _ in range(size):
+        base = fragments[rng.randrange(len(fragments))]
+        other = fragments[rng.randrange(len(fragments))]
+        lines = base + rng.sample(other, min(len(other), max(1, len(base) // 4)))
+        rng.shuffle(lines)
+        corpus.append('\n'.join(lines))
+    return corpus
+
+
+def synthetic_cleaned(cleaned, size, seed=0):
+    """
+    Same idea on already cleaned text (tokens instead of lines), used for
+    the large index/query sizes where cleaning every document would
+    dominate the run.
+    """
+    rng = random.Random(seed)
+    tokenized = [text.split() for text in cleaned if text]
+    corpus = []
+    for _ in range(size):
+        base = tokenized[rng.randrange(len(tokenized))]
+        other = tokenized[rng.randrange(len(tokenized))]
+        tokens = base + rng.sample(other, min(len(other), max(1, len(base) // 4)))
+        rng.shuffle(tokens)
+        corpus.append(' '.join(tokens))
+    return corpus
+
+
+def throughput(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    return len(items) / elapsed if elapsed > 0 else float('inf')
+
+
+def latency_stats(func, repeats):
+    # One untimed call so lazily built structures (e.g. the inverted index) are excluded
+    func()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+    }
+
+
+def bench_preprocessing(raw_texts, sample):
+    docs = raw_texts[:sample]
+    nltk_preprocessor = Preprocessor(fast=False)
+    fast_preprocessor = Preprocessor(fast=True)
+    extractor = SkillExtractor()
+
+    start = time.perf_counter()
+    preprocess_corpus(docs, progress=False)
+    pipeline_elapsed = time.perf_counter() - start
+
+    return {
+        'docs': len(docs),
+        'clean_text_nltk_docs_per_sec': throughput(nltk_preprocessor.clean_text, docs),
+        'clean_text_fast_docs_per_sec': throughput(fast_preprocessor.clean_text, docs),
+        'extract_skills_docs_per_sec': throughput(extractor.extract_skills, docs),
+        'preprocess_corpus_docs_per_sec': len(docs) / pipeline_elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_dense(ranker, cleaned_jds, repeats):
+    from src.dense import DenseIndex, hybrid_top_k
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        dense_index = DenseIndex.build(ranker, directory)
+        build_elapsed = time.perf_counter() - start
+
+        queries = dense_index.embed_queries(cleaned_jds)
+        # Share of the exact dense top 10 that the ANN search returns
+        exact = dense_index.score_many(queries)
+        recall = np.mean([
+            len(set(dense_index.search(query, 10)[0]) & set(np.argsort(-row)[:10])) / 10
+            for query, row in zip(queries, exact)
+        ])
+        del exact
+
+        jd = cleaned_jds[0]
+        results = {
+            'build_docs_per_sec': ranker.resume_matrix.shape[0] / build_elapsed,
+            'lists': dense_index.n_lists,
+            'recall_at_10': float(recall),
+            'search_single': latency_stats(
+                lambda: dense_index.search(dense_index.embed_queries([jd])[0], 10), repeats),
+            'hybrid_top_k_single': latency_stats(
+                lambda: hybrid_top_k(ranker, dense_index, jd, 10, 0.5), repeats),
+        }
+        del dense_index
+    return results
+
+
+def bench_ranking(cleaned, cleaned_jds, repeats, categories=None, dense=False):
+    start = time.perf_counter()
+    ranker = ResumeRanker().fit(cleaned, categories)
+    build_elapsed = time.perf_counter() - start
+
+    jd = cleaned_jds[0]
+    results = {
+        'docs': len(cleaned),
+        'nnz': int(ranker.resume_matrix.nnz),
+        'index_build_docs_per_sec': len(cleaned) / build_elapsed,
+        'score_single': latency_stats(lambda: ranker.score(jd), repeats),
+        'top_k_single': latency_stats(lambda: ranker.top_k(jd, 10), repeats),
+        'score_many_20_roles': latency_stats(lambda: ranker.score_many(cleaned_jds), max(1, repeats // 5)),
+    }
+    if categories is not None:
+        results['top_k_many_20_roles'] = latency_stats(
+            lambda: ranker.top_k_many(cleaned_jds, 10), max(1, repeats // 5))
+    if dense:
+        results['dense'] = bench_dense(ranker, cleaned_jds, repeats)
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def run(args):
+    print("Loading bundled corpus...", file=sys.stderr)
+    df = load_resumes()
+    raw_texts = [text if isinstance(text, str) else '' for text in df['Resume_str']]
+    categories = df['Category'].astype(str).tolist()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'bundled_docs': len(raw_texts),
+        },
+        'results': {},
+    }
+
+    print("Benchmarking preprocessing...", file=sys.stderr)
+    report['results']['preprocessing'] = bench_preprocessing(raw_texts, args.preprocess_sample)
+
+    cleaned, _ = preprocess_corpus(raw_texts, progress=False)
+    preprocessor = Preprocessor(fast=True)
+    cleaned_jds = [preprocessor.clean_text(jd) for jd in JOB_DESCRIPTIONS]
+
+    print("Benchmarking ranking on the bundled corpus...", file=sys.stderr)
+    report['results']['ranking_bundled'] = bench_ranking(cleaned, cleaned_jds, args.repeats, categories, args.dense)
+
+    for size in args.sizes:
+        print(f"Benchmarking ranking on {size} synthetic resumes...", file=sys.stderr)
+        synthetic = synthetic_cleaned(cleaned, size, seed=size)
+        rng = random.Random(size)
+        synthetic_categories = [rng.choice(categories) for _ in range(size)]
+        report['results'][f'ranking_{size}'] = bench_ranking(
+            synthetic, cleaned_jds, args.repeats, synthetic_categories, args.dense)
+        del synthetic
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+def category_precision(ranker, cleaned, categories, n_queries=200, k=10, seed=0):
+    """
+    Labeled relevance check on the bundled categories: sampled resumes
+    are used as queries, and a neighbour counts as relevant when it has
+    the query's category. Returns the mean precision@k (the query resume
+    itself excluded).
+    """
+    categories = np.asarray(categories)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(cleaned), min(n_queries, len(cleaned)), replace=False)
+    scores = ranker.score_many([cleaned[q] for q in queries])
+    scores[np.arange(len(queries)), queries] = -np.inf
+    return float(np.mean([
+        np.mean(categories[top] == categories[q])
+        for q, top in zip(queries, top_k_indices(scores, k))
+    ]))
+
+
+def jd_category_precision(ranker, cleaned_jds, categories, k=10):
+    """
+    Share of each benchmark JD's top-k resumes in its labeled category
+    (JD_CATEGORIES), averaged over the JDs.
+    """
+    categories = np.asarray(categories)
+    tops = top_k_indices(ranker.score_many(cleaned_jds), k)
+    return float(np.mean([np.mean(categories[top] == label) for top, label in zip(tops, JD_CATEGORIES)]))
+
+
+def _query_latency(ranker, cleaned_jds, repeats):
+    jd = cleaned_jds[0]
+    return {
+        'score_single': latency_stats(lambda: ranker.score(jd), repeats),
+        'top_k_single': latency_stats(lambda: ranker.top_k(jd, 10), repeats),
+        'score_many_20_roles': latency_stats(lambda: ranker.score_many(cleaned_jds), max(1, repeats // 5)),
+    }
+
+
+def scorers(args):
+    """
+    Cosine vs BM25 vs BM25F (skills field): build speed, query latency
+    and the labeled relevance checks on the bundled corpus, plus latency
+    on synthetic corpora of --sizes.
+    """
+    print("Loading and preprocessing bundled corpus...", file=sys.stderr)
+    df = load_resumes()
+    raw_texts = [text if isinstance(text, str) else '' for text in df['Resume_str']]
+    categories = df['Category'].astype(str).tolist()
+    cleaned, skills = preprocess_corpus(raw_texts, workers=args.workers, progress=False)
+    preprocessor = Preprocessor(fast=True)
+    cleaned_jds = [preprocessor.clean_text(jd) for jd in JOB_DESCRIPTIONS]
+
+    builders = {
+        'cosine': lambda texts, found: ResumeRanker().fit(texts),
+        'bm25': lambda texts, found: BM25Ranker().fit(texts),
+        'bm25f_skills': lambda texts, found: BM25Ranker().fit(texts, skills=found),
+    }
+    results = {}
+    for name, build in builders.items():
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        ranker = build(cleaned, skills)
+        build_elapsed = time.perf_counter() - start
+        results[name] = {
+            'index_build_docs_per_sec': len(cleaned) / build_elapsed,
+            'jd_precision_at_10': jd_category_precision(ranker, cleaned_jds, categories),
+            'precision_at_10': category_precision(ranker, cleaned, categories),
+            **_query_latency(ranker, cleaned_jds, args.repeats),
+        }
+
+    for size in args.sizes:
+        synthetic = synthetic_cleaned(cleaned, size, seed=size)
+        for name in ('cosine', 'bm25'):
+            print(f"Benchmarking {name} on {size} synthetic resumes...", file=sys.stderr)
+            ranker = builders[name](synthetic, None)
+            results[f'{name}_{size}'] = _query_latency(ranker, cleaned_jds, args.repeats)
+        del synthetic
+
+    print(f"{'scorer':16}{'jd_precision_at_10':>20}{'precision_at_10':>18}{'top_k p50 ms':>14}{'score p50 ms':>14}")
+    for name, metrics in results.items():
+        print(f"{name:16}{metrics.get('jd_precision_at_10', float('nan')):20.3f}"
+              f"{metrics.get('precision_at_10', float('nan')):18.3f}"
+              f"{metrics['top_k_single']['p50_ms']:14.2f}{metrics['score_single']['p50_ms']:14.2f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'python': platform.python_version(), 'docs': len(cleaned)},
+                       'results': {'scorers': results}}, f, indent=2)
+
+
+def _overlap(tops, reference_tops):
+    return float(np.mean([len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(tops, reference_tops)]))
+
+
+def features(args):
+    """
+    Index build speed, size and ranking quality of each feature mode.
+    Quality is measured as top-k overlap with the fitted TF-IDF ranking
+    for the benchmark JDs, and as category precision@10.
+    """
+    print("Loading and preprocessing bundled corpus...", file=sys.stderr)
+    df = load_resumes()
+    raw_texts = [text if isinstance(text, str) else '' for text in df['Resume_str']]
+    categories = df['Category'].astype(str).tolist()
+    cleaned, _ = preprocess_corpus(raw_texts, workers=args.workers, progress=False)
+    preprocessor = Preprocessor(fast=True)
+    cleaned_jds = [preprocessor.clean_text(jd) for jd in JOB_DESCRIPTIONS]
+
+    results, reference = {}, None
+    for name, config in FEATURE_CONFIGS.items():
+        print(f"Building {name}...", file=sys.stderr)
+        start = time.perf_counter()
+        ranker = ResumeRanker(**config, workers=args.workers).fit(cleaned)
+        build_elapsed = time.perf_counter() - start
+
+        jd_scores = ranker.score_many(cleaned_jds)
+        tops = {k: top_k_indices(jd_scores, k) for k in (10, 50)}
+        if reference is None:
+            reference = tops
+        matrix = ranker.resume_matrix
+        results[name] = {
+            'index_build_docs_per_sec': len(cleaned) / build_elapsed,
+            'nnz': int(matrix.nnz),
+            'index_mb': (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1e6,
+            'overlap_at_10': _overlap(tops[10], reference[10]),
+            'overlap_at_50': _overlap(tops[50], reference[50]),
+            'precision_at_10': category_precision(ranker, cleaned, categories),
+            'score_many_20_roles': latency_stats(lambda: ranker.score_many(cleaned_jds), args.repeats),
+        }
+
+    columns = ('index_build_docs_per_sec', 'index_mb', 'overlap_at_10', 'overlap_at_50', 'precision_at_10')
+    print(f"{'mode':24}" + ''.join(f"{column:>26}" for column in columns))
+    for name, metrics in results.items():
+        print(f"{name:24}" + ''.join(f"{metrics[column]:26.3f}" for column in columns))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'python': platform.python_version(), 'docs': len(cleaned)},
+                       'results': {'features': results}}, f, indent=2)
+
+
+def shards(args):
+    """
+    Top-10 throughput of the sharded multi-process index (see
+    src/sharding.py) against the in-process ranker, for 20-role batches
+    and single queries on synthetic corpora of --sizes. Also checks that
+    the merged top-k lists equal the in-process ones.
+    """
+    from src.sharding import ShardedIndex, ShardPool
+
+    print("Loading and preprocessing bundled corpus...", file=sys.stderr)
+    df = load_resumes()
+    raw_texts = [text if isinstance(text, str) else '' for text in df['Resume_str']]
+    cleaned, _ = preprocess_corpus(raw_texts, workers=args.workers, progress=False)
+    preprocessor = Preprocessor(fast=True)
+    cleaned_jds = [preprocessor.clean_text(jd) for jd in JOB_DESCRIPTIONS]
+    batches = max(1, args.repeats // 5)
+
+    def measure(top_k_many):
+        batch = latency_stats(lambda: top_k_many(cleaned_jds), batches)
+        return {
+            'queries_per_sec': len(cleaned_jds) * 1000 / batch['p50_ms'],
+            'top_k_20_roles': batch,
+            'top_k_single': latency_stats(lambda: top_k_many(cleaned_jds[:1]), args.repeats),
+        }
+
+    results = {}
+    for size in args.sizes:
+        print(f"Indexing {size} synthetic resumes...", file=sys.stderr)
+        ranker = ResumeRanker().fit(synthetic_cleaned(cleaned, size, seed=size))
+        jd_matrix = ranker.vectorizer.transform(cleaned_jds)
+
+        def in_process(jds):
+            # Exact top-k from one sparse product, as the service does
+            scores = ranker.score_many(jds)
+            return [(top, row[top]) for row, top in zip(scores, top_k_indices(scores, 10))]
+
+        reference = in_process(cleaned_jds)
+        results[f'in_process_{size}'] = measure(in_process)
+        for n_shards in args.shards:
+            print(f"Benchmarking {n_shards} shards on {size} resumes...", file=sys.stderr)
+            with tempfile.TemporaryDirectory() as directory:
+                index = ShardedIndex.build(ranker, n_shards, directory)
+                with ShardPool(index, ranker.vectorizer) as coordinator:
+                    merged = coordinator.top_k_vectors(jd_matrix, 10)
+                    results[f'shards_{n_shards}_{size}'] = {
+                        **measure(lambda jds: coordinator.top_k_many(jds, 10)),
+                        # Shards drop zero scores, as ResumeRanker.top_k does
+                        'matches_in_process': all(np.array_equal(a[0], b[0][b[1] > 0])
+                                                  for a, b in zip(merged, reference)),
+                    }
+        del ranker
+
+    print(f"{'index':24}{'queries/s (batch)':>20}{'single p50 ms':>16}{'single p99 ms':>16}")
+    for name, metrics in results.items():
+        print(f"{name:24}{metrics['queries_per_sec']:20.1f}{metrics['top_k_single']['p50_ms']:16.2f}"
+              f"{metrics['top_k_single']['p99_ms']:16.2f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'python': platform.python_version(), 'cpus': os.cpu_count()},
+                       'results': {'shards': results}}, f, indent=2)
+
+
+def _subprocess_ms(command, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def startup(args):
+    """
+    Cold-start cost of the CLI and of importing the src modules, each in
+    a fresh interpreter (median of --repeats runs).
+    """
+    python = sys.executable
+    check = (
+        "import sys, cli_main, src.preprocessing, src.skills, src.ranking, src.artifacts; "
+        f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]; "
+        "print(','.join(loaded))"
+    )
+    loaded = subprocess.run([python, '-c', check], cwd=REPO_ROOT, check=True,
+                            capture_output=True, text=True).stdout.strip()
+    results = {
+        'interpreter_ms': _subprocess_ms([python, '-c', 'pass'], args.repeats),
+        'cli_help_ms': _subprocess_ms([python, 'cli_main.py', '--help'], args.repeats),
+    }
+    for module in ('src.preprocessing', 'src.skills', 'src.ranking', 'src.artifacts'):
+        results[f'import_{module.split(".")[-1]}_ms'] = _subprocess_ms([python, '-c', f'import {module}'], args.repeats)
+
+    for name, value in results.items():
+        print(f"{name:30} {value:10.1f} ms")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'python': platform.python_version()}, 'results': {'startup': results}}, f, indent=2)
+
+    status = 0
+    if loaded:
+        print(f"Heavy modules imported on startup: {loaded}")
+        status = 1
+    if results['cli_help_ms'] > args.budget_ms:
+        print(f"cli_main.py --help took {results['cli_help_ms']:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        status = 1
+    return status
+
+
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + '.'))
+        elif isinstance(value, bool):
+            # Correctness flags stay booleans for compare()
+            flat[name] = value
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(args):
+    with open(args.current) as f:
+        current = _flatten(json.load(f)['results'])
+    with open(args.baseline) as f:
+        baseline = _flatten(json.load(f)['results'])
+
+    regressions = []
+    for name in sorted(set(current) & set(baseline)):
+        if name.endswith(('.docs', '.nnz', '.requests', '.concurrency', '.lists')):
+            continue
+        old, new = baseline[name], current[name]
+        if isinstance(old, bool) or isinstance(new, bool):
+            # A correctness flag that stops holding is a regression at any tolerance
+            status = 'REGRESSION' if old and not new else 'ok'
+            if status != 'ok':
+                regressions.append(name)
+            print(f"{status:10} {name:60} {str(old):>12} -> {str(new):>12}")
+            continue
+        if old == 0:
+            continue
+        change = (new - old) / old
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        status = 'REGRESSION' if worse > args.tolerance else 'ok'
+        if status != 'ok':
+            regressions.append(name)
+        print(f"{status:10} {name:60} {old:12.3f} -> {new:12.3f} ({change:+.1%})")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed (numeric tolerance {args.tolerance:.0%})")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks and write JSON results')
+    run_parser.add_argument('--sizes', default='10000,100000',
+                            type=lambda s: [int(x) for x in s.split(',') if x],
+                            help='Synthetic corpus sizes, e.g. 10000,100000,1000000')
+    run_parser.add_argument('--repeats', type=int, default=50, help='Queries per latency measurement')
+    run_parser.add_argument('--preprocess-sample', type=int, default=500,
+                            help='Resumes used for the preprocessing throughput numbers')
+    run_parser.add_argument('--dense', action='store_true',
+                            help='Also build a dense (LSA + IVF) index per corpus and time ANN/hybrid search')
+    run_parser.add_argument('--output', default='bench_results.json')
+
+    compare_parser = commands.add_parser('compare', help='Compare results against a baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--tolerance', type=float, default=0.10,
+                                help='Allowed relative slowdown before a metric is flagged')
+
+    startup_parser = commands.add_parser('startup', help='Measure CLI and import start-up time against a budget')
+    startup_parser.add_argument('--repeats', type=int, default=5)
+    startup_parser.add_argument('--budget-ms', type=float, default=300.0,
+                                help='Maximum median wall time of cli_main.py --help')
+    startup_parser.add_argument('--output', help='Optional JSON file for compare')
+
+    features_parser = commands.add_parser('features', help='Compare hashing and TF-IDF feature modes')
+    features_parser.add_argument('--workers', type=int, help='Processes for preprocessing and hashing')
+    features_parser.add_argument('--repeats', type=int, default=10)
+    features_parser.add_argument('--output', help='Optional JSON file for compare')
+
+    scorers_parser = commands.add_parser('scorers', help='Compare BM25/BM25F with cosine scoring')
+    scorers_parser.add_argument('--sizes', default='', type=lambda s: [int(x) for x in s.split(',') if x],
+                                help='Synthetic corpus sizes for the latency comparison')
+    scorers_parser.add_argument('--workers', type=int, help='Preprocessing processes')
+    scorers_parser.add_argument('--repeats', type=int, default=50)
+    scorers_parser.add_argument('--output', help='Optional JSON file for compare')
+
+    shards_parser = commands.add_parser('shards', help='Compare the sharded multi-process index with one process')
+    shards_parser.add_argument('--sizes', default='100000', type=lambda s: [int(x) for x in s.split(',') if x],
+                               help='Synthetic corpus sizes')
+    shards_parser.add_argument('--shards', default=f'1,{os.cpu_count() or 1}',
+                               type=lambda s: sorted({int(x) for x in s.split(',') if x}),
+                               help='Shard (worker process) counts to compare')
+    shards_parser.add_argument('--workers', type=int, help='Preprocessing processes')
+    shards_parser.add_argument('--repeats', type=int, default=50)
+    shards_parser.add_argument('--output', help='Optional JSON file for compare')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'features':
+        features(args)
+    elif args.command == 'scorers':
+        scorers(args)
+    elif args.command == 'shards':
+        shards(args)
+    elif args.command == 'startup':
+        sys.exit(startup(args))
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Load generator for the /rank service (src/service.py).
+
+Opens --concurrency keep-alive connections, each sending POST /rank
+requests back to back, and reports throughput and latency percentiles.
+
+Every request sends fresh job descriptions (one from bench.py plus a few
+random words from the others), so the service's query cache cannot
+answer it. With --repeat-fraction, that share of requests instead
+resends a recently completed request's JDs; their latencies are
+reported separately as cache hits, the fresh ones as misses:
+
+    python -m src.service --port 8000 &
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --requests 2000 --concurrency 32
+
+Start the service with --no-cache to measure uncached scoring even for
+repeated JDs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench import JOB_DESCRIPTIONS  # noqa: E402
+
+# Words appended to make each JD unique (and a cache miss)
+VOCABULARY = sorted({word for jd in JOB_DESCRIPTIONS for word in re.findall(r'[a-z]{4,}', jd.lower())})
+# Repeats are drawn from this many of the latest requests, well inside the service's LRU bound
+RECENT = 64
+
+
+async def _post(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+class _Workload:
+    """
+    JD payloads shared by all clients: fresh unique JDs, or resends of
+    recently completed requests with probability repeat_fraction.
+    """
+
+    def __init__(self, jds_per_request, repeat_fraction):
+        self.jds_per_request = jds_per_request
+        self.repeat_fraction = repeat_fraction
+        self.seen = set()
+        self.recent = []
+
+    def next(self, rng):
+        if self.recent and rng.random() < self.repeat_fraction:
+            return rng.choice(self.recent), True
+        jds = []
+        while len(jds) < self.jds_per_request:
+            jd = f"{rng.choice(JOB_DESCRIPTIONS)} {' '.join(rng.sample(VOCABULARY, 6))}"
+            if jd not in self.seen:
+                self.seen.add(jd)
+                jds.append(jd)
+        return jds, False
+
+    def done(self, jds):
+        self.recent.append(jds)
+        if len(self.recent) > RECENT:
+            self.recent.pop(0)
+
+
+async def _client(url, n_requests, k, workload, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        for _ in range(n_requests):
+            jds, repeat = workload.next(rng)
+            start = time.perf_counter()
+            status = await _post(reader, writer, url.netloc, '/rank', {'job_descriptions': jds, 'k': k})
+            latencies['hit' if repeat else 'miss'].append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                errors.append(status)
+            elif not repeat:
+                workload.done(jds)
+    finally:
+        writer.close()
+
+
+def _percentiles(prefix, latencies):
+    if not latencies:
+        return {}
+    return {
+        f'{prefix}p50_ms': float(np.percentile(latencies, 50)),
+        f'{prefix}p95_ms': float(np.percentile(latencies, 95)),
+        f'{prefix}p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+async def run_load(args):
+    url = urlparse(args.url)
+    latencies, errors = {'hit': [], 'miss': []}, []
+    workload = _Workload(args.jds_per_request, args.repeat_fraction)
+    per_client = [args.requests // args.concurrency] * args.concurrency
+    for i in range(args.requests % args.concurrency):
+        per_client[i] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(url, n, args.k, workload, latencies, errors, seed)
+        for seed, n in enumerate(per_client) if n
+    ))
+    elapsed = time.perf_counter() - start
+
+    all_latencies = latencies['hit'] + latencies['miss']
+    return {
+        'requests': len(all_latencies),
+        'errors': len(errors),
+        'concurrency': args.concurrency,
+        'requests_per_sec': len(all_latencies) / elapsed,
+        'queries_per_sec': len(all_latencies) * args.jds_per_request / elapsed,
+        **_percentiles('', all_latencies),
+        'max_ms': float(np.max(all_latencies)),
+        'miss_requests': len(latencies['miss']),
+        **_percentiles('miss_', latencies['miss']),
+        'hit_requests': len(latencies['hit']),
+        **_percentiles('hit_', latencies['hit']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--jds-per-request', type=int, default=1)
+    parser.add_argument('--repeat-fraction', type=float, default=0.0,
+                        help='Share of requests resending recent JDs (expected cache hits), 0-1')
+    parser.add_argument('--output', help='Optional JSON file (readable by bench.py compare)')
+    args = parser.parse_args()
+    if not 0.0 <= args.repeat_fraction <= 1.0:
+        parser.error("--repeat-fraction must be between 0 and 1")
+
+    results = asyncio.run(run_load(args))
+    for name, value in results.items():
+        print(f"{name:20} {value:12.2f}" if isinstance(value, float) else f"{name:20} {value:12}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': {'service': results}}, f, indent=2)
+    return 1 if results['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,152 @@
 
-import pandas as pd
-import numpy as np
-from src.preprocessing import Preprocessor
-from src.skills import SkillExtractor
-from src.ranking import ResumeRanker
+import argparse
+import sys
+from src.instrumentation import profiler, timer
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rank resumes against a job description.")
+    parser.add_argument('--jd', action='append', metavar='FILE',
+                        help='Job description file (repeat for several roles with --stream); '
+                             'prompts for one when omitted')
+    parser.add_argument('--k', type=int, default=10, help='Candidates to show / keep per role')
+    parser.add_argument('--output', default='ranked_candidates.csv', help='Where to write the ranked candidates')
+    parser.add_argument('--stream', action='store_true',
+                        help='Score the corpus chunk by chunk in bounded memory (for large dumps)')
+    parser.add_argument('--csv', help='Resume CSV to read (default: Resume/Resume.csv)')
+    parser.add_argument('--pdf-root', help='PDF tree used when the CSV is missing (default: data/data)')
+    parser.add_argument('--chunksize', type=int, default=1000, help='Resumes per chunk with --stream')
+    parser.add_argument('--index', help='Pre-fitted index (.npz) supplying vocabulary and IDF for --stream '
+                                        '(default: artifacts/corpus/index.npz, else fitted on the first chunk)')
+    parser.add_argument('--scores-out', help='With --stream, also write every resume\'s scores to this CSV')
+    parser.add_argument('--workers', type=int, help='Preprocessing processes (default: CPU count)')
+    parser.add_argument('--scorer', choices=('cosine', 'bm25'), default='cosine',
+                        help='TF-IDF cosine, or BM25F with extracted skills as a boosted field '
+                             '(scores are then unbounded)')
+    parser.add_argument('--semantic-weight', type=float, default=0.0,
+                        help='Share of the score taken from dense (LSA) similarity, 0-1 (builds '
+                             'artifacts/dense on first use); only the top k are then ranked and saved')
+    parser.add_argument('--dedup-threshold', type=float,
+                        help='Collapse resumes whose shingle Jaccard similarity reaches this value (e.g. 0.8); '
+                             'only the first of each group is ranked')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print per-stage timings and counters when done')
+    parser.add_argument('--metrics-out',
+                        help='Also write the metrics to this file (.prom: Prometheus text, otherwise a JSON line)')
+    args = parser.parse_args()
+    if args.jd and len(args.jd) > 1 and not args.stream:
+        parser.error("several --jd files require --stream")
+    if args.k < 1:
+        parser.error("--k must be at least 1")
+    if not 0.0 <= args.semantic_weight <= 1.0:
+        parser.error("--semantic-weight must be between 0 and 1")
+    if args.stream and (args.semantic_weight or args.scorer != 'cosine'):
+        parser.error("--semantic-weight and --scorer bm25 are not supported with --stream")
+    if args.dedup_threshold is not None and not 0 < args.dedup_threshold <= 1:
+        parser.error("--dedup-threshold must be in (0, 1]")
+    if args.stream and args.dedup_threshold is not None:
+        parser.error("--dedup-threshold is not supported with --stream")
+    if args.semantic_weight and args.scorer != 'cosine':
+        parser.error("--semantic-weight can only be fused with cosine scores")
+    return args
+
+def read_job_descriptions(paths):
+    job_descriptions = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            job_descriptions.append(f.read())
+    return job_descriptions
+
+def write_profile(metrics_out):
+    print("\n--- Profile ---", file=sys.stderr)
+    print(profiler.report(), file=sys.stderr)
+    if metrics_out and metrics_out.endswith('.prom'):
+        with open(metrics_out, 'w') as f:
+            f.write(profiler.to_prometheus())
+    elif metrics_out:
+        profiler.write_json(metrics_out, command='cli_main')
 
 def main():
+    args = parse_args()
+    profiler.enabled = args.profile or bool(args.metrics_out)
+    try:
+        if args.stream:
+            run_stream(args)
+        else:
+            run(args)
+    finally:
+        if profiler.enabled:
+            write_profile(args.metrics_out)
+
+def run_stream(args):
+    import os
+    from src.artifacts import CORPUS_DIR, RESULT_COLUMNS, export_results
+    from src.ingest import CSV_PATH, PDF_ROOT, iter_resume_chunks
+    from src.preprocessing import Preprocessor
+    from src.ranking import ResumeRanker
+    from src.skills import SkillExtractor
+    from src.streaming import fit_on_first_chunk, stream_rank
+
+    if not args.jd:
+        print("Error: --stream needs at least one --jd file")
+        return
+    try:
+        job_descriptions = read_job_descriptions(args.jd)
+    except OSError as e:
+        print(f"Error: Could not read job description {e.filename}: {e.strerror}")
+        return
+    role_names = [os.path.splitext(os.path.basename(path))[0] for path in args.jd]
+
+    csv_path = args.csv or CSV_PATH
+    pdf_root = args.pdf_root or PDF_ROOT
+    chunks = iter_resume_chunks(csv_path, pdf_root, chunksize=args.chunksize, workers=args.workers)
+
+    try:
+        index_path = args.index or os.path.join(CORPUS_DIR, 'index.npz')
+        if os.path.exists(index_path):
+            print(f"Using vocabulary and IDF from {index_path}")
+            ranker = ResumeRanker.load(index_path)
+        else:
+            print(f"Warning: no index at {index_path}; fitting vocabulary and IDF on the first chunk")
+            ranker, chunks = fit_on_first_chunk(chunks, workers=args.workers)
+
+        results = stream_rank(
+            chunks, ranker, job_descriptions, args.k, Preprocessor(fast=True), SkillExtractor(),
+            role_names=role_names, workers=args.workers, scores_path=args.scores_out,
+        )
+    except FileNotFoundError:
+        print(f"Error: Dataset not found at {csv_path} or {pdf_root}")
+        return
+
+    export_results(results, args.output, columns=['Role', 'Rank'] + RESULT_COLUMNS)
+    for role in role_names:
+        top = results[results['Role'] == role]
+        print(f"\n--- Top {len(top)} Candidates for {role} ---")
+        print(top[['Rank', 'ID', 'Category', 'Similarity_Score', 'Skill_Coverage']].to_string(index=False))
+    print(f"\nRanked list saved to '{args.output}'.")
+
+def run(args):
+    # Heavy imports (pandas, scipy, sklearn, nltk) are deferred until the
+    # arguments are parsed, so --help and usage errors return immediately
+    import numpy as np
+    from src.preprocessing import Preprocessor
+    from src.skills import SkillExtractor, skill_coverage
+    from src.artifacts import RESULT_COLUMNS, export_results, load_or_build_corpus
+    from src.ingest import CSV_PATH, PDF_ROOT, load_resumes
+
+    # Read the JD files up front so a bad path fails before the corpus loads
+    job_description = None
+    if args.jd:
+        try:
+            job_description = read_job_descriptions(args.jd)[0]
+        except OSError as e:
+            print(f"Error: Could not read job description {e.filename}: {e.strerror}")
+            return
+
     try:
         # Load Dataset
         print("Loading dataset...")
-        data_path = r'c:\Users\Admin\OneDrive\Desktop\Task3\Resume\Resume.csv'
-        df = pd.read_csv(data_path)
+        with timer('cli.load_resumes'):
+            df = load_resumes(args.csv or CSV_PATH, args.pdf_root or PDF_ROOT)
         
         # Limit dataset for faster execution during development/demo (optional)
         # df = df.head(100) 
@@ -21,15 +157,26 @@ def main():
 
         print(f"Loaded {len(df)} resumes.")
         
-        # Preprocess Resumes
-        print("Preprocessing resumes...")
-        preprocessor = Preprocessor()
-        df['Cleaned_Resume'] = df['Resume_str'].apply(preprocessor.clean_text)
-        
-        # Skill Extraction
-        print("Extracting skills from resumes...")
+        # Preprocess resumes and extract skills on all cores, or reuse the
+        # stored corpus when it was built from the same resumes
+        print("Preprocessing resumes and extracting skills...")
+        with timer('cli.load_or_build_corpus'):
+            df, ranker = load_or_build_corpus(df, workers=args.workers)
+        # Frame index of each ranker row (rows may be dropped from df below)
+        row_index = df.index
+        if args.scorer == 'bm25':
+            # BM25F over the stored corpus just verified above (same row order)
+            from src.artifacts import load_compact_corpus, open_bm25
+            with timer('cli.load_bm25'):
+                ranker = open_bm25(load_compact_corpus()[0])
+        clusters = None
+        if args.dedup_threshold is not None:
+            from src.artifacts import load_compact_corpus, open_dedup
+            with timer('cli.dedup'):
+                clusters = open_dedup(load_compact_corpus()[0], threshold=args.dedup_threshold)
+            print(f"Collapsing {clusters.n_duplicates} near-duplicate resumes.")
+        preprocessor = Preprocessor(fast=True)
         extractor = SkillExtractor()
-        df['Extracted_Skills'] = df['Resume_str'].apply(extractor.extract_skills)
 
         # Prompt for Job Description
         print("\n--- Enter Job Description ---")
@@ -40,12 +187,13 @@ def main():
         The candidate should have strong communication skills and be a team player.
         """
         
-        try:
-            print("Enter Job Description (Press Enter to use default JD):")
-            user_input = input()
-            job_description = user_input if user_input.strip() else default_jd
-        except EOFError:
-             job_description = default_jd
+        if job_description is None:
+            try:
+                print("Enter Job Description (Press Enter to use default JD):")
+                user_input = input()
+                job_description = user_input if user_input.strip() else default_jd
+            except EOFError:
+                 job_description = default_jd
 
         print(f"\nUsing Job Description:\n{job_description}\n")
         
@@ -57,34 +205,64 @@ def main():
         
         # Ranking
         print("Ranking candidates...")
-        ranker = ResumeRanker()
-        similarity_scores = ranker.score_resumes(df['Cleaned_Resume'].tolist(), cleaned_jd)
+        if args.semantic_weight > 0:
+            from src.dense import DenseIndex, hybrid_top_k
+            with timer('cli.load_dense_index'):
+                dense_index = DenseIndex.load_or_build(ranker)
+            # Only the inverted-index and ANN candidates are scored and fused;
+            # every other resume is left out of the ranking
+            hybrid_rows, hybrid_scores = hybrid_top_k(
+                ranker, dense_index, cleaned_jd, args.k, args.semantic_weight,
+                allowed=None if clusters is None else clusters.is_canonical)
+            similarity_scores = np.full(len(df), -np.inf)
+            similarity_scores[hybrid_rows] = hybrid_scores
+        else:
+            similarity_scores = ranker.score(cleaned_jd)
         
         df['Similarity_Score'] = similarity_scores
+
+        # Gap Analysis (vectorised over a resumes x skills boolean matrix)
+        skill_matrix = extractor.skill_matrix(df['Extracted_Skills'])
+        jd_vector = extractor.skill_vector(jd_skills)
+        df['Skill_Coverage'] = skill_coverage(skill_matrix, jd_vector)
+        _, missing = extractor.gap_analysis(skill_matrix, jd_vector, np.arange(len(df)))
+        df['Missing_Skills'] = missing
+        columns = RESULT_COLUMNS
+        if clusters is not None:
+            # Rank one resume per near-duplicate group, listing the others
+            ids = df['ID'].to_numpy()
+            df['Duplicate_IDs'] = [';'.join(str(i) for i in ids[clusters.duplicates(row)])
+                                   for row in range(len(df))]
+            df = df[clusters.is_canonical]
+            columns = RESULT_COLUMNS + ['Duplicate_IDs']
         
         # Sort by similarity score
-        ranked_df = df.sort_values(by='Similarity_Score', ascending=False)
-        
-        # Gap Analysis
-        def identify_missing_skills(candidate_skills, required_skills):
-            candidate_skills_set = set(candidate_skills)
-            missing = required_skills - candidate_skills_set
-            return list(missing)
-
-        ranked_df['Missing_Skills'] = ranked_df['Extracted_Skills'].apply(lambda x: identify_missing_skills(x, jd_skills))
+        with timer('cli.sort'):
+            ranked_df = df.sort_values(by='Similarity_Score', ascending=False)
+            ranked_df = ranked_df[np.isfinite(ranked_df['Similarity_Score'])]
         
-        # Display Top 10 Candidates
-        top_candidates = ranked_df[['ID', 'Category', 'Similarity_Score', 'Extracted_Skills', 'Missing_Skills']].head(10)
+        # Display Top k Candidates, with the terms behind each TF-IDF / BM25
+        # score (computed for these k rows only)
+        shown = ['ID', 'Category', 'Similarity_Score', 'Skill_Coverage', 'Extracted_Skills', 'Missing_Skills']
+        if clusters is not None:
+            shown.append('Duplicate_IDs')
+        top_candidates = ranked_df[shown].head(args.k).copy()
+        top_rows = row_index.get_indexer(top_candidates.index)
+        top_candidates['Top_Terms'] = [
+            ', '.join(f"{term}:{contribution:.3f}" for term, contribution in terms)
+            for terms in ranker.explain(cleaned_jd, top_rows)
+        ]
         
-        print("\n--- Top 10 Ranked Candidates ---")
+        print(f"\n--- Top {args.k} Ranked Candidates ---")
         print(top_candidates.to_string(index=False))
         
-        # Save results
-        ranked_df.to_csv('ranked_candidates.csv', index=False)
-        print("\nRanked list saved to 'ranked_candidates.csv'.")
+        # Save results (IDs, scores and skills only, not the resume text)
+        with timer('cli.export'):
+            export_results(ranked_df, args.output, columns=columns)
+        print(f"\nRanked list saved to '{args.output}'.")
         
     except FileNotFoundError:
-        print(f"Error: Dataset not found at {data_path}")
+        print(f"Error: Dataset not found at {args.csv or CSV_PATH} or {args.pdf_root or PDF_ROOT}")
     except Exception as e:
         print(f"An error occurred: {e}")
 
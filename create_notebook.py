@@ -33,6 +33,8 @@ notebook_content = {
     "from src.preprocessing import Preprocessor\n",
     "from src.skills import SkillExtractor\n",
     "from src.ranking import ResumeRanker\n",
+    "from src.pipeline import preprocess_corpus\n",
+    "from src.ingest import load_resumes\n",
     "\n",
     "%matplotlib inline\n",
     "%load_ext autoreload\n",
@@ -44,7 +46,7 @@ notebook_content = {
    "metadata": {},
    "source": [
     "## 1. Load Data\n",
-    "Load the resume dataset from 'Resume/Resume.csv'."
+    "Load the resume dataset from 'Resume/Resume.csv', or from the PDFs under 'data/data' when the CSV is absent."
    ]
   },
   {
@@ -53,8 +55,7 @@ notebook_content = {
    "metadata": {},
    "outputs": [],
    "source": [
-    "data_path = 'Resume/Resume.csv'\n",
-    "df = pd.read_csv(data_path)\n",
+    "df = load_resumes()\n",
     "print(f\"Dataset Shape: {df.shape}\")\n",
     "df.head()"
    ]
@@ -73,8 +74,9 @@ notebook_content = {
    "metadata": {},
    "outputs": [],
    "source": [
-    "preprocessor = Preprocessor()\n",
-    "df['Cleaned_Resume'] = df['Resume_str'].apply(preprocessor.clean_text)\n",
+    "preprocessor = Preprocessor(fast=True)\n",
+    "# Cleans and skill-extracts every resume on all CPU cores\n",
+    "df['Cleaned_Resume'], df['Skills'] = preprocess_corpus(df['Resume_str'])\n",
     "df[['Resume_str', 'Cleaned_Resume']].head()"
    ]
   },
@@ -83,7 +85,7 @@ notebook_content = {
    "metadata": {},
    "source": [
     "## 3. Skill Extraction\n",
-    "Extract key skills from the resumes to aid in analysis."
+    "Key skills were extracted from the raw resumes during preprocessing; the extractor is reused for the JD."
    ]
   },
   {
@@ -93,7 +95,6 @@ notebook_content = {
    "outputs": [],
    "source": [
     "extractor = SkillExtractor()\n",
-    "df['Skills'] = df['Cleaned_Resume'].apply(extractor.extract_skills)\n",
     "df[['Cleaned_Resume', 'Skills']].head()"
    ]
   },
@@ -1,11 +1,11 @@
-import pandas as pd
+from src.ingest import load_resumes
 
-# Load the dataset
+# Load the dataset (Resume/Resume.csv, or the PDFs under data/data)
 try:
-    df = pd.read_csv(r'c:\Users\Admin\OneDrive\Desktop\Task3\Resume\Resume.csv')
+    df = load_resumes()
     print("Columns:", df.columns.tolist())
     print("\nFirst 5 rows:\n", df.head())
     print("\nData Types:\n", df.dtypes)
     print("\nMissing Values:\n", df.isnull().sum())
 except Exception as e:
-    print(f"Error loading CSV: {e}")
+    print(f"Error loading dataset: {e}")
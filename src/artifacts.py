@@ -0,0 +1,520 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.ingest import CSV_PATH, PDF_ROOT, list_pdf_corpus, load_resumes
+from src.instrumentation import count
+from src.pipeline import preprocess_corpus
+from src.ranking import ResumeRanker, corpus_fingerprint
+from src.skills import SkillExtractor, build_skill_matrix
+
+CORPUS_DIR = 'artifacts/corpus'
+# 2: cleaned text stored as token IDs, source signature in meta.json
+CORPUS_FORMAT_VERSION = 2
+
+# Columns written by export_results (no raw resume text)
+RESULT_COLUMNS = ['ID', 'Category', 'Similarity_Score', 'Skill_Coverage', 'Extracted_Skills', 'Missing_Skills']
+
+
+class TextColumn:
+    """
+    Read-only sequence of strings backed by a UTF-8 blob and an offsets
+    array. With mmap the blob stays on disk and each item is decoded
+    only when it is accessed.
+    """
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class TokenColumn:
+    """
+    Read-only sequence of cleaned texts stored as one flat int32 array
+    of token IDs plus offsets, over a shared vocabulary. Each text costs
+    4 bytes per token instead of a Python string.
+    """
+
+    def __init__(self, token_ids, offsets, vocabulary):
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def tokens(self, i):
+        return self.token_ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        vocabulary = self.vocabulary
+        # tolist() reads the (possibly memory-mapped) IDs in one call
+        return ' '.join([vocabulary[t] for t in self.tokens(i).tolist()])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def encode_tokens(texts):
+    """
+    Splits space-joined texts (Preprocessor.clean_text output) into
+    (vocabulary, token_ids, offsets), with token IDs numbered in order of
+    first appearance. Splitting on single spaces keeps empty tokens, so
+    TokenColumn reproduces every text exactly.
+    """
+    ids = {}
+    token_ids = []
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    for row, text in enumerate(texts):
+        tokens = text.split(' ') if text else []
+        token_ids.extend(ids.setdefault(token, len(ids)) for token in tokens)
+        offsets[row + 1] = offsets[row] + len(tokens)
+    return list(ids), np.array(token_ids, dtype=np.int32), offsets
+
+
+class CompactCorpus:
+    """
+    A stored corpus held with as little resident memory as possible:
+
+    - IDs as a numpy array and categories as int16 codes
+    - skills as CSR arrays of small-int IDs into the skill vocabulary
+    - cleaned text as token IDs (TokenColumn)
+    - raw text memory-mapped (TextColumn), decoded only for the rows
+      that are shown
+
+    Rows line up with the stored index. Use frame(rows) to materialise a
+    regular DataFrame for a handful of rows, e.g. the top candidates.
+    """
+
+    def __init__(self, ids, category_codes, category_labels, skills_indptr, skills_indices,
+                 skill_vocabulary, raw, cleaned):
+        self.ids = ids
+        self.category_codes = category_codes
+        self.category_labels = category_labels
+        self.skills_indptr = skills_indptr
+        self.skills_indices = skills_indices
+        self.skill_vocabulary = skill_vocabulary
+        self.raw = raw
+        self.cleaned = cleaned
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def categories(self):
+        return pd.Categorical.from_codes(self.category_codes, self.category_labels)
+
+    def skills(self, row):
+        start, end = self.skills_indptr[row], self.skills_indptr[row + 1]
+        return [self.skill_vocabulary[i] for i in self.skills_indices[start:end]]
+
+    def skill_matrix(self):
+        """
+        CSR boolean resumes x skills matrix, built straight from the
+        stored arrays (same as SkillExtractor.skill_matrix).
+        """
+        import scipy.sparse as sp
+
+        data = np.ones(len(self.skills_indices), dtype=bool)
+        return sp.csr_matrix((data, self.skills_indices, self.skills_indptr),
+                             shape=(len(self), len(self.skill_vocabulary)))
+
+    def frame(self, rows=None, columns=('ID', 'Category', 'Resume_str', 'Extracted_Skills')):
+        """
+        DataFrame for the given rows (default: all), with only the
+        requested columns materialised.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        data = {}
+        for column in columns:
+            if column == 'ID':
+                data['ID'] = self.ids[rows]
+            elif column == 'Category':
+                data['Category'] = np.asarray(self.category_labels, dtype=object)[self.category_codes[rows]]
+            elif column == 'Resume_str':
+                data['Resume_str'] = [self.raw[row] for row in rows]
+            elif column == 'Cleaned_Resume':
+                data['Cleaned_Resume'] = [self.cleaned[row] for row in rows]
+            elif column == 'Extracted_Skills':
+                data['Extracted_Skills'] = [self.skills(row) for row in rows]
+            else:
+                raise ValueError(f"Unknown corpus column: {column}")
+        return pd.DataFrame(data, index=rows)
+
+
+def _save_texts(directory, name, texts):
+    encoded = [(text if isinstance(text, str) else '').encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f'{name}_blob.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(directory, f'{name}_offsets.npy'), offsets)
+
+
+def _load_texts(directory, name, mmap):
+    mode = 'r' if mmap else None
+    blob = np.load(os.path.join(directory, f'{name}_blob.npy'), mmap_mode=mode)
+    offsets = np.load(os.path.join(directory, f'{name}_offsets.npy'))
+    return TextColumn(blob, offsets)
+
+
+def encode_skills(skill_lists, vocabulary):
+    """
+    Encodes per-resume skill lists as CSR arrays (indptr, indices) of
+    integer skill IDs, where an ID is a position in `vocabulary`.
+    """
+    matrix = build_skill_matrix(skill_lists, vocabulary)
+    return matrix.indptr.astype(np.int64), matrix.indices.astype(np.int32)
+
+
+def decode_skills(indptr, indices, vocabulary):
+    return [
+        [vocabulary[i] for i in indices[indptr[row]:indptr[row + 1]]]
+        for row in range(len(indptr) - 1)
+    ]
+
+
+def save_corpus(df, ranker, skill_vocabulary, directory=CORPUS_DIR, source_signature=None):
+    """
+    Writes a processed corpus to `directory`:
+
+    - ID / Category columns and the raw text as .npy arrays
+    - the cleaned text as int32 token IDs + offsets over a token vocabulary
+    - skills as CSR arrays of integer IDs into skill_vocabulary
+    - the fitted TF-IDF index (ResumeRanker.save)
+    - meta.json with row count and fingerprints of the raw and cleaned text
+
+    Args:
+    - df: Frame with ID, Category, Resume_str, Cleaned_Resume and Extracted_Skills.
+    - ranker: ResumeRanker fitted on df['Cleaned_Resume'] in row order.
+    - skill_vocabulary: Ordered list of every skill name.
+    - source_signature: Optional source_signature() of the files df was
+      read from, so open_corpus can skip re-reading them.
+    """
+    os.makedirs(directory, exist_ok=True)
+    skill_vocabulary = list(skill_vocabulary)
+
+    # Invalidate the old corpus before overwriting any of its files
+    meta_path = os.path.join(directory, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    ids = df['ID'].to_numpy()
+    if ids.dtype == object:
+        ids = ids.astype(str)
+    np.save(os.path.join(directory, 'id.npy'), ids)
+
+    categories = pd.Categorical(df['Category'])
+    np.save(os.path.join(directory, 'category_codes.npy'), categories.codes.astype(np.int16))
+
+    _save_texts(directory, 'raw', df['Resume_str'])
+    token_vocabulary, token_ids, token_offsets = encode_tokens(df['Cleaned_Resume'].tolist())
+    _save_texts(directory, 'token_vocab', token_vocabulary)
+    np.save(os.path.join(directory, 'token_ids.npy'), token_ids)
+    np.save(os.path.join(directory, 'token_offsets.npy'), token_offsets)
+
+    indptr, indices = encode_skills(df['Extracted_Skills'], skill_vocabulary)
+    np.save(os.path.join(directory, 'skills_indptr.npy'), indptr)
+    np.save(os.path.join(directory, 'skills_indices.npy'), indices)
+
+    ranker.save(os.path.join(directory, 'index.npz'))
+
+    meta = {
+        'version': CORPUS_FORMAT_VERSION,
+        'n_docs': len(df),
+        'categories': [str(c) for c in categories.categories],
+        'skill_vocabulary': skill_vocabulary,
+        'source_fingerprint': corpus_fingerprint(_texts(df['Resume_str'])),
+        'cleaned_fingerprint': ranker.fingerprint,
+        'source_signature': source_signature,
+    }
+    # Written last, so a partially written directory is never considered valid
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def read_meta(directory=CORPUS_DIR):
+    """
+    Returns the corpus metadata, or None if no valid corpus is stored.
+    """
+    try:
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get('version') != CORPUS_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def load_corpus(directory=CORPUS_DIR, columns=None, mmap=True):
+    """
+    Loads a corpus written by save_corpus.
+
+    Args:
+    - columns: Subset of ID, Category, Resume_str, Cleaned_Resume and
+      Extracted_Skills to materialise (default: all). Text columns that
+      are not requested are never read.
+    - mmap: Memory-map the text blobs instead of reading them into RAM.
+
+    Returns (df, ranker).
+    """
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"No corpus artifact in {directory}")
+
+    columns = columns or ['ID', 'Category', 'Resume_str', 'Cleaned_Resume', 'Extracted_Skills']
+    data = {}
+    for column in columns:
+        if column == 'ID':
+            data['ID'] = np.load(os.path.join(directory, 'id.npy'))
+        elif column == 'Category':
+            codes = np.load(os.path.join(directory, 'category_codes.npy'))
+            data['Category'] = pd.Categorical.from_codes(codes, meta['categories']).astype(str)
+        elif column == 'Resume_str':
+            data['Resume_str'] = list(_load_texts(directory, 'raw', mmap))
+        elif column == 'Cleaned_Resume':
+            data['Cleaned_Resume'] = list(_load_tokens(directory, mmap))
+        elif column == 'Extracted_Skills':
+            indptr = np.load(os.path.join(directory, 'skills_indptr.npy'))
+            indices = np.load(os.path.join(directory, 'skills_indices.npy'))
+            data['Extracted_Skills'] = decode_skills(indptr, indices, meta['skill_vocabulary'])
+        else:
+            raise ValueError(f"Unknown corpus column: {column}")
+
+    ranker = ResumeRanker.load(os.path.join(directory, 'index.npz'))
+    return pd.DataFrame(data), ranker
+
+
+def _load_tokens(directory, mmap):
+    mode = 'r' if mmap else None
+    return TokenColumn(
+        np.load(os.path.join(directory, 'token_ids.npy'), mmap_mode=mode),
+        np.load(os.path.join(directory, 'token_offsets.npy'), mmap_mode=mode),
+        list(_load_texts(directory, 'token_vocab', mmap=False)),
+    )
+
+
+def load_compact_corpus(directory=CORPUS_DIR, mmap=True):
+    """
+    Loads a stored corpus as a CompactCorpus (no per-row Python objects).
+
+    Returns (corpus, ranker), with the corpus categories attached to the ranker.
+    """
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"No corpus artifact in {directory}")
+
+    mode = 'r' if mmap else None
+    corpus = CompactCorpus(
+        ids=np.load(os.path.join(directory, 'id.npy')),
+        category_codes=np.load(os.path.join(directory, 'category_codes.npy')),
+        category_labels=meta['categories'],
+        skills_indptr=np.load(os.path.join(directory, 'skills_indptr.npy'), mmap_mode=mode),
+        skills_indices=np.load(os.path.join(directory, 'skills_indices.npy'), mmap_mode=mode),
+        skill_vocabulary=meta['skill_vocabulary'],
+        raw=_load_texts(directory, 'raw', mmap),
+        cleaned=_load_tokens(directory, mmap),
+    )
+    ranker = ResumeRanker.load(os.path.join(directory, 'index.npz'))
+    if ranker.categories is None:
+        ranker.set_categories(np.asarray(corpus.categories))
+    return corpus, ranker
+
+
+def source_signature(csv_path=CSV_PATH, pdf_root=PDF_ROOT):
+    """
+    Cheap identity of the corpus source, from file metadata only: the
+    CSV's path, size and mtime, or those of every PDF in the tree.
+    Returns None if neither exists.
+    """
+    digest = hashlib.sha1()
+    if os.path.exists(csv_path):
+        paths = [csv_path]
+    elif os.path.isdir(pdf_root):
+        paths = [path for path, _, _ in list_pdf_corpus(pdf_root)]
+    else:
+        return None
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def open_corpus(csv_path=CSV_PATH, pdf_root=PDF_ROOT, directory=CORPUS_DIR, workers=None):
+    """
+    Returns (CompactCorpus, ranker) for the resume source.
+
+    When the stored corpus was built from unchanged source files (same
+    source_signature and skill vocabulary), it is opened without reading
+    the resumes at all. Otherwise the source is loaded and the corpus
+    rebuilt through load_or_build_corpus first.
+    """
+    signature = source_signature(csv_path, pdf_root)
+    if signature is None:
+        raise FileNotFoundError(f"Neither {csv_path} nor {pdf_root} exists")
+
+    meta = read_meta(directory)
+    if (meta is None or meta.get('source_signature') != signature
+            or meta['skill_vocabulary'] != SkillExtractor().vocabulary):
+        raw_df = load_resumes(csv_path, pdf_root)
+        load_or_build_corpus(raw_df, directory, workers, source_signature=signature)
+        del raw_df
+    else:
+        count('corpus_cache.hits')
+    return load_compact_corpus(directory)
+
+
+def open_dedup(corpus, directory=CORPUS_DIR, threshold=0.8):
+    """
+    Near-duplicate clusters (see find_duplicates) of a CompactCorpus,
+    stored as duplicates.npz and recomputed when the cleaned corpus or
+    the threshold changes.
+    """
+    from src.dedup import DuplicateClusters, find_duplicates
+
+    path = os.path.join(directory, 'duplicates.npz')
+    fingerprint = (read_meta(directory) or {}).get('cleaned_fingerprint')
+    if os.path.exists(path):
+        try:
+            with np.load(path) as archive:
+                if (str(archive['fingerprint']) == fingerprint and float(archive['threshold']) == threshold
+                        and len(archive['canonical']) == len(corpus)):
+                    count('dedup_cache.hits')
+                    return DuplicateClusters(archive['canonical'], threshold)
+        except (OSError, ValueError, KeyError):
+            # Corrupt or outdated file, recompute below
+            pass
+
+    count('dedup_cache.misses')
+    clusters = find_duplicates(corpus.cleaned, threshold)
+    np.savez(path, canonical=clusters.canonical, threshold=np.array(threshold),
+             fingerprint=np.array(fingerprint or ''))
+    return clusters
+
+
+def open_bm25(corpus, directory=CORPUS_DIR, **params):
+    """
+    BM25F ranker (skills as a boosted field) for a CompactCorpus, stored
+    as bm25.npz next to the TF-IDF index and rebuilt when the corpus or
+    the parameters (see BM25Ranker) change.
+    """
+    from src.bm25 import BM25Ranker
+
+    # Keyed like the dedup cache; fitted from the token IDs and skill
+    # arrays, so no text is materialised
+    fingerprint = (read_meta(directory) or {}).get('cleaned_fingerprint') or corpus_fingerprint(corpus.cleaned)
+    return BM25Ranker.load_or_fit_tokens(
+        os.path.join(directory, 'bm25.npz'), corpus.cleaned, fingerprint, corpus.skill_matrix(),
+        corpus.skill_vocabulary, np.asarray(corpus.categories, dtype=str), **params)
+
+
+def is_current(raw_texts, directory=CORPUS_DIR, skill_vocabulary=None):
+    """
+    True if the stored corpus was built from exactly these raw texts
+    (and, if given, the same skill vocabulary).
+    """
+    meta = read_meta(directory)
+    if meta is None or meta['n_docs'] != len(raw_texts):
+        return False
+    if skill_vocabulary is not None and meta['skill_vocabulary'] != list(skill_vocabulary):
+        return False
+    return meta['source_fingerprint'] == corpus_fingerprint(_texts(raw_texts))
+
+
+def load_or_build_corpus(raw_df, directory=CORPUS_DIR, workers=None, source_signature=None):
+    """
+    Returns (df, ranker) for a raw ID/Category/Resume_str frame.
+
+    If the stored corpus was built from the same raw text, the skills and
+    index are loaded from disk and nothing is preprocessed. Otherwise the
+    corpus is indexed and saved for the next start; when a stored corpus
+    exists and the IDs are unique, only resumes that are new or whose
+    text changed are preprocessed (see CorpusStore).
+
+    Either way df gains only an Extracted_Skills column; the cleaned text
+    stays on disk (load_corpus(columns=['Cleaned_Resume']) reads it).
+    """
+    df = raw_df.copy()
+    skill_vocabulary = SkillExtractor().vocabulary
+    if is_current(df['Resume_str'], directory, skill_vocabulary):
+        count('corpus_cache.hits')
+        stored, ranker = load_corpus(directory, columns=['Extracted_Skills'])
+        df['Extracted_Skills'] = stored['Extracted_Skills'].tolist()
+        if ranker.categories is None:
+            ranker.set_categories(df['Category'])
+        if source_signature is not None and read_meta(directory).get('source_signature') != source_signature:
+            _update_meta(directory, source_signature=source_signature)
+        return df, ranker
+
+    count('corpus_cache.misses')
+    store = _stored_corpus_store(directory, skill_vocabulary, workers) if df['ID'].is_unique else None
+    if store is not None:
+        n_changed = store.sync(df['ID'].tolist(), _texts(df['Resume_str']), df['Category'].tolist())
+        count('corpus_cache.resumes_reprocessed', n_changed)
+        built = store.frame()
+        df['Cleaned_Resume'] = built['Cleaned_Resume'].tolist()
+        df['Extracted_Skills'] = built['Extracted_Skills'].tolist()
+        ranker = store.ranker()
+    else:
+        df['Cleaned_Resume'], df['Extracted_Skills'] = preprocess_corpus(df['Resume_str'], workers=workers)
+        ranker = ResumeRanker().fit(df['Cleaned_Resume'], df['Category'])
+    save_corpus(df, ranker, skill_vocabulary, directory, source_signature)
+    # Same columns as a cache hit
+    return df.drop(columns=['Cleaned_Resume']), ranker
+
+
+def _stored_corpus_store(directory, skill_vocabulary, workers):
+    # CorpusStore holding the stored corpus, or None if there is none or
+    # its skills were extracted with another vocabulary
+    meta = read_meta(directory)
+    if meta is None or meta['skill_vocabulary'] != list(skill_vocabulary):
+        return None
+    from src.store import CorpusStore
+
+    stored, _ = load_corpus(directory)
+    store = CorpusStore(workers=workers)
+    store.add_preprocessed(stored['ID'].tolist(), stored['Resume_str'].tolist(), stored['Cleaned_Resume'].tolist(),
+                           stored['Extracted_Skills'].tolist(), stored['Category'].tolist())
+    return store
+
+
+def _update_meta(directory, **fields):
+    meta_path = os.path.join(directory, 'meta.json')
+    meta = read_meta(directory)
+    meta.update(fields)
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def export_results(ranked_df, path, columns=RESULT_COLUMNS):
+    """
+    Writes ranking results without the resume text. Skill lists are
+    joined with ';' so the CSV stays one flat value per cell.
+    """
+    out = ranked_df[[c for c in columns if c in ranked_df.columns]].copy()
+    for column in ('Extracted_Skills', 'Missing_Skills'):
+        if column in out.columns:
+            out[column] = out[column].apply(lambda skills: ';'.join(sorted(skills)))
+    out.to_csv(path, index=False)
+
+
+def _texts(values):
+    # Missing values (NaN from CSV) are stored as empty strings
+    return [text if isinstance(text, str) else '' for text in values]
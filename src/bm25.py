@@ -0,0 +1,316 @@
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.instrumentation import count, timer
+from src.ranking import ResumeRanker, _as_list, corpus_fingerprint
+
+
+def make_count_vectorizer(binary=False):
+    """
+    Term counter with the same analyzer and 5000-term vocabulary
+    selection as the TF-IDF vectorizer.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    return CountVectorizer(max_features=5000, stop_words='english', binary=binary)
+
+
+def token_lengths(counter, texts):
+    """
+    Number of tokens the counter's analyzer yields for each text, counting
+    terms outside the max_features vocabulary too.
+    """
+    analyze = counter.build_analyzer()
+    return np.fromiter((len(analyze(text)) for text in texts), dtype=np.int64, count=len(texts))
+
+
+def _term_map(analyze, strings, term_ids, add_terms):
+    """
+    CSR (strings x terms) matrix counting the terms the analyzer yields
+    for each string, plus the total token count of each string. New terms
+    get the next free ID in term_ids when add_terms is set, and are
+    otherwise left out of the matrix (but still counted).
+    """
+    rows, cols = [], []
+    n_tokens = np.zeros(len(strings), dtype=np.int64)
+    for row, string in enumerate(strings):
+        terms = analyze(string)
+        n_tokens[row] = len(terms)
+        for term in terms:
+            column = term_ids.setdefault(term, len(term_ids)) if add_terms else term_ids.get(term)
+            if column is not None:
+                rows.append(row)
+                cols.append(column)
+    data = np.ones(len(rows), dtype=np.int64)
+    mapping = sp.csr_matrix((data, (rows, cols)), shape=(len(strings), len(term_ids)))
+    return mapping, n_tokens
+
+
+def _token_count_matrix(token_ids, offsets, n_tokens):
+    # (documents x token vocabulary) counts straight from the flat ID
+    # column; copied, since a memory-mapped column is read-only
+    data = np.ones(len(token_ids), dtype=np.int64)
+    counts = sp.csr_matrix((data, np.array(token_ids), np.array(offsets)),
+                           shape=(len(offsets) - 1, n_tokens))
+    counts.sum_duplicates()
+    return counts
+
+
+def _length_normalized(counts, b, lengths):
+    """
+    Divides each row's term counts by (1 - b + b * length / avg_length).
+    """
+    counts = counts.tocsr().astype(np.float64)
+    avg_length = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+    norms = 1 - b + b * lengths / avg_length
+    counts.data /= np.repeat(norms, np.diff(counts.indptr))
+    return counts
+
+
+class BM25Ranker(ResumeRanker):
+    """
+    Okapi BM25 (or BM25F with a boosted skills field) behind the
+    ResumeRanker interface.
+
+    Every per-document part of the formula (IDF, term-frequency
+    saturation, length normalisation, field boosts) is folded into the
+    stored resume_matrix at fit time, so a query is the sum of the
+    matrix columns of its terms: the same sparse product, inverted-index
+    top_k and category partitions as the cosine ranker. Scores are
+    unbounded (not in [0, 1]).
+    """
+
+    def __init__(self, k1=1.2, b=0.75, skills_weight=2.0, skills_b=0.0):
+        """
+        Args:
+        - k1: Term-frequency saturation (higher = slower saturation).
+        - b: Length normalisation of the resume text, 0 (none) to 1 (full).
+        - skills_weight: BM25F boost of the skills field (used when
+          fit() is given skills).
+        - skills_b: Length normalisation of the skills field.
+        """
+        super().__init__()
+        self.features = 'bm25'
+        # Queries are binary: each distinct JD term adds its column once
+        self.vectorizer = make_count_vectorizer(binary=True)
+        self.k1 = k1
+        self.b = b
+        self.skills_weight = skills_weight
+        self.skills_b = skills_b
+        # Whether the fitted index has the skills field
+        self.fielded = False
+        # Token count of each resume (and skills field) the index was
+        # length-normalised with, stored with the index
+        self.lengths = None
+        self.skill_lengths = None
+
+    def fit(self, resumes, categories=None, skills=None):
+        """
+        Builds the BM25 weight matrix.
+
+        Args:
+        - resumes: List of preprocessed resume strings.
+        - categories: Optional category per resume.
+        - skills: Optional list of extracted skills per resume; adds them
+          as a second field boosted by skills_weight (BM25F).
+        """
+        resumes = _as_list(resumes)
+        with timer('ranking.fit'):
+            counter = make_count_vectorizer()
+            counts = counter.fit_transform(resumes)
+            # Lengths are full token counts, not just the counts of the
+            # 5000 vocabulary terms, so truncation doesn't shorten documents
+            lengths = token_lengths(counter, resumes)
+            skill_counts = skill_lengths = None
+            if skills is not None:
+                skill_texts = [' '.join(found) for found in _as_list(skills)]
+                skill_counts = counter.transform(skill_texts)
+                skill_lengths = token_lengths(counter, skill_texts)
+            self._fit_counts(counter.vocabulary_, counts, lengths, skill_counts, skill_lengths)
+
+        self.fingerprint = corpus_fingerprint(resumes)
+        self.set_categories(categories)
+        count('ranking.docs_indexed', len(resumes))
+        count('ranking.index_nnz', self.resume_matrix.nnz)
+        return self
+
+    def fit_tokens(self, tokens, categories=None, skill_matrix=None, skill_vocabulary=None, fingerprint=None):
+        """
+        Same index as fit(list(tokens), categories, skills), built from a
+        TokenColumn's token IDs and a skills CSR matrix without
+        materialising any text.
+
+        The analyzer's token pattern never spans the spaces between
+        cleaned tokens, so a text's terms are those of its tokens in turn:
+        each distinct token (and skill) is analysed once, and the counts
+        are sparse products with those per-token term counts. The 5000
+        terms are selected exactly as CountVectorizer does.
+
+        Args:
+        - tokens: TokenColumn (token_ids, offsets and vocabulary) of the
+          preprocessed resumes.
+        - categories: Optional category per resume.
+        - skill_matrix: Optional CSR (resumes x skills) matrix over
+          skill_vocabulary; adds the skills field (BM25F).
+        - fingerprint: Identifier of the cleaned corpus stored with the
+          index, e.g. the stored corpus' cleaned_fingerprint (default:
+          corpus_fingerprint of the texts).
+        """
+        counter = make_count_vectorizer()
+        analyze = counter.build_analyzer()
+        with timer('ranking.fit'):
+            term_ids = {}
+            token_terms, _ = _term_map(analyze, tokens.vocabulary, term_ids, add_terms=True)
+            full = _token_count_matrix(tokens.token_ids, tokens.offsets, len(tokens.vocabulary)) @ token_terms
+            lengths = np.asarray(full.sum(axis=1), dtype=np.int64).ravel()
+
+            # CountVectorizer's selection: terms in alphabetical order, then
+            # the max_features most frequent ones (same argsort, same ties)
+            terms = sorted(term_ids)
+            frequencies = np.asarray(full.sum(axis=0), dtype=np.int64).ravel()
+            alphabetical = np.array([term_ids[term] for term in terms], dtype=np.int64)
+            present = frequencies[alphabetical] > 0
+            terms = [term for term, keep in zip(terms, present) if keep]
+            alphabetical = alphabetical[present]
+            if not terms:
+                raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+            tfs = frequencies[alphabetical]
+            if len(terms) > counter.max_features:
+                keep = np.zeros(len(terms), dtype=bool)
+                keep[(-tfs).argsort()[:counter.max_features]] = True
+                terms = [term for term, kept in zip(terms, keep) if kept]
+                alphabetical = alphabetical[keep]
+            vocabulary = {term: i for i, term in enumerate(terms)}
+            counts = full[:, alphabetical]
+
+            skill_counts = skill_lengths = None
+            if skill_matrix is not None:
+                skill_terms, skill_tokens = _term_map(analyze, skill_vocabulary, vocabulary, add_terms=False)
+                skill_matrix = skill_matrix.astype(np.int64)
+                skill_counts = skill_matrix @ skill_terms
+                skill_lengths = skill_matrix @ skill_tokens
+            self._fit_counts(vocabulary, counts, lengths, skill_counts, skill_lengths)
+
+        self.fingerprint = fingerprint or corpus_fingerprint(tokens)
+        self.set_categories(categories)
+        count('ranking.docs_indexed', len(tokens))
+        count('ranking.index_nnz', self.resume_matrix.nnz)
+        return self
+
+    def _fit_counts(self, vocabulary, counts, lengths, skill_counts=None, skill_lengths=None):
+        # BM25 weights from (resumes x vocabulary) term counts and full
+        # token lengths, plus those of the skills field for BM25F
+        self.vectorizer.vocabulary_ = vocabulary
+        self._terms = None
+        self.lengths = lengths
+        # BM25F: length-normalised field frequencies are combined
+        # before the saturation, so a term in both fields still saturates
+        tf = _length_normalized(counts, self.b, lengths)
+        self.fielded = skill_counts is not None
+        self.skill_lengths = skill_lengths
+        if skill_counts is not None:
+            tf = tf + self.skills_weight * _length_normalized(skill_counts, self.skills_b, skill_lengths)
+        tf = tf.tocsr()
+        tf.sort_indices()
+
+        n_docs = tf.shape[0]
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        # Lucene's non-negative IDF
+        self.vectorizer.idf_ = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        tf.data = self.vectorizer.idf_[tf.indices] * tf.data * (self.k1 + 1) / (tf.data + self.k1)
+        self.resume_matrix = tf
+
+    def _params(self, fielded):
+        # A skills weight of 0 marks an index without the skills field
+        return [self.k1, self.b, self.skills_weight if fielded else 0.0, self.skills_b]
+
+    def _index_params(self):
+        return {'bm25_params': np.array(self._params(self.fielded))}
+
+    def _index_arrays(self):
+        arrays = self._index_params()
+        if self.lengths is not None:
+            arrays['bm25_lengths'] = self.lengths
+        if self.skill_lengths is not None:
+            arrays['bm25_skill_lengths'] = self.skill_lengths
+        return arrays
+
+    @classmethod
+    def load(cls, path):
+        ranker = super().load(path)
+        if not isinstance(ranker, BM25Ranker):
+            raise ValueError(f"{path} is not a BM25 index")
+        ranker.fielded = ranker.skills_weight > 0
+        with np.load(path) as archive:
+            if 'bm25_lengths' in archive.files:
+                ranker.lengths = archive['bm25_lengths']
+            if 'bm25_skill_lengths' in archive.files:
+                ranker.skill_lengths = archive['bm25_skill_lengths']
+        return ranker
+
+    @classmethod
+    def load_or_fit(cls, path, resumes, skills=None, categories=None, **params):
+        """
+        Loads the BM25 index at `path` if it was built from the same
+        corpus with the same parameters, otherwise fits and saves one.
+        """
+        resumes = _as_list(resumes)
+        saved = cls._load_current(path, corpus_fingerprint(resumes), skills is not None, params)
+        if saved is not None:
+            saved.set_categories(categories)
+            return saved
+        ranker = cls(**params).fit(resumes, categories, skills)
+        ranker.save(path)
+        return ranker
+
+    @classmethod
+    def load_or_fit_tokens(cls, path, tokens, fingerprint, skill_matrix=None, skill_vocabulary=None,
+                           categories=None, **params):
+        """
+        load_or_fit for a TokenColumn (see fit_tokens): the stored index
+        is reused while `fingerprint` and the parameters match.
+        """
+        saved = cls._load_current(path, fingerprint, skill_matrix is not None, params)
+        if saved is not None:
+            saved.set_categories(categories)
+            return saved
+        ranker = cls(**params).fit_tokens(tokens, categories, skill_matrix, skill_vocabulary, fingerprint)
+        ranker.save(path)
+        return ranker
+
+    @classmethod
+    def _load_current(cls, path, fingerprint, fielded, params):
+        # The index at path if it matches the corpus and parameters, else None
+        if not os.path.exists(path):
+            return None
+        try:
+            saved = cls.load(path)
+        except (OSError, ValueError, KeyError):
+            # Corrupt or outdated index file, rebuilt by the caller
+            return None
+        # Indexes saved without their lengths are rebuilt
+        if (saved.fingerprint == fingerprint
+                and saved._params(saved.fielded) == cls(**params)._params(fielded)
+                and saved.lengths is not None):
+            return saved
+        return None
+
+    def score_resumes(self, resumes, job_description):
+        """
+        BM25 scores of a preprocessed job description against resumes,
+        indexing them on the fly; prefer fit() + score() when the same
+        corpus is queried repeatedly.
+        """
+        resumes = _as_list(resumes)
+        if not resumes:
+            return []
+        if not job_description:
+            return [0.0] * len(resumes)
+        try:
+            ranker = BM25Ranker(self.k1, self.b, self.skills_weight, self.skills_b).fit(resumes)
+        except ValueError:
+            # Empty vocabulary (e.g. only stopwords)
+            return [0.0] * len(resumes)
+        return ranker.score(job_description)
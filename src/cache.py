@@ -0,0 +1,250 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.instrumentation import count
+
+
+def text_key(text):
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+def index_version(ranker):
+    """
+    Identifies the state of a fitted index. Changes whenever the ranker
+    is refitted, reloaded from a different artifact or rebuilt by a
+    CorpusStore, so cached results can never outlive the index.
+    """
+    if not ranker.is_fitted:
+        return None
+    matrix = ranker.resume_matrix
+    return (ranker.fingerprint, matrix.shape, matrix.nnz)
+
+
+def _sizeof(value):
+    # Approximate memory held by a cached value, for size-based eviction
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if sp.issparse(value):
+        value = value.tocsr()
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate bytes.
+    """
+
+    def __init__(self, name, max_entries=256, max_bytes=None):
+        """
+        Args:
+        - name: Label used for hit/miss counters and stats().
+        - max_entries: Most entries kept; 0 disables the cache.
+        - max_bytes: Optional bound on the summed size of the values.
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                count(f'{self.name}.misses')
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+        count(f'{self.name}.hits')
+        return entry[0]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            # Caching disabled
+            return
+        size = _sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Larger than the whole cache; not worth evicting everything for
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        sentinel = _MISSING
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+
+_MISSING = object()
+
+
+class QueryCache:
+    """
+    Bounded caches around a ResumeRanker, a Preprocessor and a
+    SkillExtractor for job descriptions that are queried repeatedly.
+
+    - cleaned text and JD skills, keyed on the raw JD text
+    - JD vectors, keyed on a hash of the cleaned JD
+    - scores and top-k results, keyed on the cleaned-JD hash, the
+      category filter and the index version
+
+    Every lookup checks the ranker's index_version first and drops all
+    index-dependent entries when it changed.
+    """
+
+    def __init__(self, ranker, preprocessor, extractor, max_entries=256, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+        - max_entries: Entry bound of each cache; 0 disables caching.
+        - max_bytes: Byte bound of the score/result cache, which holds
+          one float per resume for every cached (JD, category) pair.
+        """
+        self.ranker = ranker
+        self.preprocessor = preprocessor
+        self.extractor = extractor
+        self.cleaned = LRUCache('query_cache.cleaned', max_entries)
+        self.skills = LRUCache('query_cache.skills', max_entries)
+        self.vectors = LRUCache('query_cache.vectors', max_entries)
+        self.results = LRUCache('query_cache.results', max_entries, max_bytes)
+        self._version = index_version(ranker)
+
+    def set_ranker(self, ranker):
+        """
+        Points the cache at a new ranker (e.g. CorpusStore.ranker() after
+        an update); index-dependent entries are dropped if it differs.
+        """
+        self.ranker = ranker
+        self._check_version()
+
+    def _check_version(self):
+        version = index_version(self.ranker)
+        if version != self._version:
+            self.vectors.clear()
+            self.results.clear()
+            self._version = version
+            count('query_cache.invalidations')
+        return version
+
+    def key(self, cleaned_jd, category=None, *extra):
+        """
+        Result-cache key for a cleaned JD under the current index. Extra
+        values (e.g. k or blending weights) are appended verbatim.
+        """
+        if category == 'All':
+            category = None
+        return (text_key(cleaned_jd), category, self._check_version()) + extra
+
+    def clean_text(self, job_description):
+        return self.cleaned.get_or_compute(
+            text_key(job_description), lambda: self.preprocessor.clean_text(job_description))
+
+    def extract_skills(self, job_description):
+        # Extraction lowercases the text, so that is the key
+        normalized = job_description.lower() if isinstance(job_description, str) else ''
+        return self.skills.get_or_compute(
+            text_key(normalized), lambda: self.extractor.extract_skills(job_description))
+
+    def jd_vectors(self, cleaned_jds):
+        """
+        TF-IDF rows for several cleaned JDs; only the uncached ones are
+        transformed (in one batch).
+        """
+        self._check_version()
+        keys = [text_key(jd) for jd in cleaned_jds]
+        rows = [self.vectors.get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            fresh = self.ranker.vectorizer.transform([cleaned_jds[i] for i in missing])
+            for position, i in enumerate(missing):
+                rows[i] = fresh[position]
+                self.vectors.put(keys[i], rows[i])
+        if not rows:
+            return sp.csr_matrix((0, self.ranker.resume_matrix.shape[1]))
+        return sp.vstack(rows, format='csr')
+
+    def score_many(self, cleaned_jds, category=None):
+        """
+        Same result as ResumeRanker.score_many, served from the cache
+        where possible. Uncached JDs are scored together.
+        """
+        keys = [self.key(jd, category, 'scores') for jd in cleaned_jds]
+        scores = [self.results.get(key) for key in keys]
+        missing = [i for i, row in enumerate(scores) if row is None]
+        if missing:
+            jd_matrix = self.jd_vectors([cleaned_jds[i] for i in missing])
+            fresh = self.ranker.score_vectors(jd_matrix, category)
+            for position, i in enumerate(missing):
+                # Own copy (not a view of the batch), read-only since it is shared
+                scores[i] = fresh[position].copy()
+                scores[i].setflags(write=False)
+                self.results.put(keys[i], scores[i])
+        n_resumes = len(self.ranker.category_rows(category))
+        return np.vstack(scores) if scores else np.zeros((0, n_resumes))
+
+    def top_k(self, cleaned_jd, k, category=None):
+        """
+        Cached ResumeRanker.top_k.
+        """
+        return self.results.get_or_compute(
+            self.key(cleaned_jd, category, 'top_k', k),
+            lambda: self.ranker.top_k(cleaned_jd, k, category))
+
+    def explain(self, cleaned_jd, rows, n_terms=5):
+        """
+        ResumeRanker.explain with the cached JD vector.
+        """
+        return self.ranker.explain(cleaned_jd, rows, n_terms, jd_vector=self.jd_vectors([cleaned_jd]))
+
+    def stats(self):
+        caches = (self.cleaned, self.skills, self.vectors, self.results)
+        return {cache.name.split('.', 1)[1]: cache.stats() for cache in caches}
@@ -0,0 +1,255 @@
+import numpy as np
+import scipy.sparse as sp
+
+from src.instrumentation import count, timer
+
+# Windows hashed per batch; the (windows x n_perm) uint64 block stays
+# cache-sized (4 MB at 128 permutations), which is faster than larger batches
+BATCH_WINDOWS = 1 << 12
+# Buckets larger than this are verified against their first member only
+MAX_PAIRWISE_BUCKET = 32
+
+_PAD_TOKEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix64(x):
+    # splitmix64 finaliser: spreads nearby integers over all 64 bits
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _combine(columns):
+    # Order-dependent 64-bit hash of the rows of an (n x m) uint64 array
+    h = np.zeros(len(columns), dtype=np.uint64)
+    for j in range(columns.shape[1]):
+        h = _mix64(h * np.uint64(0x100000001B3) + columns[:, j] + np.uint64(j + 1))
+    return h
+
+
+def _token_arrays(texts):
+    """
+    (token_ids, offsets) for a TokenColumn or a sequence of cleaned strings.
+    """
+    if hasattr(texts, 'token_ids'):
+        return np.asarray(texts.token_ids), np.asarray(texts.offsets)
+    from src.artifacts import encode_tokens
+
+    _, token_ids, offsets = encode_tokens(list(texts))
+    return token_ids, offsets
+
+
+def _window_counts(offsets, shingle_size):
+    # Documents shorter than a window get one (padded) shingle; empty ones none
+    lengths = np.diff(offsets)
+    return np.where(lengths > 0, np.maximum(1, lengths - shingle_size + 1), 0)
+
+
+def _shingle_hashes(token_ids, offsets, shingle_size):
+    """
+    64-bit hashes of every window of `shingle_size` consecutive tokens
+    of the documents delimited by `offsets` (into token_ids).
+    """
+    lengths = np.diff(offsets)
+    windows = _window_counts(offsets, shingle_size)
+    total = int(windows.sum())
+    doc = np.repeat(np.arange(len(lengths)), windows)
+    first_window = np.cumsum(windows) - windows
+    starts = offsets[:-1][doc] + (np.arange(total) - first_window[doc])
+    ends = offsets[1:][doc]
+
+    columns = np.empty((total, shingle_size), dtype=np.uint64)
+    for j in range(shingle_size):
+        position = starts + j
+        valid = position < ends
+        columns[:, j] = np.where(valid, token_ids[np.minimum(position, len(token_ids) - 1)].astype(np.uint64),
+                                 _PAD_TOKEN)
+    return _combine(columns)
+
+
+def minhash_signatures(texts, n_perm=128, shingle_size=3, seed=0):
+    """
+    MinHash signatures (n_docs x n_perm, uint32) of the token shingles
+    of cleaned texts, computed in vectorised batches of documents.
+    Empty documents get all-max signatures.
+
+    Args:
+    - texts: TokenColumn (e.g. CompactCorpus.cleaned) or cleaned strings.
+    - n_perm: Number of hash permutations.
+    - shingle_size: Tokens per shingle.
+    """
+    token_ids, offsets = _token_arrays(texts)
+    n_docs = len(offsets) - 1
+    rng = np.random.default_rng(seed)
+    # Multiply-shift hash family: the top 32 bits of (a * x + b) mod 2^64
+    a = rng.integers(1, 2 ** 63, n_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, n_perm, dtype=np.uint64)
+
+    signatures = np.full((n_docs, n_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    with timer('dedup.minhash'):
+        windows = _window_counts(offsets, shingle_size)
+        window_offsets = np.concatenate([[0], np.cumsum(windows)])
+        start = 0
+        while start < n_docs:
+            # Largest run of documents whose windows fit in one batch (at least one document)
+            end = max(start + 1, int(np.searchsorted(window_offsets, window_offsets[start] + BATCH_WINDOWS,
+                                                     side='right')) - 1)
+            end = min(end, n_docs)
+            docs = np.arange(start, end)[windows[start:end] > 0]
+            if len(docs):
+                # Only this batch's shingles are ever materialised
+                batch = _shingle_hashes(token_ids, offsets[start:end + 1], shingle_size)
+                with np.errstate(over='ignore'):
+                    values = ((batch[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)
+                firsts = window_offsets[docs] - window_offsets[start]
+                signatures[docs] = np.minimum.reduceat(values, firsts, axis=0)
+            start = end
+    count('dedup.docs', n_docs)
+    return signatures
+
+
+def lsh_params(threshold, n_perm):
+    """
+    (bands, rows) with bands * rows == n_perm, chosen so that pairs with
+    Jaccard similarity around `threshold` become candidates: minimises
+    the summed false-positive and false-negative probability mass.
+    """
+    grid = np.linspace(0, 1, 201)
+    best, best_error = (n_perm, 1), np.inf
+    for rows in range(1, n_perm + 1):
+        if n_perm % rows:
+            continue
+        bands = n_perm // rows
+        candidate = 1 - (1 - grid ** rows) ** bands
+        error = np.mean(np.where(grid < threshold, candidate, 1 - candidate))
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+def candidate_pairs(signatures, bands, rows):
+    """
+    Pairs of documents that share an LSH bucket in at least one band,
+    as a (n_pairs x 2) array with i < j. Sorting each band's bucket
+    keys keeps this near-linear; large buckets are paired star-wise.
+    """
+    n_docs = len(signatures)
+    present = np.flatnonzero(signatures[:, 0] != np.iinfo(np.uint32).max)
+    pairs = []
+    for band in range(bands):
+        keys = _combine(signatures[present, band * rows:(band + 1) * rows].astype(np.uint64))
+        order = np.argsort(keys, kind='stable')
+        # Runs of equal keys are buckets; only those with 2+ members are visited
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(keys[order])) + 1])
+        lengths = np.diff(np.append(starts, len(order)))
+        shared = lengths > 1
+        for start, length in zip(starts[shared], lengths[shared]):
+            members = np.sort(present[order[start:start + length]])
+            if len(members) <= MAX_PAIRWISE_BUCKET:
+                i, j = np.triu_indices(len(members), 1)
+                pairs.append(np.column_stack([members[i], members[j]]))
+            else:
+                pairs.append(np.column_stack([np.full(len(members) - 1, members[0]), members[1:]]))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.concatenate(pairs).astype(np.int64)
+    keys = np.unique(pairs[:, 0] * n_docs + pairs[:, 1])
+    return np.column_stack([keys // n_docs, keys % n_docs])
+
+
+class DuplicateClusters:
+    """
+    Near-duplicate clusters as a row -> canonical row map. The canonical
+    row of a cluster is its first (lowest) row; unique documents map to
+    themselves.
+    """
+
+    def __init__(self, canonical, threshold=None):
+        """
+        Args:
+        - canonical: int array, canonical row for every row.
+        - threshold: Jaccard threshold the clusters were built with.
+        """
+        self.canonical = np.asarray(canonical)
+        self.threshold = threshold
+        # Members grouped by cluster, for expand()
+        self._order = np.argsort(self.canonical, kind='stable')
+        self._starts = np.searchsorted(self.canonical[self._order], np.arange(len(self.canonical) + 1))
+
+    def __len__(self):
+        return len(self.canonical)
+
+    @property
+    def is_canonical(self):
+        return self.canonical == np.arange(len(self.canonical))
+
+    @property
+    def unique_rows(self):
+        return np.flatnonzero(self.is_canonical)
+
+    @property
+    def n_duplicates(self):
+        return len(self.canonical) - len(self.unique_rows)
+
+    def members(self, row):
+        """
+        Every row in the cluster of `row` (canonical first).
+        """
+        root = self.canonical[row]
+        return self._order[self._starts[root]:self._starts[root + 1]]
+
+    def duplicates(self, row):
+        """
+        The other rows in the cluster of `row`.
+        """
+        members = self.members(row)
+        return members[members != row]
+
+    def expand(self, rows):
+        """
+        One array of cluster members per row, e.g. to show every
+        submission behind a ranked canonical resume.
+        """
+        return [self.members(row) for row in rows]
+
+
+def find_duplicates(texts, threshold=0.8, n_perm=128, shingle_size=3, seed=0):
+    """
+    Clusters near-duplicate cleaned resumes with MinHash and LSH banding.
+
+    Candidate pairs from the LSH buckets are kept when their estimated
+    Jaccard similarity (share of equal signature entries) reaches
+    `threshold`; clusters are the connected components of those pairs.
+
+    Args:
+    - texts: TokenColumn or cleaned strings (Preprocessor.clean_text output).
+    - threshold: Jaccard similarity of shingle sets to count as duplicates.
+    - n_perm: MinHash permutations (more = more precise estimates).
+    - shingle_size: Tokens per shingle.
+
+    Returns a DuplicateClusters.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    signatures = minhash_signatures(texts, n_perm, shingle_size, seed)
+    n_docs = len(signatures)
+    bands, rows = lsh_params(threshold, n_perm)
+
+    with timer('dedup.lsh'):
+        pairs = candidate_pairs(signatures, bands, rows)
+        similar = np.zeros(len(pairs), dtype=bool)
+        for start in range(0, len(pairs), 65536):
+            chunk = pairs[start:start + 65536]
+            agreement = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+            similar[start:start + 65536] = agreement >= threshold
+        pairs = pairs[similar]
+    count('dedup.pairs', len(pairs))
+
+    from scipy.sparse.csgraph import connected_components
+
+    graph = sp.csr_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n_docs, n_docs))
+    _, labels = connected_components(graph, directed=False)
+    # Lowest row of each component becomes its canonical row
+    first = np.full(labels.max() + 1 if n_docs else 0, n_docs)
+    np.minimum.at(first, labels, np.arange(n_docs))
+    return DuplicateClusters(first[labels], threshold)
@@ -0,0 +1,343 @@
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.instrumentation import count, timer
+
+DENSE_DIR = 'artifacts/dense'
+DENSE_FORMAT_VERSION = 1
+
+# Below this many resumes every query is answered by an exact scan
+EXACT_SEARCH_LIMIT = 50_000
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class LSAEmbedder:
+    """
+    Dense embeddings from a truncated SVD (LSA) of the TF-IDF matrix.
+    Needs no model files: terms that co-occur across resumes ("pytorch",
+    "deep learning") end up close together, which plain TF-IDF misses.
+    """
+
+    def __init__(self, vectorizer, components=None):
+        """
+        Args:
+        - vectorizer: The fitted TfidfVectorizer of the ResumeRanker.
+        - components: (n_components x n_terms) SVD basis, or None until fit().
+        """
+        self.vectorizer = vectorizer
+        self.components = components
+
+    def fit(self, tfidf_matrix, n_components=256, seed=0):
+        from sklearn.decomposition import TruncatedSVD
+
+        n_components = min(n_components, min(tfidf_matrix.shape) - 1)
+        svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=seed)
+        svd.fit(tfidf_matrix)
+        self.components = svd.components_.astype(np.float32)
+        return self
+
+    def embed_matrix(self, tfidf_matrix):
+        """
+        L2-normalised float32 embeddings for rows of a TF-IDF matrix.
+        """
+        return _normalize_rows(tfidf_matrix @ self.components.T)
+
+    def encode(self, cleaned_texts):
+        return self.embed_matrix(self.vectorizer.transform(cleaned_texts))
+
+
+class SentenceEmbedder:
+    """
+    Embeddings from a locally stored sentence-transformers model (CPU).
+    Optional: requires the sentence-transformers package and a model
+    directory; nothing is downloaded.
+    """
+
+    def __init__(self, model_path):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise ImportError(
+                "Model embeddings require sentence-transformers: pip install sentence-transformers"
+            ) from exc
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(f"No embedding model at {model_path}")
+        self.model_path = model_path
+        self.model = SentenceTransformer(model_path, device='cpu')
+
+    def encode(self, texts):
+        embeddings = self.model.encode(list(texts), batch_size=64, convert_to_numpy=True)
+        return _normalize_rows(embeddings)
+
+
+def _kmeans(vectors, n_clusters, iterations=10, seed=0, chunk=65536):
+    """
+    Spherical k-means on unit vectors. Returns unit-norm centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids, chunk)
+        # Per-cluster sums as a one-hot (clusters x vectors) product
+        one_hot = sp.csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (assignment, np.arange(len(vectors)))),
+            shape=(n_clusters, len(vectors)))
+        sums = np.asarray(one_hot @ vectors)
+        empty = ~np.bincount(assignment, minlength=n_clusters).astype(bool)
+        # Re-seed empty clusters with random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+def _assign(vectors, centroids, chunk=65536):
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        block = np.asarray(vectors[start:start + chunk])
+        assignment[start:start + chunk] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class DenseIndex:
+    """
+    Resume embeddings in a float32 memmap, grouped into inverted lists
+    (IVF) around k-means centroids for approximate nearest-neighbour search.
+
+    A query is compared with the centroids first and only the `nprobe`
+    closest lists are scanned, so the work per query is roughly
+    n_docs * nprobe / n_lists dot products. Small corpora are scanned exactly.
+    """
+
+    def __init__(self, embedder, embeddings, order, centroids, list_offsets, fingerprint=None):
+        """
+        Args:
+        - embeddings: (n_docs x dim) float32, stored in list order.
+        - order: Original row number of each stored embedding.
+        - centroids: (n_lists x dim) unit vectors.
+        - list_offsets: Start of each list in `embeddings` (n_lists + 1).
+        """
+        self.embedder = embedder
+        self.embeddings = embeddings
+        self.order = order
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.fingerprint = fingerprint
+        # Position of each original row in `embeddings`
+        self.position = np.empty(len(order), dtype=np.int64)
+        self.position[order] = np.arange(len(order))
+
+    @property
+    def n_docs(self):
+        return len(self.order)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, ranker, directory=DENSE_DIR, n_components=256, n_lists=None, embedder=None, texts=None):
+        """
+        Embeds every resume of a fitted ranker, clusters the embeddings
+        and writes the index to `directory`.
+
+        Args:
+        - ranker: Fitted ResumeRanker; its TF-IDF matrix feeds LSA.
+        - n_components: LSA dimensions.
+        - n_lists: Number of IVF lists (default about 4 * sqrt(n_docs)).
+        - embedder/texts: Optional model embedder (e.g. SentenceEmbedder)
+          and the resume texts to encode with it, instead of LSA.
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        with timer('dense.embed_corpus'):
+            if embedder is None:
+                embedder = LSAEmbedder(ranker.vectorizer).fit(ranker.resume_matrix, n_components)
+                embeddings = embedder.embed_matrix(ranker.resume_matrix)
+            else:
+                embeddings = embedder.encode(texts)
+
+        n_docs = len(embeddings)
+        n_lists = n_lists or max(1, min(n_docs, int(4 * np.sqrt(n_docs))))
+        with timer('dense.cluster'):
+            # Centroids are trained on a sample; every vector is then assigned
+            rng = np.random.default_rng(0)
+            sample = embeddings[rng.choice(n_docs, min(n_docs, 64 * n_lists), replace=False)]
+            centroids = _kmeans(sample, n_lists)
+            assignment = _assign(embeddings, centroids)
+
+        order = np.argsort(assignment, kind='stable')
+        list_offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        stored = np.lib.format.open_memmap(
+            os.path.join(directory, 'embeddings.npy'), mode='w+', dtype=np.float32, shape=embeddings.shape)
+        stored[:] = embeddings[order]
+        stored.flush()
+        del stored
+
+        np.save(os.path.join(directory, 'order.npy'), order)
+        np.save(os.path.join(directory, 'centroids.npy'), centroids)
+        np.save(os.path.join(directory, 'list_offsets.npy'), list_offsets)
+        if isinstance(embedder, LSAEmbedder):
+            np.save(os.path.join(directory, 'components.npy'), embedder.components)
+        meta = {
+            'version': DENSE_FORMAT_VERSION,
+            'fingerprint': ranker.fingerprint,
+            'embedder': 'lsa' if isinstance(embedder, LSAEmbedder) else 'model',
+            'model_path': getattr(embedder, 'model_path', None),
+        }
+        # Written last, so a partially written directory is never loaded
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return cls.load(ranker, directory)
+
+    @classmethod
+    def load(cls, ranker, directory=DENSE_DIR):
+        """
+        Opens an index written by build(); embeddings stay memory-mapped.
+        Raises FileNotFoundError if there is no index, ValueError if it was
+        built for a different corpus.
+        """
+        try:
+            with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise FileNotFoundError(f"No dense index in {directory}")
+        if meta.get('version') != DENSE_FORMAT_VERSION or meta['fingerprint'] != ranker.fingerprint:
+            raise ValueError(f"Dense index in {directory} does not match the current corpus")
+
+        if meta['embedder'] == 'lsa':
+            embedder = LSAEmbedder(ranker.vectorizer, np.load(os.path.join(directory, 'components.npy')))
+        else:
+            embedder = SentenceEmbedder(meta['model_path'])
+        return cls(
+            embedder,
+            np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'order.npy')),
+            np.load(os.path.join(directory, 'centroids.npy')),
+            np.load(os.path.join(directory, 'list_offsets.npy')),
+            meta['fingerprint'],
+        )
+
+    @classmethod
+    def load_or_build(cls, ranker, directory=DENSE_DIR, **build_args):
+        try:
+            return cls.load(ranker, directory)
+        except (FileNotFoundError, ValueError):
+            return cls.build(ranker, directory, **build_args)
+
+    def embed_queries(self, cleaned_texts):
+        with timer('dense.embed_queries'):
+            return self.embedder.encode(cleaned_texts)
+
+    def score_many(self, query_embeddings, rows=None):
+        """
+        Exact cosine scores (n_queries x n_resumes) in original row order,
+        or only for `rows` if given.
+        """
+        if rows is None:
+            scores = np.empty((len(query_embeddings), self.n_docs), dtype=np.float32)
+            scores[:, self.order] = query_embeddings @ np.asarray(self.embeddings).T
+            return scores
+        return query_embeddings @ np.asarray(self.embeddings[self.position[rows]]).T
+
+    def search(self, query_embedding, k, nprobe=None, allowed=None):
+        """
+        Approximate top-k by cosine for one query embedding.
+
+        Args:
+        - nprobe: Lists to scan (default n_lists / 16). Scanning every
+          list gives the exact answer; corpora below EXACT_SEARCH_LIMIT
+          are always scanned exactly.
+        - allowed: Optional boolean mask over original rows.
+
+        Returns (rows, scores), best first.
+        """
+        count('dense.queries')
+        with timer('dense.search'):
+            if self.n_docs <= EXACT_SEARCH_LIMIT:
+                positions = [(0, self.n_docs)]
+            else:
+                nprobe = min(self.n_lists, nprobe or max(1, self.n_lists // 16))
+                closest = np.argpartition(-(self.centroids @ query_embedding), nprobe - 1)[:nprobe]
+                positions = [(self.list_offsets[c], self.list_offsets[c + 1]) for c in closest]
+
+            candidates, scores = [], []
+            for start, end in positions:
+                if end > start:
+                    candidates.append(self.order[start:end])
+                    scores.append(np.asarray(self.embeddings[start:end]) @ query_embedding)
+            if not candidates:
+                return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+            candidates = np.concatenate(candidates)
+            scores = np.concatenate(scores)
+            if allowed is not None:
+                keep = allowed[candidates]
+                candidates, scores = candidates[keep], scores[keep]
+
+            from src.ranking import top_k_indices
+            # Ties broken by original row, as everywhere else
+            by_row = np.argsort(candidates, kind='stable')
+            candidates, scores = candidates[by_row], scores[by_row]
+            top = top_k_indices(scores, k)
+            return candidates[top], scores[top]
+
+
+def fuse_scores(lexical, dense, weight):
+    """
+    Hybrid score: (1 - weight) * lexical cosine + weight * dense cosine
+    (negative dense similarities count as 0, like non-matching TF-IDF).
+    """
+    if weight <= 0:
+        return lexical
+    return (1 - weight) * lexical + weight * np.maximum(dense, 0)
+
+
+def hybrid_top_k(ranker, dense_index, cleaned_jd, k, weight=0.5, category=None, candidates_per_mode=None, nprobe=None,
+                 allowed=None):
+    """
+    Top-k by fused lexical + dense score without scoring the whole corpus.
+
+    Candidates are the union of the lexical top (inverted index) and the
+    dense ANN top, `candidates_per_mode` each (default 4k); both scores
+    are then computed exactly for those candidates and fused. `allowed`
+    is an optional boolean mask over resumes (e.g. canonical rows only).
+
+    Returns (rows, fused_scores), best first.
+    """
+    if not cleaned_jd:
+        return np.zeros(0, dtype=np.intp), np.zeros(0)
+    pool_size = candidates_per_mode or 4 * k
+    if category == 'All':
+        category = None
+    if category is not None:
+        mask = ranker._category_mask(category)
+        allowed = mask if allowed is None else allowed & mask
+
+    lexical_rows, _ = ranker.top_k(cleaned_jd, pool_size, category)
+    if allowed is not None:
+        lexical_rows = lexical_rows[allowed[lexical_rows]]
+    query = dense_index.embed_queries([cleaned_jd])[0]
+    dense_rows, _ = dense_index.search(query, pool_size, nprobe, allowed)
+
+    rows = np.union1d(lexical_rows, dense_rows)
+    if len(rows) == 0:
+        return rows, np.zeros(0)
+    with timer('dense.fuse'):
+        jd_vector = ranker.vectorizer.transform([cleaned_jd])
+        lexical = (ranker.resume_matrix[rows] @ jd_vector.T).toarray().ravel()
+        dense = dense_index.score_many(query[None, :], rows)[0]
+        fused = fuse_scores(lexical, dense, weight)
+
+    from src.ranking import top_k_indices
+    top = top_k_indices(fused, k)
+    return rows[top], fused[top]
@@ -0,0 +1,137 @@
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.instrumentation import count, timer
+
+DEFAULT_N_FEATURES = 2 ** 18
+
+
+def _hashing_vectorizer(n_features, ngram_range):
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    # Raw counts; IDF and L2 normalisation are applied after merging
+    return HashingVectorizer(n_features=n_features, ngram_range=tuple(ngram_range), stop_words='english',
+                             alternate_sign=False, norm=None, dtype=np.float64)
+
+
+# Per-process vectorizer, created once by _init_worker
+_worker_vectorizer = None
+
+
+def _init_worker(n_features, ngram_range):
+    global _worker_vectorizer
+    _worker_vectorizer = _hashing_vectorizer(n_features, ngram_range)
+
+
+def _count_chunk(texts):
+    return _worker_vectorizer.transform(texts).tocsr()
+
+
+def document_frequencies(counts):
+    """
+    Number of documents containing each feature, for a CSR count block.
+    Frequencies of separately hashed blocks can simply be added.
+    """
+    counts = counts.tocsr()
+    counts.sum_duplicates()
+    return np.bincount(counts.indices, minlength=counts.shape[1])
+
+
+class HashingTfidf:
+    """
+    Stateless alternative to TfidfVectorizer: terms are hashed into a
+    fixed number of columns, so no vocabulary has to be fitted first and
+    chunks of resumes can be counted independently (in parallel, or one
+    chunk at a time). IDF comes from the merged document frequencies.
+
+    Exposes the parts of the TfidfVectorizer interface the ranker uses:
+    fit_transform(), transform() and idf_. Distinct terms may share a
+    column (a collision), and columns cannot be mapped back to terms.
+    """
+
+    def __init__(self, n_features=DEFAULT_N_FEATURES, ngram_range=(1, 1), workers=None, chunksize=2000):
+        """
+        Args:
+        - n_features: Number of hash columns.
+        - ngram_range: (1, 1) for unigrams, (1, 2) to add bigrams.
+        - workers: Processes used by fit_transform (defaults to the CPU count).
+        - chunksize: Resumes hashed per task.
+        """
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.workers = workers
+        self.chunksize = chunksize
+        self.idf_ = None
+        self._vectorizer = None
+
+    def _counts(self, texts):
+        if self._vectorizer is None:
+            self._vectorizer = _hashing_vectorizer(self.n_features, self.ngram_range)
+        return self._vectorizer.transform(texts).tocsr()
+
+    def count_chunks(self, texts):
+        """
+        Raw term-count blocks for `texts`, one CSR matrix per chunk,
+        hashed in a process pool when workers > 1.
+        """
+        chunks = [texts[start:start + self.chunksize] for start in range(0, len(texts), self.chunksize)]
+        workers = max(1, min(self.workers or os.cpu_count() or 1, len(chunks)))
+        if workers == 1:
+            return [self._counts(chunk) for chunk in chunks]
+        with Pool(workers, initializer=_init_worker, initargs=(self.n_features, self.ngram_range)) as pool:
+            return pool.map(_count_chunk, chunks)
+
+    def fit_transform(self, texts):
+        """
+        Hashes the corpus chunk by chunk, sets idf_ from the merged
+        document frequencies and returns the L2-normalised TF-IDF matrix.
+        """
+        texts = list(texts)
+        with timer('hashing.count'):
+            blocks = self.count_chunks(texts) or [sp.csr_matrix((0, self.n_features))]
+        df = sum(document_frequencies(block) for block in blocks)
+        self.set_idf(df, len(texts))
+        count('hashing.docs', len(texts))
+        return self.apply_idf(sp.vstack(blocks, format='csr'))
+
+    def set_idf(self, df, n_docs):
+        # Same smoothed IDF as TfidfVectorizer: ln((1 + n) / (1 + df)) + 1
+        self.idf_ = np.log((1 + n_docs) / (1 + np.asarray(df, dtype=np.float64))) + 1
+        return self
+
+    def apply_idf(self, counts):
+        """
+        Weights a count matrix by idf_ and L2-normalises its rows.
+        """
+        if self.idf_ is None:
+            raise RuntimeError("HashingTfidf has no IDF yet. Call fit_transform() or set_idf() first.")
+        from sklearn.preprocessing import normalize
+
+        weighted = counts.tocsr(copy=True)
+        weighted.data *= self.idf_[weighted.indices]
+        return normalize(weighted, copy=False)
+
+    def column_terms(self, text):
+        """
+        Maps the columns a text hashes into back to the terms of that
+        text (terms sharing a column within it are joined with '/').
+        """
+        from sklearn.feature_extraction import FeatureHasher
+
+        if self._vectorizer is None:
+            self._vectorizer = _hashing_vectorizer(self.n_features, self.ngram_range)
+        terms = sorted(set(self._vectorizer.build_analyzer()(text)))
+        if not terms:
+            return {}
+        # The hasher HashingVectorizer applies to the analyzed terms
+        hasher = FeatureHasher(self.n_features, input_type='string', alternate_sign=False)
+        names = {}
+        for term, column in zip(terms, hasher.transform([[term] for term in terms]).indices.tolist()):
+            names[column] = f"{names[column]}/{term}" if column in names else term
+        return names
+
+    def transform(self, texts):
+        return self.apply_idf(self._counts(list(texts)))
@@ -0,0 +1,178 @@
+import hashlib
+import os
+import sys
+from multiprocessing import Pool
+
+import pandas as pd
+
+from src.instrumentation import count, timer
+from src.pipeline import _report_progress
+
+CSV_PATH = 'Resume/Resume.csv'
+PDF_ROOT = 'data/data'
+TEXT_CACHE_DIR = 'artifacts/pdf_text'
+
+
+def extract_pdf_text(path):
+    """
+    Extracts the text of every page of a PDF, joined by newlines.
+    Unreadable PDFs yield an empty string rather than aborting ingestion.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError as exc:
+        raise ImportError("PDF ingestion requires pypdf: pip install pypdf") from exc
+
+    try:
+        reader = PdfReader(path)
+        return "\n".join(page.extract_text() or '' for page in reader.pages)
+    except Exception as e:
+        print(f"Warning: could not read {path}: {e}", file=sys.stderr)
+        return ""
+
+
+def list_pdf_corpus(root=PDF_ROOT):
+    """
+    Walks root/<CATEGORY>/*.pdf and returns (path, id, category) tuples,
+    sorted by category then file name.
+    """
+    entries = []
+    for category in sorted(os.listdir(root)):
+        category_dir = os.path.join(root, category)
+        if not os.path.isdir(category_dir):
+            continue
+        for name in sorted(os.listdir(category_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() != '.pdf':
+                continue
+            resume_id = int(stem) if stem.isdigit() else stem
+            entries.append((os.path.join(category_dir, name), resume_id, category))
+    return entries
+
+
+def _cache_key(cache_dir, path):
+    """
+    Returns (cache_file, stamp). There is one cache file per PDF path, so
+    re-extracting an edited or replaced file overwrites its old entry; the
+    stamp (mtime + size) on the first line tells whether it is current.
+    """
+    stat = os.stat(path)
+    name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest() + '.txt'
+    return os.path.join(cache_dir, name), f"{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def _read_cached(cache_key):
+    cache_file, stamp = cache_key
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            if f.readline().rstrip('\n') != stamp:
+                return None
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cached(cache_key, text):
+    cache_file, stamp = cache_key
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(f"{stamp}\n{text}")
+    os.replace(tmp_file, cache_file)
+
+
+def load_pdf_corpus(root=PDF_ROOT, cache_dir=TEXT_CACHE_DIR, workers=None, progress=True):
+    """
+    Builds the ID/Category/Resume_str frame straight from the PDF tree.
+
+    Extracted text is cached per file under cache_dir, so re-ingesting an
+    unchanged corpus only reads the cache and new or modified PDFs are the
+    only ones extracted (in a process pool).
+
+    Args:
+    - root: Directory containing one sub-directory per category.
+    - cache_dir: Where extracted text is cached (None disables caching).
+    - workers: Number of extraction processes (defaults to the CPU count).
+    - progress: Print a progress counter to stderr.
+    """
+    return _pdf_frame(list_pdf_corpus(root), cache_dir, workers, progress)
+
+
+def _pdf_frame(entries, cache_dir, workers, progress):
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    texts = [None] * len(entries)
+    cache_keys = [None] * len(entries)
+    pending = []
+    for i, (path, _, _) in enumerate(entries):
+        if cache_dir:
+            cache_keys[i] = _cache_key(cache_dir, path)
+            texts[i] = _read_cached(cache_keys[i])
+        if texts[i] is None:
+            pending.append(i)
+    if cache_dir:
+        count('pdf_cache.hits', len(entries) - len(pending))
+        count('pdf_cache.misses', len(pending))
+
+    if pending:
+        paths = [entries[i][0] for i in pending]
+        workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+        with timer('ingest.extract_pdfs'):
+            if workers == 1:
+                extracted = map(extract_pdf_text, paths)
+                _store_extracted(extracted, pending, texts, cache_keys, progress)
+            else:
+                with Pool(workers) as pool:
+                    extracted = pool.imap(extract_pdf_text, paths, chunksize=8)
+                    _store_extracted(extracted, pending, texts, cache_keys, progress)
+
+    return pd.DataFrame({
+        'ID': [resume_id for _, resume_id, _ in entries],
+        'Category': [category for _, _, category in entries],
+        'Resume_str': texts,
+    })
+
+
+def _store_extracted(extracted, pending, texts, cache_keys, progress):
+    total = len(pending)
+    for done, (i, text) in enumerate(zip(pending, extracted), start=1):
+        texts[i] = text
+        if cache_keys[i]:
+            _write_cached(cache_keys[i], text)
+        if progress and (done % 25 == 0 or done == total):
+            _report_progress(done, total, "Extracting PDFs")
+
+
+def load_resumes(csv_path=CSV_PATH, pdf_root=PDF_ROOT):
+    """
+    Loads the resume dataset from the Kaggle CSV if present, otherwise
+    from the bundled PDF tree. Raises FileNotFoundError if neither exists.
+    """
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path)
+    if os.path.isdir(pdf_root):
+        return load_pdf_corpus(pdf_root)
+    raise FileNotFoundError(f"Neither {csv_path} nor {pdf_root} exists")
+
+
+def iter_resume_chunks(csv_path=CSV_PATH, pdf_root=PDF_ROOT, chunksize=1000,
+                       cache_dir=TEXT_CACHE_DIR, workers=None):
+    """
+    Yields the same ID/Category/Resume_str frames as load_resumes, but
+    `chunksize` resumes at a time, so a corpus of any size can be
+    processed in bounded memory.
+
+    CSV rows are read with pandas' chunked reader (other columns such as
+    Resume_html are never parsed). PDFs are extracted one chunk at a
+    time, through the same text cache as load_pdf_corpus.
+    """
+    if os.path.exists(csv_path):
+        columns = ['ID', 'Category', 'Resume_str']
+        yield from pd.read_csv(csv_path, usecols=lambda c: c in columns, chunksize=chunksize)
+        return
+    if os.path.isdir(pdf_root):
+        entries = list_pdf_corpus(pdf_root)
+        for start in range(0, len(entries), chunksize):
+            yield _pdf_frame(entries[start:start + chunksize], cache_dir, workers, progress=False)
+        return
+    raise FileNotFoundError(f"Neither {csv_path} nor {pdf_root} exists")
@@ -0,0 +1,171 @@
+import json
+import re
+import threading
+import time
+
+
+class _NullTimer:
+    # Returned by disabled profilers, so a timed block costs one method call
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('_profiler', '_name', '_start')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._profiler.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Profiler:
+    """
+    Stage timers and counters for the shortlisting pipeline.
+
+    Stages are timed with `with profiler.timer('stage'):` blocks and
+    events are tallied with profiler.count(). While disabled both return
+    immediately, so instrumented code pays almost nothing.
+
+    Measurements are per process: work done inside multiprocessing
+    workers (see src.pipeline) is only visible as the parent's stage time.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._gauges = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Clears recorded timings and counters (registered gauges are kept).
+        """
+        with self._lock:
+            # stage -> [calls, total seconds, max seconds]
+            self.timings = {}
+            self.counters = {}
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self.timings.get(name)
+            if stats is None:
+                stats = self.timings[name] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """
+        Sets a point-in-time value. `value` may be a callable, which is
+        evaluated whenever a snapshot is taken (e.g. a cache's size).
+        """
+        self._gauges[name] = value
+
+    def snapshot(self):
+        """
+        Returns {'timings': {...}, 'counters': {...}, 'gauges': {...}}
+        as plain JSON-serialisable values.
+        """
+        with self._lock:
+            timings = {
+                name: {
+                    'calls': calls,
+                    'total_s': total,
+                    'mean_ms': total / calls * 1000,
+                    'max_ms': longest * 1000,
+                }
+                for name, (calls, total, longest) in self.timings.items()
+            }
+            counters = dict(self.counters)
+        gauges = {
+            name: value() if callable(value) else value
+            for name, value in self._gauges.items()
+        }
+        return {'timings': timings, 'counters': counters, 'gauges': gauges}
+
+    def write_json(self, path, **labels):
+        """
+        Appends the current snapshot as one JSON line to `path`, together
+        with a timestamp and any extra labels (e.g. run='nightly').
+        """
+        entry = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), **labels, **self.snapshot()}
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def to_prometheus(self, prefix='shortlist'):
+        """
+        Renders the snapshot in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f'# HELP {prefix}_stage_seconds_total Time spent in each pipeline stage.',
+            f'# TYPE {prefix}_stage_seconds_total counter',
+        ]
+        for name, stats in sorted(snapshot['timings'].items()):
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"}} {stats["total_s"]:.6f}')
+        lines += [
+            f'# HELP {prefix}_stage_calls_total Number of times each pipeline stage ran.',
+            f'# TYPE {prefix}_stage_calls_total counter',
+        ]
+        for name, stats in sorted(snapshot['timings'].items()):
+            lines.append(f'{prefix}_stage_calls_total{{stage="{name}"}} {stats["calls"]}')
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = f'{prefix}_{_metric_name(name)}_total'
+            lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+        for name, value in sorted(snapshot['gauges'].items()):
+            metric = f'{prefix}_{_metric_name(name)}'
+            lines += [f'# TYPE {metric} gauge', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        """
+        Human-readable table of stage timings (slowest first) and counters.
+        """
+        snapshot = self.snapshot()
+        lines = [f"{'Stage':32} {'Calls':>8} {'Total (s)':>10} {'Mean (ms)':>10} {'Max (ms)':>10}"]
+        stages = sorted(snapshot['timings'].items(), key=lambda item: -item[1]['total_s'])
+        for name, stats in stages:
+            lines.append(
+                f"{name:32} {stats['calls']:>8} {stats['total_s']:>10.3f} "
+                f"{stats['mean_ms']:>10.2f} {stats['max_ms']:>10.2f}"
+            )
+        for name, value in sorted({**snapshot['counters'], **snapshot['gauges']}.items()):
+            lines.append(f"{name:32} {value:>8}")
+        return '\n'.join(lines)
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+# Process-wide profiler used by the instrumented modules; disabled by default
+profiler = Profiler()
+timer = profiler.timer
+count = profiler.count
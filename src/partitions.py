@@ -0,0 +1,116 @@
+import heapq
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def csr_row_slice(matrix, start, end):
+    """
+    Rows [start, end) of a CSR matrix as a new CSR matrix sharing the
+    data and indices arrays (only the small indptr is rebuilt).
+    """
+    lo, hi = matrix.indptr[start], matrix.indptr[end]
+    return sp.csr_matrix(
+        (matrix.data[lo:hi], matrix.indices[lo:hi], matrix.indptr[start:end + 1] - lo),
+        shape=(end - start, matrix.shape[1]),
+        copy=False,
+    )
+
+
+class CategoryPartitions:
+    """
+    Resume matrix grouped by category so each category is a contiguous
+    block of rows. All blocks share the ranker's vocabulary and IDF, so
+    scores are comparable whichever category filter is applied.
+
+    If the corpus rows are already grouped by category (as the PDF tree
+    and the Kaggle CSV are), the ranker's matrix is used as is; otherwise
+    one reordered copy is made.
+    """
+
+    def __init__(self, matrix, categories):
+        categories = np.asarray(categories)
+        self.order = np.argsort(categories, kind='stable')
+        if np.array_equal(self.order, np.arange(len(self.order))):
+            self.matrix = matrix
+        else:
+            self.matrix = matrix[self.order]
+
+        sorted_categories = categories[self.order]
+        labels, starts = np.unique(sorted_categories, return_index=True)
+        ends = np.append(starts[1:], len(sorted_categories))
+        self.ranges = {
+            str(label): (int(start), int(end))
+            for label, start, end in zip(labels, starts, ends)
+        }
+        self._shards = {}
+
+    @property
+    def labels(self):
+        return list(self.ranges)
+
+    def rows(self, category):
+        """
+        Original row numbers of the resumes in a category, in row order.
+        """
+        start, end = self.ranges.get(category, (0, 0))
+        return self.order[start:end]
+
+    def shard(self, category):
+        """
+        Zero-copy CSR view over the rows of one category.
+        """
+        shard = self._shards.get(category)
+        if shard is None:
+            start, end = self.ranges.get(category, (0, 0))
+            shard = csr_row_slice(self.matrix, start, end)
+            self._shards[category] = shard
+        return shard
+
+    def score_many(self, jd_matrix, category):
+        """
+        (n_jds x n_resumes_in_category) cosine scores, aligned with rows(category).
+        """
+        return (self.shard(category) @ jd_matrix.T).T.toarray()
+
+    def top_k_many(self, jd_matrix, k, category=None, workers=None):
+        """
+        Per-JD top-k over one category, or over all categories with the
+        shards scored in parallel threads and their top-k lists merged.
+
+        Returns one (indices, scores) pair per JD, best first, with
+        indices into the original rows and ties broken by row number.
+        Rows scoring 0 (no term shared with the JD) are left out.
+        """
+        from src.ranking import top_k_indices
+
+        labels = [category] if category is not None else self.labels
+
+        def shard_top_k(label):
+            rows = self.rows(label)
+            scores = self.score_many(jd_matrix, label)
+            results = []
+            for role_scores in scores:
+                top = top_k_indices(role_scores, k)
+                results.append([(-role_scores[i], rows[i]) for i in top if role_scores[i] > 0])
+            return results
+
+        workers = workers or min(len(labels), os.cpu_count() or 1)
+        if workers > 1 and len(labels) > 1:
+            with ThreadPoolExecutor(workers) as pool:
+                per_shard = list(pool.map(shard_top_k, labels))
+        else:
+            per_shard = [shard_top_k(label) for label in labels]
+
+        results = []
+        for role in range(jd_matrix.shape[0]):
+            # k-way merge of the shards' sorted (-score, row) lists
+            merged = list(itertools.islice(heapq.merge(*(shard[role] for shard in per_shard)), k))
+            results.append((
+                np.array([row for _, row in merged], dtype=np.intp),
+                np.array([-neg_score for neg_score, _ in merged]),
+            ))
+        return results
@@ -0,0 +1,77 @@
+import os
+import sys
+from multiprocessing import Pool
+
+from src.instrumentation import count, timer
+from src.preprocessing import Preprocessor
+from src.skills import SkillExtractor
+
+# Per-process state, created once by _init_worker
+_worker_preprocessor = None
+_worker_extractor = None
+
+
+def _init_worker(fast):
+    global _worker_preprocessor, _worker_extractor
+    _worker_preprocessor = Preprocessor(fast=fast)
+    _worker_extractor = SkillExtractor()
+
+
+def _process_one(text):
+    return (
+        _worker_preprocessor.clean_text(text),
+        _worker_extractor.extract_skills(text),
+    )
+
+
+def _report_progress(done, total, label):
+    sys.stderr.write(f"\r{label}: {done}/{total} resumes")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def _collect(outputs, total, report_every, progress):
+    results = []
+    for result in outputs:
+        results.append(result)
+        if progress and (len(results) % report_every == 0 or len(results) == total):
+            _report_progress(len(results), total, "Preprocessing")
+    return results
+
+
+def preprocess_corpus(texts, workers=None, chunksize=64, fast=True, progress=True):
+    """
+    Cleans and skill-extracts a corpus of raw resume texts in a process pool.
+
+    Args:
+    - texts: Iterable of raw resume strings.
+    - workers: Number of worker processes (defaults to the CPU count).
+      1 runs everything in the current process.
+    - chunksize: Number of resumes sent to a worker per task.
+    - fast: Passed to Preprocessor (see Preprocessor.__init__).
+    - progress: Print a progress counter to stderr.
+
+    Returns (cleaned_texts, skills) as two lists in input order.
+    """
+    texts = list(texts)
+    total = len(texts)
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, total))
+    # Refresh the counter about every 1%, but at most once per chunk
+    report_every = max(chunksize, total // 100, 1)
+
+    # Per-document stages run in the workers; only the total is timed here
+    with timer('pipeline.preprocess_corpus'):
+        if workers == 1:
+            _init_worker(fast)
+            results = _collect(map(_process_one, texts), total, report_every, progress)
+        else:
+            with Pool(workers, initializer=_init_worker, initargs=(fast,)) as pool:
+                outputs = pool.imap(_process_one, texts, chunksize=chunksize)
+                results = _collect(outputs, total, report_every, progress)
+    count('pipeline.docs', total)
+
+    cleaned = [cleaned_text for cleaned_text, _ in results]
+    skills = [found for _, found in results]
+    return cleaned, skills
@@ -1,48 +1,148 @@
-
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-
-# Ensure resources are downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
+from functools import lru_cache
+
+from src import resources
+from src.instrumentation import count, profiler, timer
+
+# Everything except letters, digits and whitespace
+_SPECIAL_CHARS_RE = re.compile(r'[^a-zA-Z0-9\s]')
+
+# Treebank contractions that nltk.word_tokenize still splits once
+# punctuation is gone (the others need an apostrophe)
+_TREEBANK_SPLITS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na'),
+}
+
+LEMMA_CACHE_SIZE = 200_000
+
+# NLTK is imported and its data loaded on first use rather than at
+# import time (see src.resources), so importing this module is cheap and
+# never touches the network
+
+
+@lru_cache(maxsize=None)
+def _stop_words():
+    resources.ensure('stopwords')
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+
+@lru_cache(maxsize=None)
+def _lemmatizer():
+    resources.ensure('wordnet')
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+
+@lru_cache(maxsize=None)
+def _word_tokenize():
+    resources.ensure(resources.tokenizer_resource())
+    from nltk import word_tokenize
+    return word_tokenize
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def _cached_lemmatize(word):
+    # Shared by every Preprocessor, so repeated resume vocabulary is
+    # only looked up in WordNet once per process
+    return _lemmatizer().lemmatize(word)
+
+
+profiler.gauge('lemma_cache.hits', lambda: _cached_lemmatize.cache_info().hits)
+profiler.gauge('lemma_cache.misses', lambda: _cached_lemmatize.cache_info().misses)
+
+
+def _fast_tokenize(text):
+    """
+    Whitespace tokenizer equivalent to nltk.word_tokenize on text that
+    only contains [a-z0-9] and whitespace.
+    """
+    tokens = []
+    for token in text.split():
+        split = _TREEBANK_SPLITS.get(token)
+        if split:
+            tokens.extend(split)
+        else:
+            tokens.append(token)
+    return tokens
+
 
 class Preprocessor:
-    def __init__(self):
-        self.stop_words = set(stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
+    def __init__(self, fast=False):
+        """
+        Args:
+        - fast: Use the whitespace tokenizer and the shared lemma cache
+          instead of nltk.word_tokenize and an uncached lemmatizer.
+          Produces the same output (see check_fast_parity).
+        """
+        self.fast = fast
+        self._stop_words = None
+
+    @property
+    def stop_words(self):
+        if self._stop_words is None:
+            self._stop_words = _stop_words()
+        return self._stop_words
+
+    @property
+    def lemmatizer(self):
+        return _lemmatizer()
 
     def clean_text(self, text):
         if not isinstance(text, str):
             return ""
-        
+
+        with timer('preprocess.clean_text'):
+            processed_tokens = self._clean_tokens(text)
+        count('preprocess.docs')
+        count('preprocess.tokens', len(processed_tokens))
+        return " ".join(processed_tokens)
+
+    def _clean_tokens(self, text):
         # Lowercase
         text = text.lower()
-        
+
         # Remove special characters
-        text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-        
+        text = _SPECIAL_CHARS_RE.sub('', text)
+
+        if self.fast:
+            stop_words = self.stop_words
+            return [
+                _cached_lemmatize(word)
+                for word in _fast_tokenize(text)
+                if word not in stop_words
+            ]
+
         # Tokenization
-        tokens = nltk.word_tokenize(text)
-        
+        tokens = _word_tokenize()(text)
+
         # Remove stopwords and lemmatize
-        processed_tokens = [
-            self.lemmatizer.lemmatize(word) 
-            for word in tokens 
-            if word not in self.stop_words
+        lemmatizer = self.lemmatizer
+        stop_words = self.stop_words
+        return [
+            lemmatizer.lemmatize(word)
+            for word in tokens
+            if word not in stop_words
         ]
-        
-        return " ".join(processed_tokens)
+
+
+def check_fast_parity(texts):
+    """
+    Cleans each text with both the NLTK path and the fast path and
+    returns (index, nltk_output, fast_output) for every difference.
+    An empty list means the fast mode is safe to use on this corpus.
+    """
+    reference = Preprocessor(fast=False)
+    fast = Preprocessor(fast=True)
+    mismatches = []
+    for i, text in enumerate(texts):
+        expected = reference.clean_text(text)
+        actual = fast.clean_text(text)
+        if expected != actual:
+            mismatches.append((i, expected, actual))
+    return mismatches
@@ -1,53 +1,539 @@
+import hashlib
+import os
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
+
+from src.instrumentation import count, timer
+from src.partitions import CategoryPartitions
+from src.retrieval import InvertedIndex
+
+INDEX_FORMAT_VERSION = 1
+
+
+FEATURE_MODES = ('tfidf', 'hashing')
+
+
+def make_vectorizer(features='tfidf', n_features=None, ngram_range=(1, 1), workers=None):
+    """
+    The vectorizer used for every index. sklearn is imported here, on
+    first use, so importing this module stays cheap.
+
+    Args:
+    - features: 'tfidf' (fitted vocabulary of the 5000 most frequent
+      terms) or 'hashing' (stateless feature hashing, see HashingTfidf).
+    - n_features/ngram_range/workers: Hashing mode only.
+    """
+    if features == 'hashing':
+        from src.hashing import DEFAULT_N_FEATURES, HashingTfidf
+
+        return HashingTfidf(n_features or DEFAULT_N_FEATURES, ngram_range, workers)
+    if features != 'tfidf':
+        raise ValueError(f"Unknown feature mode: {features} (expected one of {FEATURE_MODES})")
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(max_features=5000, stop_words='english')
+
+
+def vocabulary_terms(vocabulary):
+    """
+    Term of every column of a fitted vocabulary (term -> column dict).
+    """
+    terms = np.empty(len(vocabulary), dtype=object)
+    for term, column in vocabulary.items():
+        terms[column] = term
+    return terms
+
+
+def corpus_fingerprint(resumes):
+    """
+    Returns a stable hash of a list of preprocessed resumes.
+    Used to detect when a saved index no longer matches the corpus.
+    """
+    digest = hashlib.sha1()
+    for text in resumes:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
 
 class ResumeRanker:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=5000, stop_words='english')
-        
+    def __init__(self, features='tfidf', n_features=None, ngram_range=(1, 1), workers=None):
+        """
+        Args: see make_vectorizer. The default is the fitted TF-IDF
+        vocabulary; features='hashing' builds the index without one.
+        """
+        self.features = features
+        self.vectorizer = make_vectorizer(features, n_features, ngram_range, workers)
+        # Fitted index state (see fit / load)
+        self.resume_matrix = None
+        self.fingerprint = None
+        self.categories = None
+        self._inverted_index = None
+        self._category_masks = {}
+        self._partitions = None
+        # Column -> term lookup for explain(), built on first use
+        self._terms = None
+
+    @property
+    def is_fitted(self):
+        return self.resume_matrix is not None
+
+    def fit(self, resumes, categories=None):
+        """
+        Fits the vectorizer on the resume corpus and stores the
+        L2-normalised TF-IDF matrix so job descriptions can be scored
+        without refitting.
+
+        Args:
+        - resumes: List of preprocessed resume strings.
+        - categories: Optional category per resume, used by top_k(category=...).
+        """
+        resumes = _as_list(resumes)
+        with timer('ranking.fit'):
+            self.resume_matrix = self.vectorizer.fit_transform(resumes).tocsr()
+        self._terms = None
+        self.fingerprint = corpus_fingerprint(resumes)
+        self.set_categories(categories)
+        count('ranking.docs_indexed', len(resumes))
+        count('ranking.index_nnz', self.resume_matrix.nnz)
+        return self
+
+    def set_categories(self, categories):
+        """
+        Attaches one category label per resume row (or None to clear them).
+        """
+        if categories is not None:
+            categories = np.asarray(_as_list(categories), dtype=str)
+            if self.resume_matrix is not None and len(categories) != self.resume_matrix.shape[0]:
+                raise ValueError("Expected one category per resume")
+        self.categories = categories
+        self._category_masks = {}
+        self._partitions = None
+
+    def exclude_rows(self, rows):
+        """
+        Empties the given rows of the index (e.g. near-duplicates of
+        another resume): they hold no postings, cost nothing per query
+        and score 0. Row numbers stay the same.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+        keep = np.ones(self.resume_matrix.shape[0])
+        keep[rows] = 0
+        matrix = (sp.diags(keep) @ self.resume_matrix).tocsr()
+        matrix.eliminate_zeros()
+        self.resume_matrix = matrix
+        # Views of the old matrix are rebuilt on next use
+        self._inverted_index = None
+        self._partitions = None
+        count('ranking.rows_excluded', len(keep) - int(keep.sum()))
+        return self
+
+    @property
+    def partitions(self):
+        """
+        CategoryPartitions over the fitted matrix, built on first use.
+        """
+        if self.categories is None:
+            raise ValueError("No categories attached to this ranker; pass categories to fit()")
+        if self._partitions is None:
+            self._partitions = CategoryPartitions(self.resume_matrix, self.categories)
+        return self._partitions
+
+    def category_rows(self, category):
+        """
+        Row numbers of the resumes in `category` (all rows for None or 'All').
+        """
+        if category is None or category == 'All':
+            return np.arange(self.resume_matrix.shape[0])
+        return self.partitions.rows(category)
+
+    def score(self, job_description):
+        """
+        Scores the fitted corpus against a preprocessed job description.
+        Costs one transform of the JD and one sparse mat-vec.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+
+        n_resumes = self.resume_matrix.shape[0]
+        if not job_description:
+            return np.zeros(n_resumes)
+
+        with timer('ranking.transform'):
+            jd_vector = self.vectorizer.transform([job_description])
+        count('ranking.queries')
+        with timer('ranking.score'):
+            # Rows are already L2-normalised, so the dot product is the cosine
+            return (self.resume_matrix @ jd_vector.T).toarray().ravel()
+
+    def score_many(self, job_descriptions, category=None):
+        """
+        Scores several preprocessed job descriptions in one sparse
+        matrix product.
+
+        Returns an (n_job_descriptions x n_resumes) array of cosine scores.
+        Empty job descriptions get a row of zeros. With a category, only
+        that category's rows are scored and the columns line up with
+        category_rows(category).
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+
+        job_descriptions = _as_list(job_descriptions)
+        filtered = category is not None and category != 'All'
+        n_resumes = len(self.category_rows(category)) if filtered else self.resume_matrix.shape[0]
+        if not job_descriptions:
+            return np.zeros((0, n_resumes))
+
+        # Empty strings transform to all-zero rows, which score 0 everywhere
+        with timer('ranking.transform'):
+            jd_matrix = self.vectorizer.transform(job_descriptions)
+        return self.score_vectors(jd_matrix, category)
+
+    def score_vectors(self, jd_matrix, category=None):
+        """
+        score_many for job descriptions that are already transformed
+        (rows of vectorizer.transform output).
+        """
+        count('ranking.queries', jd_matrix.shape[0])
+        with timer('ranking.score_many'):
+            if category is not None and category != 'All':
+                return self.partitions.score_many(jd_matrix, category)
+            # Only the small JD side changes format (jd_matrix @ resume_matrix.T
+            # would convert the whole index on every call)
+            return (self.resume_matrix @ jd_matrix.T).T.toarray()
+
+    def top_k_many(self, job_descriptions, k, category=None, workers=None):
+        """
+        Top-k resumes for each preprocessed job description. Category
+        shards are scored in parallel and their top-k lists merged; a
+        category restricts the search to its shard.
+
+        Returns one (indices, scores) pair per job description. As with
+        top_k, resumes sharing no term with the JD are not returned.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+        if category == 'All':
+            category = None
+        if category is not None and self.categories is None:
+            raise ValueError("No categories attached to this ranker; pass categories to fit()")
+
+        with timer('ranking.transform'):
+            jd_matrix = self.vectorizer.transform(_as_list(job_descriptions))
+        count('ranking.queries', jd_matrix.shape[0])
+        with timer('ranking.top_k_many'):
+            if self.categories is None:
+                scores = (self.resume_matrix @ jd_matrix.T).T.toarray()
+                results = []
+                for row, top in zip(scores, top_k_indices(scores, k)):
+                    top = top[row[top] > 0]
+                    results.append((top, row[top]))
+                return results
+            return self.partitions.top_k_many(jd_matrix, k, category, workers)
+
+    def top_k(self, job_description, k, category=None):
+        """
+        Exact top-k resumes for a preprocessed job description, computed
+        from the inverted index so only the JD's posting lists are read.
+
+        Args:
+        - job_description: Preprocessed job description string.
+        - k: Number of resumes to return.
+        - category: Optional category label to restrict results to.
+
+        Returns (indices, scores) as arrays, best first. Resumes sharing
+        no term with the JD are not returned.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+
+        if self._inverted_index is None:
+            with timer('ranking.build_inverted_index'):
+                self._inverted_index = InvertedIndex(self.resume_matrix)
+
+        if category == 'All':
+            category = None
+
+        allowed = None
+        if category is not None:
+            allowed = self._category_mask(category)
+
+        if not job_description:
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+        with timer('ranking.transform'):
+            jd_vector = self.vectorizer.transform([job_description])
+        count('ranking.queries')
+        with timer('ranking.top_k'):
+            return self._inverted_index.search(jd_vector, k, allowed)
+
+    def explain(self, job_description, rows, n_terms=5, jd_vector=None):
+        """
+        Top contributing terms of each resume in `rows` to its score for a
+        preprocessed job description: the largest entries of the
+        elementwise product of the JD vector and the resume row (all of
+        them sum to the score). Only the given rows are read, by
+        intersecting their sparse columns with the JD's, so explaining the
+        k results of a ranking costs microseconds per candidate.
+
+        Args:
+        - job_description: Preprocessed job description string.
+        - rows: Resume row numbers (e.g. the indices returned by top_k).
+        - n_terms: Terms kept per resume.
+        - jd_vector: The JD's vectorizer row, when already transformed.
+
+        Returns one list of (term, contribution) pairs per row, largest first.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+
+        rows = np.asarray(rows, dtype=np.intp)
+        if not job_description or len(rows) == 0:
+            return [[] for _ in rows]
+        if jd_vector is None:
+            with timer('ranking.transform'):
+                jd_vector = self.vectorizer.transform([job_description])
+
+        jd_vector = sp.csr_matrix(jd_vector)
+        if jd_vector.nnz == 0:
+            # Only stopwords or unknown terms: nothing contributes
+            return [[] for _ in rows]
+
+        with timer('ranking.explain'):
+            jd_vector.sort_indices()
+            candidates = self.resume_matrix[rows]
+            # Position of each resume column among the JD's columns
+            positions = np.minimum(np.searchsorted(jd_vector.indices, candidates.indices), jd_vector.nnz - 1)
+            shared = jd_vector.indices[positions] == candidates.indices
+            owner = np.repeat(np.arange(len(rows)), np.diff(candidates.indptr))[shared]
+            columns = candidates.indices[shared]
+            contributions = candidates.data[shared] * jd_vector.data[positions[shared]]
+            names = self._term_names(job_description, np.unique(columns))
+
+            explanations = [[] for _ in rows]
+            # Largest contribution first within each resume, then keep n_terms
+            for i in np.lexsort((-contributions, owner)):
+                if len(explanations[owner[i]]) < n_terms:
+                    explanations[owner[i]].append((names[columns[i]], float(contributions[i])))
+        count('ranking.explained', len(rows))
+        return explanations
+
+    def _term_names(self, job_description, columns):
+        # Hashed columns have no vocabulary, so they are mapped back
+        # through the JD's own terms (every shared column comes from one)
+        if self.features == 'hashing':
+            return self.vectorizer.column_terms(job_description)
+        if self._terms is None:
+            self._terms = vocabulary_terms(self.vectorizer.vocabulary_)
+        return {column: self._terms[column] for column in columns.tolist()}
+
+    def _category_mask(self, category):
+        if self.categories is None:
+            raise ValueError("No categories attached to this ranker; pass categories to fit()")
+        mask = self._category_masks.get(category)
+        if mask is None:
+            mask = self.categories == category
+            self._category_masks[category] = mask
+        return mask
+
+    def save(self, path):
+        """
+        Writes the vocabulary (or hashing parameters), IDF weights and CSR
+        arrays to a .npz file.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() first.")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        matrix = self.resume_matrix
+        extra = self._index_arrays()
+        if self.features != 'tfidf':
+            extra['features'] = np.array(self.features)
+        if self.features == 'hashing':
+            extra['ngram_range'] = np.array(self.vectorizer.ngram_range)
+            terms = np.array([], dtype=str)
+        else:
+            terms = vocabulary_terms(self.vectorizer.vocabulary_)
+        if self.categories is not None:
+            extra['categories'] = self.categories
+        np.savez(
+            path,
+            **extra,
+            version=np.array(INDEX_FORMAT_VERSION),
+            fingerprint=np.array(self.fingerprint or ''),
+            terms=terms.astype(str),
+            idf=self.vectorizer.idf_,
+            data=matrix.data,
+            indices=matrix.indices,
+            indptr=matrix.indptr,
+            shape=np.array(matrix.shape),
+        )
+
+    def _index_params(self):
+        # Scorer parameters a subclass stores with the index (see BM25Ranker)
+        return {}
+
+    def _index_arrays(self):
+        # Extra arrays a subclass stores with the index, parameters included
+        return self._index_params()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Restores a ranker previously written with save(), as the class
+        (and feature mode) it was saved from.
+        """
+        with timer('ranking.load'), np.load(path) as archive:
+            if int(archive['version']) != INDEX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported index format in {path}")
+
+            shape = tuple(archive['shape'])
+            features = str(archive['features']) if 'features' in archive.files else 'tfidf'
+            if features == 'hashing':
+                ranker = ResumeRanker('hashing', n_features=shape[1], ngram_range=archive['ngram_range'].tolist())
+            else:
+                if features == 'bm25':
+                    from src.bm25 import BM25Ranker
+                    ranker = BM25Ranker(*archive['bm25_params'].tolist())
+                else:
+                    ranker = ResumeRanker()
+                ranker.vectorizer.vocabulary_ = {
+                    term: column for column, term in enumerate(archive['terms'].tolist())
+                }
+            ranker.vectorizer.idf_ = archive['idf']
+            ranker.resume_matrix = sp.csr_matrix(
+                (archive['data'], archive['indices'], archive['indptr']),
+                shape=shape,
+            )
+            ranker.fingerprint = str(archive['fingerprint']) or None
+            if 'categories' in archive.files:
+                ranker.set_categories(archive['categories'])
+        return ranker
+
+    @classmethod
+    def load_or_fit(cls, path, resumes, categories=None, **kwargs):
+        """
+        Loads the index at `path` if it was built from the same corpus
+        with the same feature settings, otherwise fits a new one and
+        saves it there.
+
+        Args:
+        - path: .npz file written by save().
+        - resumes: List of preprocessed resume strings.
+        - categories: Optional category per resume, see fit().
+        - kwargs: Constructor arguments (features, n_features, ...).
+        """
+        resumes = _as_list(resumes)
+        ranker = cls(**kwargs)
+        if os.path.exists(path):
+            try:
+                saved = cls.load(path)
+                if (saved.fingerprint == corpus_fingerprint(resumes)
+                        and saved._settings() == ranker._settings()):
+                    saved.set_categories(categories)
+                    return saved
+            except (OSError, ValueError, KeyError):
+                # Corrupt or outdated index file, rebuild below
+                pass
+
+        ranker.fit(resumes, categories)
+        ranker.save(path)
+        return ranker
+
+    def _settings(self):
+        # Feature settings a saved index must match to be reused
+        if self.features == 'hashing':
+            return (self.features, self.vectorizer.n_features, tuple(self.vectorizer.ngram_range))
+        return (self.features,)
+
     def score_resumes(self, resumes, job_description):
         """
         Calculates similarity scores using TF-IDF and Cosine Similarity.
-        
+        Fits a throwaway vocabulary on the given resumes; prefer
+        fit() + score() when the same corpus is queried repeatedly.
+
         Args:
         - resumes: List of preprocessed resume strings.
         - job_description: Preprocessed job description string.
         """
-        if isinstance(resumes, pd.Series):
-            resumes = resumes.tolist()
-        elif not isinstance(resumes, list):
-             # Ensure it's a list if it's some other iterable
-            resumes = list(resumes)
+        resumes = _as_list(resumes)
 
         if not resumes:
             return []
-            
+
         # If JD is empty after cleaning, return 0 scores for all
         if not job_description:
             return [0.0] * len(resumes)
-            
+
         # Combine JD and resumes into one list for vectorization
         corpus = [job_description] + resumes
-        
+
+        # Use a separate vectorizer so a fitted index is never overwritten
+        vectorizer = make_vectorizer()
         try:
-            tfidf_matrix = self.vectorizer.fit_transform(corpus)
+            tfidf_matrix = vectorizer.fit_transform(corpus)
         except ValueError:
             # Handle cases where vocabulary is empty (e.g. only stopwords)
             return [0.0] * len(resumes)
-        
+
         # JD vector is the first item
         jd_vector = tfidf_matrix[0]
-        
+
         # Resume vectors are the rest
         resume_vectors = tfidf_matrix[1:]
-        
+
         # Compute cosine similarity
+        from sklearn.metrics.pairwise import cosine_similarity
         similarities = cosine_similarity(jd_vector, resume_vectors)
-        
+
         # Flatten to 1D array
         sim_scores = similarities.flatten()
-        
+
         return sim_scores
+
+
+def top_k_indices(scores, k):
+    """
+    Returns the indices of the k highest scores, best first, without
+    sorting the whole array. Equal scores are ordered by index.
+
+    Works on a 1D score vector or row-wise on a 2D (roles x resumes)
+    score matrix. Entries equal to -inf (e.g. filtered out) are dropped
+    from 1D results.
+    """
+    scores = np.asarray(scores)
+    if scores.ndim == 2:
+        return [top_k_indices(row, k) for row in scores]
+
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+
+    if k < n:
+        # k-th largest value, then ties at that value resolved by index
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n)
+    # Sort the k candidates only: best score first, ties by index
+    order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return order[scores[order] != -np.inf]
+
+
+def _as_list(resumes):
+    if isinstance(resumes, pd.Series):
+        return resumes.tolist()
+    if not isinstance(resumes, list):
+        # Ensure it's a list if it's some other iterable
+        return list(resumes)
+    return resumes
@@ -0,0 +1,129 @@
+"""
+NLTK data needed by the preprocessor, loaded on first use.
+
+Nothing here touches NLTK (or the network) at import time. For
+air-gapped machines, bundle the data once on a connected machine and
+point NLTK_DATA at the copy:
+
+    python -m src.resources bundle nltk_data
+    NLTK_DATA=nltk_data python -m src.resources verify
+"""
+import argparse
+import os
+import sys
+
+# Download name -> path probed with nltk.data.find
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+
+# Set SHORTLIST_NLTK_DOWNLOAD=0 on machines without network access, so a
+# missing resource fails fast instead of waiting on a download
+AUTO_DOWNLOAD = os.environ.get('SHORTLIST_NLTK_DOWNLOAD', '1') != '0'
+
+_available = set()
+
+
+def tokenizer_resource():
+    """
+    Punkt data used by nltk.word_tokenize: punkt_tab from NLTK 3.8.2 on
+    (the release that added PunktTokenizer), punkt before that.
+    """
+    import nltk.tokenize
+
+    return 'punkt_tab' if hasattr(nltk.tokenize, 'PunktTokenizer') else 'punkt'
+
+
+def required():
+    """
+    Resources the preprocessor needs with the installed NLTK version.
+    """
+    return ['stopwords', 'wordnet', tokenizer_resource()]
+
+
+def is_available(name):
+    import nltk
+
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+    except LookupError:
+        return False
+    return True
+
+
+def ensure(*names):
+    """
+    Makes sure the named NLTK resources can be loaded, downloading the
+    missing ones when AUTO_DOWNLOAD is on. Each resource is only checked
+    once per process.
+
+    Raises LookupError if a resource is missing and cannot be downloaded.
+    """
+    for name in names:
+        if name in _available:
+            continue
+        if not is_available(name):
+            if AUTO_DOWNLOAD:
+                import nltk
+                nltk.download(name, quiet=True)
+            if not is_available(name):
+                raise LookupError(
+                    f"NLTK resource '{name}' not found. Run 'python -m src.resources bundle <dir>' "
+                    f"on a machine with network access and set NLTK_DATA=<dir>."
+                )
+        _available.add(name)
+
+
+def missing(names=None):
+    """
+    Returns the resources (default: required()) that cannot be found.
+    """
+    return [name for name in (names or required()) if not is_available(name)]
+
+
+def bundle(directory, names=None):
+    """
+    Downloads the resources into `directory` for offline use. Returns
+    the names that failed to download.
+    """
+    import nltk
+
+    os.makedirs(directory, exist_ok=True)
+    failed = []
+    for name in names or required():
+        if not nltk.download(name, download_dir=directory, quiet=True):
+            failed.append(name)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle or verify the NLTK data used by the preprocessor.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    bundle_parser = commands.add_parser('bundle', help='Download every resource into a directory')
+    bundle_parser.add_argument('directory')
+    verify_parser = commands.add_parser('verify', help='Check every resource can be found (exit 1 if not)')
+    verify_parser.add_argument('--dir', help='Extra data directory to search (in addition to NLTK_DATA)')
+    args = parser.parse_args()
+
+    if args.command == 'bundle':
+        failed = bundle(args.directory)
+        if failed:
+            print(f"Failed to download: {', '.join(failed)}")
+            return 1
+        print(f"NLTK data written to {args.directory}; set NLTK_DATA={args.directory} to use it.")
+        return 0
+
+    if args.dir:
+        import nltk
+        nltk.data.path.insert(0, args.dir)
+    not_found = missing()
+    for name in required():
+        print(f"{'missing' if name in not_found else 'ok':8} {name}")
+    return 1 if not_found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
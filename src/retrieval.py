@@ -0,0 +1,144 @@
+import threading
+
+import numpy as np
+
+
+class InvertedIndex:
+    """
+    Term -> postings view of a TF-IDF resume matrix for exact top-k
+    cosine retrieval.
+
+    Query terms are processed in decreasing order of their best possible
+    contribution (query weight x max posting weight), MaxScore style.
+    Once the summed bound of the remaining terms can no longer lift an
+    unseen resume past the current k-th score, those terms are only
+    looked up for the resumes already in the running, so the work done
+    depends on the query's posting lists rather than the corpus size.
+    The current top k is kept up to date from the resumes each term
+    changes, so the k-th score costs O(k + postings) per term.
+    """
+
+    def __init__(self, matrix):
+        """
+        Args:
+        - matrix: CSR (resumes x terms) matrix with L2-normalised rows,
+          e.g. ResumeRanker.resume_matrix.
+        """
+        postings = matrix.tocsc()
+        postings.sort_indices()
+        self.n_docs, self.n_terms = matrix.shape
+        self.indptr = postings.indptr
+        self.doc_ids = postings.indices
+        self.weights = postings.data
+
+        lengths = np.diff(self.indptr)
+        self.max_weight = np.zeros(self.n_terms)
+        non_empty = lengths > 0
+        self.max_weight[non_empty] = np.maximum.reduceat(self.weights, self.indptr[:-1][non_empty])
+
+        # Score accumulators are reused between queries (one set per thread)
+        self._local = threading.local()
+
+    def _buffers(self):
+        local = self._local
+        if not hasattr(local, 'scores'):
+            local.scores = np.zeros(self.n_docs)
+            local.seen = np.zeros(self.n_docs, dtype=bool)
+            local.in_top = np.zeros(self.n_docs, dtype=bool)
+        return local.scores, local.seen, local.in_top
+
+    def postings(self, term):
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def search(self, query, k, allowed=None):
+        """
+        Exact top-k by dot product with a sparse query vector.
+
+        Args:
+        - query: 1 x n_terms sparse row (e.g. a transformed JD).
+        - k: Number of results.
+        - allowed: Optional boolean mask over resumes; others are skipped.
+
+        Returns (doc_indices, scores), best first, ties broken by row
+        order. Only resumes sharing at least one term with the query are
+        returned, so there may be fewer than k.
+        """
+        query = query.tocsr()
+        terms, query_weights = query.indices, query.data
+        bounds = query_weights * self.max_weight[terms]
+        useful = bounds > 0
+        if k <= 0 or not useful.any():
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+
+        order = np.argsort(-bounds[useful], kind='stable')
+        terms = terms[useful][order]
+        query_weights = query_weights[useful][order]
+        # remaining[i]: best total the terms i.. can still add to any resume
+        remaining = np.append(np.cumsum(bounds[useful][order][::-1])[::-1], 0.0)
+
+        scores, seen, in_top = self._buffers()
+        # Every resume written to; all of them are reset before returning
+        touched = []
+        try:
+            best = np.zeros(0, dtype=self.doc_ids.dtype)
+            threshold = -np.inf
+            i = 0
+            # Essential terms: every posting may introduce a new candidate
+            while i < len(terms):
+                docs, weights = self.postings(terms[i])
+                if allowed is not None:
+                    keep = allowed[docs]
+                    docs, weights = docs[keep], weights[keep]
+                scores[docs] += query_weights[i] * weights
+                new_docs = docs[~seen[docs]]
+                seen[new_docs] = True
+                touched.append(new_docs)
+                i += 1
+
+                best, threshold = self._update_top(scores, in_top, best, docs, k)
+                # Strict so that an unseen resume cannot even tie the k-th score
+                if remaining[i] < threshold:
+                    break
+
+            candidates = np.concatenate(touched)
+
+            # Non-essential terms: only update resumes still able to make the top k
+            while i < len(terms) and len(candidates):
+                candidates = candidates[scores[candidates] + remaining[i] >= threshold]
+                docs, weights = self.postings(terms[i])
+                if len(candidates) * np.log2(len(docs) + 1) < len(docs):
+                    positions = np.searchsorted(docs, candidates)
+                    positions[positions == len(docs)] = 0
+                    hit = docs[positions] == candidates
+                    changed = candidates[hit]
+                    scores[changed] += query_weights[i] * weights[positions[hit]]
+                else:
+                    keep = seen[docs]
+                    changed = docs[keep]
+                    scores[changed] += query_weights[i] * weights[keep]
+                i += 1
+                best, threshold = self._update_top(scores, in_top, best, changed, k)
+
+            candidate_scores = scores[candidates]
+            top = np.lexsort((candidates, -candidate_scores))[:k]
+            return candidates[top], candidate_scores[top]
+        finally:
+            for docs in touched:
+                scores[docs] = 0.0
+                seen[docs] = False
+
+    @staticmethod
+    def _update_top(scores, in_top, best, changed, k):
+        """
+        Top-k resumes and k-th score after the scores of `changed` rose.
+        Scores only grow, so the new top k lie among the old top k and
+        the changed resumes; nothing else needs to be looked at.
+        """
+        in_top[best] = True
+        pool = np.concatenate([best, changed[~in_top[changed]]])
+        in_top[best] = False
+        if len(pool) > k:
+            pool = pool[np.argpartition(-scores[pool], k - 1)[:k]]
+        threshold = scores[pool].min() if len(pool) == k else -np.inf
+        return pool, threshold
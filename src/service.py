@@ -0,0 +1,457 @@
+"""
+HTTP scoring service with a warm in-memory index.
+
+    python -m src.service --port 8000
+
+    POST /rank  {"job_descriptions": ["..."], "k": 10, "category": "CHEF"}
+    POST /rank  {"job_descriptions": ["..."], "semantic_weight": 0.3}   (needs --dense)
+    GET  /health
+
+    python -m src.service --shards 4   (lexical top-k on 4 shard worker processes)
+
+Concurrent /rank requests are collected for a few milliseconds and scored
+together in one sparse matrix product, on a thread pool so the event loop
+keeps accepting connections.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from src.cache import QueryCache
+from src.dense import hybrid_top_k
+from src.instrumentation import count, timer
+from src.ranking import top_k_indices
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RankingService:
+    """
+    Scores job descriptions against a loaded corpus. Holds no per-request
+    state, so rank_batch can run on any thread.
+    """
+
+    def __init__(self, df, ranker, skill_matrix, preprocessor, extractor, dense_index=None, clusters=None,
+                 shard_pool=None, cache_entries=256):
+        """
+        Args:
+        - df: Corpus frame with ID, Category and Extracted_Skills, in index row order.
+        - ranker: Fitted ResumeRanker (categories attached for category filters).
+        - skill_matrix: CSR boolean resumes x skills matrix for df.
+        - dense_index: Optional DenseIndex enabling hybrid (semantic_weight) queries.
+        - clusters: Optional DuplicateClusters; only canonical resumes are
+          ranked (their rows should be excluded from the ranker's index)
+          and each candidate lists the IDs of its duplicates.
+        - shard_pool: Optional ShardPool over the same index; lexical
+          top-k is then computed by its worker processes (scatter-gather).
+        - cache_entries: Entry bound of each query cache; 0 disables caching
+          (every request is cleaned and scored from scratch).
+        """
+        self.ids = df['ID'].tolist()
+        self.categories = df['Category'].astype(str).tolist()
+        self.ranker = ranker
+        self.skill_matrix = skill_matrix
+        self.preprocessor = preprocessor
+        self.extractor = extractor
+        self.dense_index = dense_index
+        self.clusters = clusters
+        self.allowed = None if clusters is None else clusters.is_canonical
+        self.shard_pool = shard_pool
+        self.category_labels = set(self.categories)
+        # Repeated JDs skip cleaning, skill extraction and scoring
+        self.cache = QueryCache(ranker, preprocessor, extractor, max_entries=cache_entries)
+
+    def rank_batch(self, queries):
+        """
+        Ranks a batch of queries with one score_many call.
+
+        Args:
+        - queries: List of (job_description, k, category, semantic_weight) tuples.
+
+        Returns one list of candidate dicts per query, best first.
+        """
+        with timer('service.clean_jds'):
+            cleaned = [self.cache.clean_text(query[0]) for query in queries]
+        # Every uncached lexical JD in the batch is scored against the full index at once
+        lexical = [i for i, query in enumerate(queries) if not query[3]]
+        if self.shard_pool is None:
+            scores = dict(zip(lexical, self.cache.score_many([cleaned[i] for i in lexical])))
+        else:
+            shard_tops = self._shard_top_k(queries, cleaned, lexical)
+        count('service.queries', len(queries))
+
+        results = []
+        for i, (job_description, k, category, semantic_weight) in enumerate(queries):
+            if semantic_weight:
+                # Lexical and ANN candidates, rescored and fused
+                top_rows, top_scores = hybrid_top_k(
+                    self.ranker, self.dense_index, cleaned[i], k, semantic_weight, category, allowed=self.allowed)
+            elif self.shard_pool is not None:
+                top_rows, top_scores = shard_tops[i]
+            else:
+                rows = self.ranker.category_rows(category)
+                role_scores = scores[i]
+                if len(rows) < len(role_scores):
+                    role_scores = role_scores[rows]
+                if self.allowed is not None:
+                    role_scores = np.where(self.allowed[rows], role_scores, -np.inf)
+                top = top_k_indices(role_scores, k)
+                top_rows, top_scores = rows[top], role_scores[top]
+            jd_skills = self.cache.extract_skills(job_description)
+            jd_vector = self.extractor.skill_vector(jd_skills)
+            matched, missing = self.extractor.gap_analysis(self.skill_matrix, jd_vector, top_rows)
+            candidates = [
+                {
+                    'id': _json_value(self.ids[row]),
+                    'category': self.categories[row],
+                    'score': float(score),
+                    'matched_skills': matched[rank],
+                    'missing_skills': missing[rank],
+                }
+                for rank, (row, score) in enumerate(zip(top_rows, top_scores))
+            ]
+            if self.clusters is not None:
+                for candidate, row in zip(candidates, top_rows):
+                    candidate['duplicate_ids'] = [_json_value(self.ids[d]) for d in self.clusters.duplicates(row)]
+            results.append(candidates)
+        return results
+
+    def _shard_top_k(self, queries, cleaned, lexical):
+        # One scatter-gather per category in the batch, at its largest k
+        groups = {}
+        for i in lexical:
+            groups.setdefault(queries[i][2], []).append(i)
+        # Over-fetched by the number of excluded rows, so k remain after filtering
+        n_excluded = 0 if self.allowed is None else len(self.allowed) - int(self.allowed.sum())
+        tops = {}
+        for category, members in groups.items():
+            k = max(queries[i][1] for i in members) + n_excluded
+            jd_matrix = self.cache.jd_vectors([cleaned[i] for i in members])
+            for i, (rows, scores) in zip(members, self.shard_pool.coordinator.top_k_vectors(jd_matrix, k, category)):
+                if self.allowed is not None:
+                    keep = self.allowed[rows]
+                    rows, scores = rows[keep], scores[keep]
+                tops[i] = rows[:queries[i][1]], scores[:queries[i][1]]
+        return tops
+
+    def close(self):
+        if self.shard_pool is not None:
+            self.shard_pool.close()
+
+    def parse_query(self, payload):
+        """
+        Validates a /rank body and returns its (job_description, k, category,
+        semantic_weight) tuples.
+        """
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        job_descriptions = payload.get('job_descriptions')
+        if job_descriptions is None and 'job_description' in payload:
+            job_descriptions = [payload['job_description']]
+        if (not isinstance(job_descriptions, list) or not job_descriptions
+                or not all(isinstance(jd, str) for jd in job_descriptions)):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected 'job_descriptions': a non-empty list of strings")
+
+        k = payload.get('k', 10)
+        if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'k' must be a positive integer")
+
+        category = payload.get('category')
+        if category in (None, 'All'):
+            category = None
+        elif category not in self.category_labels:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown category: {category}")
+
+        semantic_weight = payload.get('semantic_weight', 0)
+        if (not isinstance(semantic_weight, (int, float)) or isinstance(semantic_weight, bool)
+                or not 0 <= semantic_weight <= 1):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'semantic_weight' must be a number between 0 and 1")
+        if semantic_weight and self.dense_index is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Dense retrieval is not enabled (start with --dense)")
+        return [(jd, k, category, float(semantic_weight)) for jd in job_descriptions]
+
+
+class MicroBatcher:
+    """
+    Collects queries arriving within `max_wait` seconds (up to
+    `max_batch` of them) and ranks them together in the executor.
+    """
+
+    def __init__(self, service, executor, max_batch=32, max_wait=0.005):
+        self.service = service
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._task = None
+        # In-flight scoring tasks (referenced so they are not garbage collected)
+        self._pending = set()
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, queries):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((queries, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            n_queries = len(batch[0][0])
+            while n_queries < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_queries += len(item[0])
+
+            # Scoring runs in the executor; the next batch can form meanwhile
+            task = asyncio.ensure_future(self._score(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _score(self, batch):
+        loop = asyncio.get_running_loop()
+        queries = [query for request_queries, _ in batch for query in request_queries]
+        count('service.batches')
+        try:
+            with timer('service.rank_batch'):
+                results = await loop.run_in_executor(self.executor, self.service.rank_batch, queries)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for request_queries, future in batch:
+            end = start + len(request_queries)
+            if not future.done():
+                future.set_result(results[start:end])
+            start = end
+
+
+async def _read_request(reader):
+    """
+    Parses one HTTP/1.1 request. Returns (method, path, headers, body),
+    or None when the client closed the connection.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+def _write_response(writer, status, payload, keep_alive):
+    body = json.dumps(payload).encode('utf-8')
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode('latin-1') + body)
+
+
+class ScoringServer:
+    """
+    Minimal asyncio HTTP/1.1 server (keep-alive, JSON only) in front of
+    a MicroBatcher.
+    """
+
+    def __init__(self, service, workers=4, max_batch=32, max_wait=0.005):
+        self.service = service
+        self.executor = ThreadPoolExecutor(workers)
+        self.batcher = MicroBatcher(service, self.executor, max_batch, max_wait)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, payload = await self._dispatch(method, path, body)
+                except HTTPError as e:
+                    keep_alive = False
+                    status, payload = e.status, {'error': str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    keep_alive = False
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+                _write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        path = path.split('?', 1)[0]
+        if path == '/health' and method == 'GET':
+            return HTTPStatus.OK, {
+                'status': 'ok',
+                'resumes': len(self.service.ids),
+                'cache': self.service.cache.stats(),
+            }
+        if path != '/rank':
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+        if method != 'POST':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST /rank")
+
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        queries = self.service.parse_query(payload)
+        start = time.perf_counter()
+        results = await self.batcher.submit(queries)
+        return HTTPStatus.OK, {
+            'results': [{'candidates': candidates} for candidates in results],
+            'took_ms': (time.perf_counter() - start) * 1000,
+        }
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        self.batcher.start()
+        print(f"Serving on http://{host}:{port} ({len(self.service.ids)} resumes)", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.executor.shutdown(wait=False)
+
+
+def load_service(dense=False, scorer='cosine', dedup_threshold=None, shards=None, cache_entries=256):
+    """
+    Loads the corpus and index once (see open_corpus), and the dense
+    index if requested (built on first use). scorer='bm25' serves BM25F
+    scores (see open_bm25) instead of TF-IDF cosine. With a
+    dedup_threshold, near-duplicate resumes are dropped from the index
+    and reported with their canonical resume instead (see open_dedup).
+    With `shards`, the index is cut into that many shards under
+    artifacts/shards (reused while current) and served by worker processes.
+    cache_entries=0 turns the query cache off.
+    """
+    from src.artifacts import open_bm25, open_corpus, open_dedup
+    from src.dense import DenseIndex
+    from src.preprocessing import Preprocessor
+    from src.skills import SkillExtractor
+
+    corpus, ranker = open_corpus()
+    df = corpus.frame(columns=['ID', 'Category'])
+    dense_index = DenseIndex.load_or_build(ranker) if dense else None
+    if scorer == 'bm25':
+        ranker = open_bm25(corpus)
+    clusters = None
+    if dedup_threshold is not None:
+        clusters = open_dedup(corpus, threshold=dedup_threshold)
+        ranker.exclude_rows(~clusters.is_canonical)
+        print(f"Collapsed {clusters.n_duplicates} near-duplicate resumes", file=sys.stderr)
+    shard_pool = None
+    if shards:
+        from src.sharding import ShardedIndex, ShardPool
+
+        shard_pool = ShardPool(ShardedIndex.load_or_build(ranker, shards), ranker.vectorizer)
+        print(f"Started {shards} shard workers", file=sys.stderr)
+    return RankingService(df, ranker, corpus.skill_matrix(), Preprocessor(fast=True), SkillExtractor(),
+                          dense_index, clusters, shard_pool, cache_entries)
+
+
+def _json_value(value):
+    # numpy scalars (e.g. int64 IDs) are not JSON serialisable
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve /rank over HTTP with a warm index.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=4, help='Scoring threads')
+    parser.add_argument('--max-batch', type=int, default=32, help='Most job descriptions scored together')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='How long to wait for more requests before scoring a batch')
+    parser.add_argument('--dense', action='store_true',
+                        help='Load (or build) the dense index so requests can set semantic_weight')
+    parser.add_argument('--scorer', choices=('cosine', 'bm25'), default='cosine',
+                        help='TF-IDF cosine, or BM25F with extracted skills as a boosted field')
+    parser.add_argument('--dedup-threshold', type=float,
+                        help='Collapse resumes whose shingle Jaccard similarity reaches this value (e.g. 0.8)')
+    parser.add_argument('--shards', type=int,
+                        help='Split the index into this many shards, each scored by its own worker process')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Disable the query cache, so repeated JDs are cleaned and scored again (for load tests)')
+    args = parser.parse_args()
+    if args.shards is not None and args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.dense and args.scorer != 'cosine':
+        parser.error("--dense can only be fused with cosine scores")
+    if args.dedup_threshold is not None and not 0 < args.dedup_threshold <= 1:
+        parser.error("--dedup-threshold must be in (0, 1]")
+
+    service = load_service(args.dense, args.scorer, args.dedup_threshold, args.shards,
+                           cache_entries=0 if args.no_cache else 256)
+    server = ScoringServer(service, args.workers, args.max_batch, args.max_wait_ms / 1000)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopping service...", file=sys.stderr)
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
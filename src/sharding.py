@@ -0,0 +1,510 @@
+"""
+Sharded index served by worker processes, queried scatter-gather.
+
+    python -m src.sharding build --shards 4
+    python -m src.sharding serve --shard 0 --host 0.0.0.0 --port 9100
+
+The index rows are split into contiguous shards that share one
+vocabulary/IDF. Each worker memory-maps one shard's CSR arrays and answers
+top-k requests over a socket; the coordinator vectorises the job
+descriptions once, sends the vectors to every shard and merges the
+per-shard top-k lists. Workers started by ShardPool listen on localhost,
+but the protocol is plain TCP, so shards can be served from other hosts.
+"""
+import argparse
+import copy
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.cache import index_version
+from src.instrumentation import count, timer
+from src.ranking import ResumeRanker, top_k_indices
+
+SHARD_DIR = 'artifacts/shards'
+SHARD_FORMAT_VERSION = 1
+
+# Message framing: header length, payload length
+_PREFIX = struct.Struct('!IQ')
+
+
+def send_message(sock, header, arrays=()):
+    """
+    Sends a JSON header followed by the raw bytes of numpy arrays (their
+    dtypes and shapes travel in the header).
+    """
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    header = dict(header, arrays=[(array.dtype.str, array.shape) for array in arrays])
+    encoded = json.dumps(header).encode('utf-8')
+    sock.sendall(_PREFIX.pack(len(encoded), sum(array.nbytes for array in arrays)) + encoded)
+    for array in arrays:
+        sock.sendall(memoryview(array).cast('B'))
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Connection closed by peer")
+        received += n
+    return buffer
+
+
+def recv_message(sock):
+    """
+    Receives one send_message() message as (header, arrays).
+    Raises ConnectionError when the peer has closed the connection.
+    """
+    header_size, payload_size = _PREFIX.unpack(_recv_exact(sock, _PREFIX.size))
+    header = json.loads(_recv_exact(sock, header_size).decode('utf-8'))
+    payload = _recv_exact(sock, payload_size)
+    arrays, offset = [], 0
+    for dtype, shape in header.pop('arrays'):
+        array = np.frombuffer(payload, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        offset += array.nbytes
+        arrays.append(array)
+    return header, arrays
+
+
+def _version_key(ranker):
+    # index_version() in a JSON-safe form, plus the feature mode and any
+    # scorer parameters (a BM25 index has the same shape as the cosine one)
+    fingerprint, shape, nnz = index_version(ranker)
+    params = {name: np.asarray(values).tolist() for name, values in ranker._index_params().items()}
+    return [ranker.features, fingerprint, [int(n) for n in shape], int(nnz), params]
+
+
+def _csr_arrays(matrix):
+    return [np.array(matrix.shape), matrix.indptr, matrix.indices, matrix.data]
+
+
+def _csr_from_arrays(shape, indptr, indices, data):
+    return sp.csr_matrix((data, indices, indptr), shape=tuple(shape))
+
+
+class ShardedIndex:
+    """
+    A fitted index written as contiguous row shards under one directory:
+    vocabulary.npz (shared vocabulary and IDF) and shard_<i>/ with the
+    CSR arrays (and categories) of each shard as .npy files, which
+    workers open memory-mapped.
+    """
+
+    def __init__(self, directory, offsets, n_features, version):
+        """
+        Args:
+        - offsets: First global row of every shard, plus the row count.
+        - n_features: Number of vectorizer columns.
+        - version: Feature mode, fingerprint, shape, nnz and scorer
+          parameters of the ranker the shards were cut from.
+        """
+        self.directory = directory
+        self.offsets = offsets
+        self.n_features = n_features
+        self.version = version
+
+    @property
+    def fingerprint(self):
+        return self.version[1]
+
+    @property
+    def n_shards(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def build(cls, ranker, n_shards=None, directory=SHARD_DIR):
+        """
+        Splits a fitted ranker's matrix into `n_shards` row shards of
+        about equal nnz (default: one per CPU) and writes them to `directory`.
+        """
+        if not ranker.is_fitted:
+            raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        matrix = ranker.resume_matrix
+        n_rows = matrix.shape[0]
+        n_shards = max(1, min(n_shards or os.cpu_count() or 1, n_rows))
+        # Cut where the cumulative nnz crosses each 1/n_shards step, so
+        # every worker does about the same work per query
+        targets = np.arange(1, n_shards) * matrix.nnz / n_shards
+        cuts = np.searchsorted(matrix.indptr, targets)
+        offsets = np.concatenate([[0], np.clip(cuts, 0, n_rows), [n_rows]]).astype(np.int64)
+        offsets = np.maximum.accumulate(offsets)
+
+        with timer('shards.build'):
+            for shard in range(n_shards):
+                start, end = offsets[shard], offsets[shard + 1]
+                block = matrix[start:end]
+                shard_dir = os.path.join(directory, f'shard_{shard}')
+                os.makedirs(shard_dir, exist_ok=True)
+                for name, values in (('indptr', block.indptr), ('indices', block.indices), ('data', block.data)):
+                    np.save(os.path.join(shard_dir, f'{name}.npy'), values)
+                categories_path = os.path.join(shard_dir, 'categories.npy')
+                if ranker.categories is not None:
+                    np.save(categories_path, ranker.categories[start:end])
+                elif os.path.exists(categories_path):
+                    os.remove(categories_path)
+
+            # The vectorizer alone: a copy of the ranker with no rows
+            header = copy.copy(ranker)
+            header.resume_matrix = matrix[:0]
+            header.categories = None
+            header.save(os.path.join(directory, 'vocabulary.npz'))
+
+        meta = {
+            'version': SHARD_FORMAT_VERSION,
+            'index_version': _version_key(ranker),
+            'n_features': int(matrix.shape[1]),
+            'offsets': offsets.tolist(),
+        }
+        # Written last, so a partially written directory is never loaded
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        count('shards.built', n_shards)
+        return cls.load(directory)
+
+    @classmethod
+    def load(cls, directory=SHARD_DIR, ranker=None):
+        """
+        Opens the shard set in `directory`. Raises FileNotFoundError if
+        there is none, ValueError if it was cut from a different index
+        than `ranker` (when given).
+        """
+        try:
+            with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise FileNotFoundError(f"No sharded index in {directory}")
+        if meta.get('version') != SHARD_FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format in {directory}")
+        if ranker is not None and meta['index_version'] != _version_key(ranker):
+            raise ValueError(f"Sharded index in {directory} does not match the current index")
+        return cls(directory, np.array(meta['offsets'], dtype=np.int64), meta['n_features'], meta['index_version'])
+
+    @classmethod
+    def load_or_build(cls, ranker, n_shards=None, directory=SHARD_DIR):
+        try:
+            index = cls.load(directory, ranker)
+            if n_shards is None or index.n_shards == n_shards:
+                return index
+        except (FileNotFoundError, ValueError):
+            pass
+        return cls.build(ranker, n_shards, directory)
+
+    def vectorizer(self):
+        """
+        The shared vectorizer (vocabulary and IDF) for a coordinator that
+        has no ranker of its own.
+        """
+        return ResumeRanker.load(os.path.join(self.directory, 'vocabulary.npz')).vectorizer
+
+    def worker(self, shard):
+        return ShardWorker(self.directory, shard)
+
+
+class ShardWorker:
+    """
+    One shard of a ShardedIndex: its CSR arrays are memory-mapped, so
+    workers on one host share them through the page cache.
+    """
+
+    def __init__(self, directory, shard):
+        index = ShardedIndex.load(directory)
+        if not 0 <= shard < index.n_shards:
+            raise ValueError(f"Shard {shard} not in 0..{index.n_shards - 1}")
+        shard_dir = os.path.join(directory, f'shard_{shard}')
+        self.shard = shard
+        self.start = int(index.offsets[shard])
+        self.n_rows = int(index.offsets[shard + 1] - self.start)
+        self.fingerprint = index.fingerprint
+        arrays = [np.load(os.path.join(shard_dir, f'{name}.npy'), mmap_mode='r')
+                  for name in ('data', 'indices', 'indptr')]
+        # The constructor keeps the memmaps as they are (no copy)
+        self.matrix = sp.csr_matrix(tuple(arrays), shape=(self.n_rows, index.n_features))
+        categories_path = os.path.join(shard_dir, 'categories.npy')
+        self.categories = np.load(categories_path) if os.path.exists(categories_path) else None
+        self._category_masks = {}
+
+    def info(self):
+        return {'shard': self.shard, 'start': self.start, 'n_rows': self.n_rows,
+                'n_features': self.matrix.shape[1], 'fingerprint': self.fingerprint}
+
+    def _category_mask(self, category):
+        if self.categories is None:
+            raise ValueError("No categories attached to this index")
+        mask = self._category_masks.get(category)
+        if mask is None:
+            mask = self.categories == category
+            self._category_masks[category] = mask
+        return mask
+
+    def top_k_vectors(self, jd_matrix, k, category=None):
+        """
+        Top-k rows of this shard for each transformed job description.
+
+        Returns (rows, scores, counts): global row numbers and scores of
+        every query's results concatenated, best first within a query,
+        and the number of results per query.
+        """
+        with timer('shard.score'):
+            # Only the small JD side changes format, as in ResumeRanker.score_vectors
+            scores = (self.matrix @ jd_matrix.T).T.toarray()
+            if category is not None:
+                scores[:, ~self._category_mask(category)] = -np.inf
+        with timer('shard.top_k'):
+            tops = [top_k_indices(row, k) for row in scores]
+        count('shard.queries', jd_matrix.shape[0])
+        rows = np.concatenate(tops or [np.zeros(0, dtype=np.intp)])
+        row_scores = np.concatenate([row[top] for row, top in zip(scores, tops)] or [np.zeros(0)])
+        return self.start + rows.astype(np.int64), row_scores, np.array([len(top) for top in tops], dtype=np.int64)
+
+    def handle(self, header, arrays):
+        """
+        Answers one request message with (header, arrays).
+        """
+        op = header.get('op')
+        if op == 'info':
+            return self.info(), []
+        if op == 'top_k':
+            rows, scores, counts = self.top_k_vectors(_csr_from_arrays(*arrays), header['k'], header.get('category'))
+            return {}, [rows, scores, counts]
+        raise ValueError(f"Unknown op: {op}")
+
+    def serve(self, host='127.0.0.1', port=0, ready=None):
+        """
+        Serves requests on (host, port) until the process is stopped.
+        `ready` (a Connection) is sent the bound port once listening.
+        """
+        worker = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                while True:
+                    try:
+                        header, arrays = recv_message(self.request)
+                    except ConnectionError:
+                        return
+                    try:
+                        reply = worker.handle(header, arrays)
+                    except Exception as e:
+                        # Reported to the coordinator instead of dropping the connection
+                        reply = {'error': f"{type(e).__name__}: {e}"}, []
+                    send_message(self.request, *reply)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+            server.daemon_threads = True
+            if ready is not None:
+                ready.send(server.server_address[1])
+            server.serve_forever()
+
+
+def _run_worker(directory, shard, host, port, parent):
+    # Process entry point of ShardPool workers. The pipe to the pool is
+    # watched so the worker also exits when the parent is killed
+    # without close()
+    def watch():
+        try:
+            parent.recv()
+        except (EOFError, OSError):
+            pass
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+    ShardWorker(directory, shard).serve(host, port, parent)
+
+
+class ShardCoordinator:
+    """
+    Fans job descriptions out to the shard workers and merges their
+    top-k lists. Same top_k / top_k_many interface as ResumeRanker.
+    Safe to share between threads (requests are serialised per pool).
+    """
+
+    def __init__(self, vectorizer, addresses, timeout=None):
+        """
+        Args:
+        - vectorizer: Shared vectorizer (ranker.vectorizer or ShardedIndex.vectorizer()).
+        - addresses: (host, port) of every shard worker, any order.
+        - timeout: Socket timeout in seconds (None waits indefinitely).
+        """
+        self.vectorizer = vectorizer
+        self._lock = threading.Lock()
+        self._connections = []
+        for address in addresses:
+            connection = socket.create_connection(tuple(address), timeout=timeout)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connections.append(connection)
+        shards = [header for header, _ in self._scatter({'op': 'info'})]
+        # Connections in row order, so merged lists keep equal scores ordered by row
+        order = np.argsort([shard['start'] for shard in shards], kind='stable')
+        self._connections = [self._connections[i] for i in order]
+        self.shards = [shards[i] for i in order]
+        fingerprints = {shard['fingerprint'] for shard in self.shards}
+        if len(fingerprints) > 1:
+            raise ValueError("Shard workers serve different indexes")
+        self.n_docs = sum(shard['n_rows'] for shard in self.shards)
+
+    def _scatter(self, header, arrays=()):
+        # Every shard gets the request before any reply is read, so the
+        # workers compute in parallel
+        with self._lock:
+            for connection in self._connections:
+                send_message(connection, header, arrays)
+            replies = [recv_message(connection) for connection in self._connections]
+        for reply, _ in replies:
+            if 'error' in reply:
+                raise RuntimeError(f"Shard worker failed: {reply['error']}")
+        return replies
+
+    def top_k_vectors(self, jd_matrix, k, category=None):
+        """
+        top_k_many for job descriptions that are already transformed.
+        """
+        if category == 'All':
+            category = None
+        jd_matrix = sp.csr_matrix(jd_matrix)
+        count('shards.queries', jd_matrix.shape[0])
+        with timer('shards.scatter_gather'):
+            replies = self._scatter({'op': 'top_k', 'k': int(k), 'category': category}, _csr_arrays(jd_matrix))
+
+        with timer('shards.merge'):
+            splits = [np.cumsum(counts)[:-1] for _, (_, _, counts) in replies]
+            per_shard = [(np.split(rows, split), np.split(scores, split))
+                         for ((_, (rows, scores, _)), split) in zip(replies, splits)]
+            results = []
+            for i in range(jd_matrix.shape[0]):
+                rows = np.concatenate([shard_rows[i] for shard_rows, _ in per_shard])
+                scores = np.concatenate([shard_scores[i] for _, shard_scores in per_shard])
+                # Resumes sharing no term with the JD (or outside the
+                # category) are dropped, as in ResumeRanker.top_k
+                positive = scores > 0
+                rows, scores = rows[positive], scores[positive]
+                top = top_k_indices(scores, k)
+                results.append((rows[top], scores[top]))
+        return results
+
+    def top_k_many(self, job_descriptions, k, category=None):
+        """
+        Top-k resumes over all shards for each preprocessed job
+        description; returns one (indices, scores) pair per description.
+        As in ResumeRanker.top_k, resumes scoring 0 are not returned.
+        """
+        with timer('shards.transform'):
+            jd_matrix = self.vectorizer.transform(list(job_descriptions))
+        return self.top_k_vectors(jd_matrix, k, category)
+
+    def top_k(self, job_description, k, category=None):
+        return self.top_k_many([job_description], k, category)[0]
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+
+
+class ShardPool:
+    """
+    One worker process per shard of a ShardedIndex on this host, plus a
+    coordinator connected to them. Use as a context manager or call close().
+    """
+
+    def __init__(self, index, vectorizer=None, host='127.0.0.1'):
+        """
+        Args:
+        - index: ShardedIndex to serve.
+        - vectorizer: Shared vectorizer (default: loaded from the index).
+        """
+        import multiprocessing
+
+        # Spawned (not forked), so no threads or locks of the parent are inherited
+        context = multiprocessing.get_context('spawn')
+        self.processes = []
+        self._pipes = []
+        addresses = []
+        try:
+            with timer('shards.start_workers'):
+                for shard in range(index.n_shards):
+                    pipe, child_pipe = context.Pipe()
+                    process = context.Process(target=_run_worker, args=(index.directory, shard, host, 0, child_pipe),
+                                              daemon=True)
+                    process.start()
+                    child_pipe.close()
+                    self.processes.append(process)
+                    self._pipes.append(pipe)
+                for shard, pipe in enumerate(self._pipes):
+                    try:
+                        addresses.append((host, pipe.recv()))
+                    except EOFError:
+                        raise RuntimeError(f"Shard worker {shard} exited during start-up")
+            self.coordinator = ShardCoordinator(vectorizer or index.vectorizer(), addresses)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        coordinator = getattr(self, 'coordinator', None)
+        if coordinator is not None:
+            coordinator.close()
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self.processes = []
+        self._pipes = []
+
+    def __enter__(self):
+        return self.coordinator
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or serve a sharded resume index.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='Cut the stored corpus index into shards')
+    build_parser.add_argument('--shards', type=int, help='Number of shards (default: CPU count)')
+    build_parser.add_argument('--directory', default=SHARD_DIR)
+    serve_parser = commands.add_parser('serve', help='Serve one shard over TCP')
+    serve_parser.add_argument('--shard', type=int, required=True)
+    serve_parser.add_argument('--directory', default=SHARD_DIR)
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=9100)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        from src.artifacts import load_compact_corpus
+
+        if args.shards is not None and args.shards < 1:
+            parser.error("--shards must be at least 1")
+        _, ranker = load_compact_corpus()
+        index = ShardedIndex.build(ranker, args.shards, args.directory)
+        print(f"Wrote {index.n_shards} shards of {index.offsets[-1]} resumes to {args.directory}")
+    else:
+        worker = ShardWorker(args.directory, args.shard)
+        print(f"Serving shard {args.shard} ({worker.n_rows} resumes) on {args.host}:{args.port}", file=sys.stderr)
+        try:
+            worker.serve(args.host, args.port)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
 
 import re
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.instrumentation import count, timer
 
 # A comprehensive list of skills for demonstration. 
 # In a real-world scenario, this would be more extensive or fetched from a skills database.
@@ -21,31 +27,237 @@ SOFT_SKILLS = {
 
 ALL_SKILLS = TECH_SKILLS.union(SOFT_SKILLS)
 
+def _is_word_char(ch):
+    # Same definition of a word character as the `\b` anchor in `re`
+    return ch.isalnum() or ch == '_'
+
+
+def _build_trie(skills):
+    trie = {}
+    for skill in skills:
+        node = trie
+        for ch in skill:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    return trie
+
+
+def _trie_to_regex(node):
+    """
+    Turns a character trie into a regex that matches the longest skill
+    starting at the current position. Sibling branches begin with
+    different characters, and the greedy `?` tries the longer branch
+    before stopping at a shorter skill.
+    """
+    branches = [
+        re.escape(ch) + _trie_to_regex(child)
+        for ch, child in sorted(node.items())
+        if ch != ''
+    ]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        return '(?:' + body + ')?'
+    return body
+
+
+class SkillMatcher:
+    """
+    Finds every skill of a list in a single pass over the text.
+
+    Matching is equivalent to running `re.search(r'\b' + re.escape(skill) + r'\b')`
+    for each skill: one compiled trie regex yields the longest skill at each
+    position, and shorter skills that are prefixes of it are checked from
+    the same position.
+    """
+
+    def __init__(self, skills):
+        self.skills = sorted({skill for skill in skills if skill})
+        self._pattern = re.compile('(?=(' + _trie_to_regex(_build_trie(self.skills)) + '))')
+
+        # For each skill, every skill that is a prefix of it (itself included)
+        skill_set = set(self.skills)
+        self._prefixes = {
+            skill: [skill[:i] for i in range(len(skill), 0, -1) if skill[:i] in skill_set]
+            for skill in self.skills
+        }
+
+    def finditer(self, text):
+        """
+        Yields (skill, start, end) for every whole-word skill occurrence
+        in the already lowercased text.
+        """
+        if not self.skills:
+            return
+        n = len(text)
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            before = start > 0 and _is_word_char(text[start - 1])
+            for skill in self._prefixes[match.group(1)]:
+                end = start + len(skill)
+                # `\b` on both sides of the skill
+                if before == _is_word_char(skill[0]):
+                    continue
+                after = end < n and _is_word_char(text[end])
+                if after == _is_word_char(skill[-1]):
+                    continue
+                yield skill, start, end
+
+    def find_all(self, text):
+        """
+        Returns a list of (skill, start, end) matches, ordered by position.
+        """
+        return list(self.finditer(text))
+
+    def count(self, text):
+        """
+        Returns a Counter of how many times each skill occurs.
+        """
+        return Counter(skill for skill, _, _ in self.finditer(text))
+
+
+def build_skill_matrix(skill_lists, vocabulary):
+    """
+    Encodes per-resume skill lists as a CSR boolean matrix
+    (resumes x skills). Column j is vocabulary[j]; unknown skills are ignored.
+    """
+    skill_ids = {skill: i for i, skill in enumerate(vocabulary)}
+    indptr = np.zeros(len(skill_lists) + 1, dtype=np.int64)
+    indices = []
+    for row, skills in enumerate(skill_lists):
+        indices.extend(sorted({skill_ids[s] for s in skills if s in skill_ids}))
+        indptr[row + 1] = len(indices)
+    indices = np.asarray(indices, dtype=np.int32)
+    data = np.ones(len(indices), dtype=bool)
+    return sp.csr_matrix((data, indices, indptr), shape=(len(skill_lists), len(vocabulary)))
+
+
+def skill_coverage(skill_matrix, jd_vectors):
+    """
+    Fraction of each JD's skills that each resume has.
+
+    Args:
+    - skill_matrix: CSR boolean matrix (resumes x skills).
+    - jd_vectors: Boolean array (skills,) or (roles x skills).
+
+    Returns an array shaped like the scores of ResumeRanker.score /
+    score_many: (resumes,) or (roles x resumes). JDs without any
+    recognised skill get a coverage of 0.
+    """
+    jd_vectors = np.asarray(jd_vectors, dtype=bool)
+    single = jd_vectors.ndim == 1
+    jd_matrix = np.atleast_2d(jd_vectors).astype(np.float32)
+
+    matched = (skill_matrix.astype(np.float32) @ jd_matrix.T).T
+    required = jd_matrix.sum(axis=1, keepdims=True)
+    coverage = np.divide(matched, required, out=np.zeros_like(matched), where=required > 0)
+    return coverage[0] if single else coverage
+
+
+def blend_scores(similarity, coverage, weight):
+    """
+    Mixes cosine similarity with skill coverage:
+    (1 - weight) * similarity + weight * coverage.
+    """
+    if not weight:
+        return similarity
+    return (1 - weight) * similarity + weight * coverage
+
+
+def has_all_skills(skill_matrix, required_vector):
+    """
+    Boolean mask of resumes that have every skill in required_vector
+    (a "must have X and Y" filter).
+    """
+    required_vector = np.asarray(required_vector, dtype=bool)
+    n_required = int(required_vector.sum())
+    if n_required == 0:
+        return np.ones(skill_matrix.shape[0], dtype=bool)
+    matched = skill_matrix[:, np.flatnonzero(required_vector)].sum(axis=1)
+    return np.asarray(matched).ravel() == n_required
+
+
 class SkillExtractor:
     def __init__(self, skills_list=None):
         self.skills = skills_list if skills_list else ALL_SKILLS
+        # Compiled once and reused for every document
+        self.matcher = SkillMatcher(self.skills)
+
+    @property
+    def vocabulary(self):
+        """
+        Sorted list of skill names; a skill's position is its integer ID.
+        """
+        return self.matcher.skills
 
     def extract_skills(self, text):
         """
         Extracts skills found in the given text based on pre-defined skill list.
+        Skills are matched as whole words/phrases (word boundaries on both sides).
         """
         if not text:
             return []
-        
-        found_skills = set()
-        text_lower = text.lower()
-        
-        # Simple extraction based on word boundaries
-        # This handles multi-word skills incorrectly if not careful, 
-        # but for simplicity we match exact phrases or words.
-        for skill in self.skills:
-            # Create regex pattern for whole word match
-            pattern = r'\b' + re.escape(skill) + r'\b'
-            if re.search(pattern, text_lower):
-                found_skills.add(skill)
-                
+
+        with timer('skills.extract'):
+            found_skills = {skill for skill, _, _ in self.matcher.finditer(text.lower())}
+        count('skills.docs')
+        count('skills.found', len(found_skills))
         return list(found_skills)
 
+    def find_skills(self, text):
+        """
+        Returns (skill, start, end) for every skill occurrence. Offsets
+        refer to the lowercased text, which has the same length as the
+        input for ASCII resumes.
+        """
+        if not text:
+            return []
+        return self.matcher.find_all(text.lower())
+
+    def skill_counts(self, text):
+        """
+        Returns a Counter mapping each found skill to its number of occurrences.
+        """
+        if not text:
+            return Counter()
+        return self.matcher.count(text.lower())
+
+    def skill_matrix(self, skill_lists):
+        """
+        CSR boolean matrix (resumes x skills) for lists of extracted skills.
+        """
+        return build_skill_matrix(skill_lists, self.vocabulary)
+
+    def skill_vector(self, skills):
+        """
+        Boolean vector over the skill vocabulary, e.g. for a JD's skills.
+        """
+        vector = np.zeros(len(self.vocabulary), dtype=bool)
+        positions = {skill: i for i, skill in enumerate(self.vocabulary)}
+        for skill in skills:
+            if skill in positions:
+                vector[positions[skill]] = True
+        return vector
+
+    def gap_analysis(self, skill_matrix, jd_vector, rows):
+        """
+        Matched and missing skills for the given resume rows, computed
+        with vectorised boolean ops against the JD skill vector.
+
+        Returns (matched, missing): two lists of skill-name lists, one per row.
+        """
+        vocabulary = self.vocabulary
+        with timer('skills.gap_analysis'):
+            candidate = skill_matrix[rows].toarray()
+            jd_vector = np.asarray(jd_vector, dtype=bool)
+            matched = candidate & jd_vector
+            missing = ~candidate & jd_vector
+            return (
+                [[vocabulary[j] for j in np.flatnonzero(row)] for row in matched],
+                [[vocabulary[j] for j in np.flatnonzero(row)] for row in missing],
+            )
+
     def extract_skills_from_job_description(self, jd_text):
         """
         Same as extract_skills, meant for JD.
@@ -0,0 +1,443 @@
+import hashlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.pipeline import preprocess_corpus
+from src.ranking import ResumeRanker, make_vectorizer
+
+
+def content_hash(text):
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+def _row_key(resume_id, digest):
+    # Per-document part of the store fingerprint (XORed in and out)
+    return int(hashlib.sha1(f"{resume_id}\0{digest}".encode('utf-8')).hexdigest(), 16)
+
+
+def _remap_columns(counts, column_map, n_columns):
+    """
+    Keeps the columns of `counts` with column_map >= 0, renumbered to
+    column_map, in one vectorised pass over the nonzeros.
+    """
+    mapped = column_map[counts.indices]
+    keep = mapped >= 0
+    # Kept entries before each row start give the new row boundaries
+    indptr = np.concatenate([[0], np.cumsum(keep)])[counts.indptr]
+    return sp.csr_matrix((counts.data[keep], mapped[keep], indptr), shape=(counts.shape[0], n_columns))
+
+
+class CorpusStore:
+    """
+    Incrementally maintained resume corpus keyed by resume ID.
+
+    Each document is cleaned, skill-extracted and tokenized once, when it is
+    added or its content changes. Raw term counts and document frequencies
+    are kept, so the TF-IDF index can be re-derived from them without
+    touching unchanged resumes (see ranker()).
+
+    The fingerprint, the max_features term selection and the selected
+    count columns are maintained incrementally, so a rebuild after adding
+    a few documents only tokenizes and hashes those documents. What is left
+    are vectorised passes over the stored counts: the IDF rescale (IDF
+    depends on every document) and, when the selected terms change, a
+    column remap.
+    """
+
+    def __init__(self, max_features=5000, workers=1):
+        """
+        Args:
+        - max_features: Vocabulary cap applied when building the ranker,
+          matching ResumeRanker's TfidfVectorizer.
+        - workers: Processes used to preprocess batches of new documents.
+        """
+        self.max_features = max_features
+        self.workers = workers
+        # Same tokenization (and stop words) as ResumeRanker
+        self._analyzer = make_vectorizer().build_analyzer()
+
+        self.vocabulary = {}
+        # Term of each vocabulary column
+        self._terms = []
+        self._doc_freq = np.zeros(0, dtype=np.int64)
+        self._term_totals = np.zeros(0, dtype=np.int64)
+
+        # Row-aligned document state; deleted rows are set to None
+        self._ids = []
+        self._hashes = []
+        self._categories = []
+        self._raw = []
+        self._cleaned = []
+        self._skills = []
+        self._row_terms = []
+        self._row_counts = []
+        self._rows = {}
+        # Rows deleted since the last compact()
+        self._deleted = set()
+
+        self._live_count = 0
+        # XOR of the live documents' _row_key values, and a key of the
+        # row order set by compact(order=...)
+        self._fingerprint = 0
+        self._order_key = 0
+        self._ranker = None
+        # Consolidated count matrix for rows [0, _counts_rows), extended on demand
+        self._counts = None
+        self._counts_rows = 0
+
+        # Current max_features selection: vocabulary columns in ranker
+        # column order, vocabulary column -> ranker column (-1 if cut), and
+        # an upper bound on the totals of the terms that were cut
+        self._kept = None
+        self._column_map = np.zeros(0, dtype=np.int64)
+        self._outside_max = 0
+        # Vocabulary columns whose totals changed since the last selection
+        self._touched = set()
+        # _counts restricted to the kept columns, for rows [0, _kept_rows)
+        self._kept_counts = None
+        self._kept_rows = 0
+
+    def __len__(self):
+        return self._live_count
+
+    def __contains__(self, resume_id):
+        return resume_id in self._rows
+
+    def add(self, resume_id, text, category=None):
+        """
+        Adds a new resume. Raises ValueError if the ID already exists.
+        """
+        if resume_id in self._rows:
+            raise ValueError(f"Resume {resume_id!r} already exists; use update()")
+        self.upsert_many([resume_id], [text], [category])
+
+    def update(self, resume_id, text, category=None):
+        """
+        Replaces a resume's text. Returns False (and does no work) if the
+        content is unchanged. Raises KeyError for unknown IDs.
+        """
+        if resume_id not in self._rows:
+            raise KeyError(resume_id)
+        return self.upsert_many([resume_id], [text], [category]) > 0
+
+    def delete(self, resume_id):
+        """
+        Removes a resume and its contribution to the document frequencies.
+        """
+        row = self._rows.pop(resume_id)
+        self._forget_row(row)
+
+    def upsert_many(self, resume_ids, texts, categories=None):
+        """
+        Adds or updates a batch of resumes. Only new IDs and IDs whose
+        content hash changed are preprocessed. An ID repeated within the
+        batch takes its last occurrence.
+
+        Returns the number of documents that were (re)processed.
+        """
+        if categories is None:
+            categories = [None] * len(resume_ids)
+        latest = {}
+        for resume_id, text, category in zip(resume_ids, texts, categories):
+            latest[resume_id] = (text, category)
+
+        changed = []
+        for resume_id, (text, category) in latest.items():
+            digest = content_hash(text)
+            row = self._rows.get(resume_id)
+            if row is not None:
+                if self._hashes[row] == digest:
+                    # Same content; only refresh metadata
+                    if category is not None:
+                        self._categories[row] = category
+                    continue
+                del self._rows[resume_id]
+                self._forget_row(row)
+            changed.append((resume_id, text, category, digest))
+
+        if not changed:
+            return 0
+
+        cleaned, skills = preprocess_corpus(
+            [text for _, text, _, _ in changed], workers=self.workers, progress=False
+        )
+        for (resume_id, text, category, digest), cleaned_text, found in zip(changed, cleaned, skills):
+            self._append_row(resume_id, text, category, digest, cleaned_text, found)
+
+        self._ranker = None
+        return len(changed)
+
+    def add_preprocessed(self, resume_ids, texts, cleaned, skills, categories=None):
+        """
+        Adds resumes whose cleaned text and skills are already known (e.g.
+        read back from a saved corpus) without preprocessing them. An
+        existing ID is replaced.
+        """
+        if categories is None:
+            categories = [None] * len(resume_ids)
+        for resume_id, text, cleaned_text, found, category in zip(resume_ids, texts, cleaned, skills, categories):
+            row = self._rows.pop(resume_id, None)
+            if row is not None:
+                self._forget_row(row)
+            self._append_row(resume_id, text, category, content_hash(text), cleaned_text, found)
+        self._ranker = None
+
+    def sync(self, resume_ids, texts, categories=None):
+        """
+        Makes the store hold exactly these resumes, in this row order:
+        new and changed ones are (re)processed, unlisted ones deleted.
+        Raises ValueError if an ID is listed twice.
+
+        Returns the number of documents that were (re)processed.
+        """
+        resume_ids = list(resume_ids)
+        listed = set(resume_ids)
+        if len(listed) != len(resume_ids):
+            raise ValueError("Resume IDs must be unique")
+        for resume_id in [resume_id for resume_id in self._rows if resume_id not in listed]:
+            self.delete(resume_id)
+        n_changed = self.upsert_many(resume_ids, texts, categories)
+        self.compact(order=resume_ids)
+        return n_changed
+
+    def _append_row(self, resume_id, text, category, digest, cleaned_text, skills):
+        counts = Counter(self._analyzer(cleaned_text))
+        for term in counts:
+            if term not in self.vocabulary:
+                self.vocabulary[term] = len(self.vocabulary)
+                self._terms.append(term)
+        self._grow_term_arrays(len(self.vocabulary))
+
+        terms = np.fromiter((self.vocabulary[t] for t in counts), dtype=np.int64, count=len(counts))
+        term_counts = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        # Sorted by column, so the count matrices keep sorted indices
+        by_column = np.argsort(terms)
+        terms, term_counts = terms[by_column], term_counts[by_column]
+        self._doc_freq[terms] += 1
+        self._term_totals[terms] += term_counts
+        self._touched.update(terms.tolist())
+        self._fingerprint ^= _row_key(resume_id, digest)
+
+        self._rows[resume_id] = len(self._ids)
+        self._ids.append(resume_id)
+        self._hashes.append(digest)
+        self._categories.append(category)
+        self._raw.append(text)
+        self._cleaned.append(cleaned_text)
+        self._skills.append(skills)
+        self._row_terms.append(terms)
+        self._row_counts.append(term_counts)
+        self._live_count += 1
+
+    def _forget_row(self, row):
+        terms = self._row_terms[row]
+        self._doc_freq[terms] -= 1
+        self._term_totals[terms] -= self._row_counts[row]
+        self._touched.update(terms.tolist())
+        self._fingerprint ^= _row_key(self._ids[row], self._hashes[row])
+        self._deleted.add(row)
+        for column in (self._ids, self._hashes, self._categories, self._raw,
+                       self._cleaned, self._skills, self._row_terms, self._row_counts):
+            column[row] = None
+        self._live_count -= 1
+        self._ranker = None
+
+    def _grow_term_arrays(self, size):
+        if size <= len(self._doc_freq):
+            return
+        # Amortised doubling so adding terms stays O(1) per term
+        capacity = max(size, 2 * len(self._doc_freq), 1024)
+        self._doc_freq = np.concatenate([self._doc_freq, np.zeros(capacity - len(self._doc_freq), dtype=np.int64)])
+        self._term_totals = np.concatenate([self._term_totals, np.zeros(capacity - len(self._term_totals), dtype=np.int64)])
+
+    def _live_rows(self):
+        rows = np.arange(len(self._ids))
+        if self._deleted:
+            rows = np.delete(rows, sorted(self._deleted))
+        return rows
+
+    def compact(self, order=None):
+        """
+        Drops deleted rows from the internal lists. Live documents keep
+        their row order, or take the order of the `order` IDs (every live
+        ID once).
+        """
+        if order is None:
+            live = self._live_rows()
+        else:
+            live = [self._rows[resume_id] for resume_id in order]
+            if len(live) != self._live_count or len(set(live)) != len(live):
+                raise ValueError("order must list every live resume ID once")
+            # Same documents in another order are another index
+            self._order_key = int(hashlib.sha1('\0'.join(map(str, order)).encode('utf-8')).hexdigest(), 16)
+            self._ranker = None
+        for name in ('_ids', '_hashes', '_categories', '_raw', '_cleaned',
+                     '_skills', '_row_terms', '_row_counts'):
+            values = getattr(self, name)
+            setattr(self, name, [values[row] for row in live])
+        self._rows = {resume_id: row for row, resume_id in enumerate(self._ids)}
+        self._deleted = set()
+        self._counts = None
+        self._counts_rows = 0
+        self._kept_counts = None
+        self._kept_rows = 0
+
+    def idf(self):
+        """
+        Smoothed IDF over the full vocabulary, computed from the stored
+        document frequencies (same formula as TfidfVectorizer).
+        """
+        n_docs = self._live_count
+        doc_freq = self._doc_freq[:len(self.vocabulary)]
+        return np.log((1 + n_docs) / (1 + doc_freq)) + 1
+
+    def ranker(self):
+        """
+        Returns a query-ready ResumeRanker over the live documents, in
+        the row order of frame(). Cached until the next add/update/delete.
+
+        Feature selection and IDF are recomputed from the stored counts,
+        so no document is re-tokenized: only rows added since the last
+        build are mapped to the selected columns (all rows if the
+        selection changed), then the counts are rescaled by the new IDF.
+        The result matches ResumeRanker.fit() on frame()['Cleaned_Resume']
+        up to column order and which equally frequent terms survive the
+        max_features cut. Its fingerprint identifies the store's content
+        (IDs and text) rather than hashing the cleaned text.
+        """
+        if self._ranker is not None:
+            return self._ranker
+
+        live = self._live_rows()
+        if not len(live):
+            raise ValueError("CorpusStore is empty")
+
+        reselected = self._select_terms()
+        counts = self._kept_count_matrix(reselected)
+        if len(live) < counts.shape[0]:
+            counts = counts[live]
+
+        from sklearn.preprocessing import normalize
+
+        idf = self.idf()[self._kept]
+        ranker = ResumeRanker()
+        ranker.vectorizer.vocabulary_ = {self._terms[column]: i for i, column in enumerate(self._kept.tolist())}
+        ranker.vectorizer.idf_ = idf
+        matrix = sp.csr_matrix((counts.data * idf[counts.indices], counts.indices, counts.indptr), shape=counts.shape)
+        ranker.resume_matrix = normalize(matrix, norm='l2', copy=False)
+        ranker.fingerprint = f"{self._fingerprint ^ self._order_key:040x}"
+        categories = [self._categories[row] for row in live]
+        if all(category is not None for category in categories):
+            ranker.set_categories(categories)
+        self._ranker = ranker
+        return ranker
+
+    def _select_terms(self):
+        """
+        Updates the max_features most frequent terms still in use from
+        the terms whose totals changed since the last call. The selection
+        is kept while no cut term is more frequent than a kept one (terms
+        already kept win ties); otherwise it is recomputed with one
+        partition of the totals, ties broken by term. Returns True if the
+        selection changed.
+        """
+        n_terms = len(self.vocabulary)
+        totals = self._term_totals[:n_terms]
+        touched = np.fromiter(self._touched, dtype=np.int64, count=len(self._touched))
+        self._touched = set()
+        # New terms start out cut
+        self._column_map = np.concatenate(
+            [self._column_map, np.full(n_terms - len(self._column_map), -1, dtype=np.int64)])
+
+        if self._kept is not None and len(self._kept):
+            if not len(touched):
+                return False
+            cut = touched[self._column_map[touched] < 0]
+            outside_max = max(self._outside_max, int(totals[cut].max()) if len(cut) else 0)
+            room = len(self._kept) < self.max_features
+            kept_min = totals[self._kept].min()
+            if 0 < kept_min and outside_max <= kept_min and not (room and outside_max > 0):
+                self._outside_max = outside_max
+                return False
+
+        in_use = np.flatnonzero(self._doc_freq[:n_terms] > 0)
+        if len(in_use) <= self.max_features:
+            kept = in_use
+        else:
+            in_use_totals = totals[in_use]
+            n_cut = len(in_use) - self.max_features
+            threshold = np.partition(in_use_totals, n_cut)[n_cut]
+            above = in_use[in_use_totals > threshold]
+            # Only the terms tied at the threshold are compared as strings
+            tied = sorted(in_use[in_use_totals == threshold].tolist(), key=self._terms.__getitem__)
+            kept = np.concatenate([above, np.array(tied[:self.max_features - len(above)], dtype=np.int64)])
+
+        # In vocabulary order, so remapping keeps row indices sorted
+        kept = np.sort(kept)
+        self._kept = kept
+        self._column_map = np.full(n_terms, -1, dtype=np.int64)
+        self._column_map[kept] = np.arange(len(kept))
+        outside = self._column_map < 0
+        self._outside_max = int(totals[outside].max()) if outside.any() else 0
+        return True
+
+    def _kept_count_matrix(self, reselected):
+        """
+        _count_matrix() restricted to the selected columns. Only rows added
+        since the last call are remapped, unless the selection changed.
+        """
+        counts = self._count_matrix()
+        if reselected or self._kept_counts is None:
+            self._kept_counts = _remap_columns(counts, self._column_map, len(self._kept))
+        elif self._kept_rows < counts.shape[0]:
+            block = _remap_columns(counts[self._kept_rows:], self._column_map, len(self._kept))
+            self._kept_counts = sp.vstack([self._kept_counts, block], format='csr')
+        self._kept_rows = counts.shape[0]
+        return self._kept_counts
+
+    def _count_matrix(self):
+        """
+        Raw term counts for every row, deleted rows included. Only rows
+        added since the last call are converted to CSR.
+        """
+        n_rows, n_terms = len(self._ids), len(self.vocabulary)
+        new_rows = range(self._counts_rows, n_rows)
+        row_terms = [self._row_terms[row] for row in new_rows]
+        row_counts = [self._row_counts[row] for row in new_rows]
+        # Deleted rows keep an empty slot so row numbers stay aligned
+        row_terms = [t if t is not None else np.zeros(0, dtype=np.int64) for t in row_terms]
+        row_counts = [c if c is not None else np.zeros(0, dtype=np.int64) for c in row_counts]
+
+        block = sp.csr_matrix(
+            (
+                np.concatenate(row_counts or [np.zeros(0)]).astype(np.float64),
+                np.concatenate(row_terms or [np.zeros(0, dtype=np.int64)]),
+                np.concatenate([[0], np.cumsum([len(t) for t in row_terms], dtype=np.int64)]),
+            ),
+            shape=(len(row_terms), n_terms),
+        )
+        if self._counts is None:
+            self._counts = block
+        else:
+            # Earlier rows never use columns added later, so widening is free
+            self._counts.resize((self._counts.shape[0], n_terms))
+            self._counts = sp.vstack([self._counts, block], format='csr')
+        self._counts_rows = n_rows
+        return self._counts
+
+    def frame(self):
+        """
+        Returns the live documents as an ID/Category/Resume_str/
+        Cleaned_Resume/Extracted_Skills frame, aligned with ranker() rows.
+        """
+        live = self._live_rows()
+        return pd.DataFrame({
+            'ID': [self._ids[row] for row in live],
+            'Category': [self._categories[row] for row in live],
+            'Resume_str': [self._raw[row] for row in live],
+            'Cleaned_Resume': [self._cleaned[row] for row in live],
+            'Extracted_Skills': [self._skills[row] for row in live],
+        })
@@ -0,0 +1,182 @@
+import csv
+import heapq
+import itertools
+import os
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from src.instrumentation import count, timer
+from src.pipeline import _init_worker, _process_one, preprocess_corpus
+from src.ranking import ResumeRanker, top_k_indices
+from src.skills import skill_coverage
+
+
+class RunningTopK:
+    """
+    The k best (score, item) pairs pushed so far, kept in a size-k
+    min-heap. Equal scores keep the item pushed first, matching the
+    tie-breaking of top_k_indices.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._pushed = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def threshold(self):
+        """
+        Score an item must beat to enter (-inf until k items are held).
+        """
+        if len(self._heap) < self.k:
+            return -np.inf
+        return self._heap[0][0]
+
+    def push(self, score, item):
+        # (score, -order) is unique, so items themselves are never compared
+        entry = (score, -self._pushed, item)
+        self._pushed += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def results(self):
+        """
+        Returns (score, item) pairs, best first.
+        """
+        ordered = sorted(self._heap, key=lambda entry: (-entry[0], -entry[1]))
+        return [(score, item) for score, _, item in ordered]
+
+
+def fit_on_first_chunk(chunks, workers=None):
+    """
+    Fits a ranker's vocabulary and IDF on the first chunk, for when no
+    pre-fitted index is available. Returns (ranker, chunks), where the
+    returned iterator still yields the first chunk.
+    """
+    chunks = iter(chunks)
+    first = next(chunks)
+    cleaned, _ = preprocess_corpus(first['Resume_str'], workers=workers, progress=False)
+    ranker = ResumeRanker().fit(cleaned)
+    return ranker, itertools.chain([first], chunks)
+
+
+def stream_rank(chunks, ranker, job_descriptions, k, preprocessor, extractor,
+                role_names=None, workers=None, scores_path=None, progress=True):
+    """
+    Ranks a stream of resume chunks against several job descriptions in
+    bounded memory.
+
+    Each chunk is preprocessed, projected onto the ranker's fitted
+    vocabulary and IDF, and scored against every JD at once. Only a
+    running top-k per JD is kept, so memory depends on the chunk size
+    and k, not on the corpus size.
+
+    Args:
+    - chunks: Iterable of ID/Category/Resume_str frames (see iter_resume_chunks).
+    - ranker: Fitted ResumeRanker providing the vocabulary and IDF.
+    - job_descriptions: Raw job description strings.
+    - k: Candidates kept per job description.
+    - role_names: Optional label per JD (defaults to Role 1, Role 2, ...).
+    - workers: Preprocessing processes (defaults to the CPU count).
+    - scores_path: Optional CSV that every resume's scores are appended
+      to as each chunk is processed.
+    - progress: Print a running count to stderr.
+
+    Returns a frame with Role, Rank, ID, Category, Similarity_Score,
+    Skill_Coverage, Extracted_Skills and Missing_Skills, best first per role.
+    """
+    if not ranker.is_fitted:
+        raise RuntimeError("ResumeRanker is not fitted. Call fit() or load() first.")
+
+    role_names = role_names or [f"Role {i + 1}" for i in range(len(job_descriptions))]
+    cleaned_jds = [preprocessor.clean_text(jd) for jd in job_descriptions]
+    jd_matrix = ranker.vectorizer.transform(cleaned_jds)
+    heaps = [RunningTopK(k) for _ in job_descriptions]
+
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if workers > 1:
+        # One pool for the whole stream; workers keep their Preprocessor
+        pool = Pool(workers, initializer=_init_worker, initargs=(True,))
+    else:
+        _init_worker(True)
+
+    scores_file = open(scores_path, 'w', newline='', encoding='utf-8') if scores_path else None
+    try:
+        writer = None
+        if scores_file:
+            writer = csv.writer(scores_file)
+            writer.writerow(['ID', 'Category'] + list(role_names))
+
+        done = 0
+        for chunk in chunks:
+            texts = [text if isinstance(text, str) else '' for text in chunk['Resume_str']]
+            ids = chunk['ID'].tolist()
+            categories = chunk['Category'].tolist()
+
+            with timer('stream.preprocess'):
+                if pool is not None:
+                    results = pool.map(_process_one, texts, chunksize=64)
+                else:
+                    results = [_process_one(text) for text in texts]
+
+            with timer('stream.score'):
+                chunk_matrix = ranker.vectorizer.transform([cleaned for cleaned, _ in results])
+                # (JDs x resumes in chunk); rows are L2-normalised, so this is the cosine
+                scores = (chunk_matrix @ jd_matrix.T).T.toarray()
+
+            with timer('stream.top_k'):
+                for heap, role_scores in zip(heaps, scores):
+                    for i in top_k_indices(role_scores, k):
+                        if role_scores[i] <= heap.threshold:
+                            break
+                        heap.push(float(role_scores[i]), (ids[i], categories[i], results[i][1]))
+
+            if writer:
+                with timer('stream.write_scores'):
+                    writer.writerows(
+                        [resume_id, category] + [f"{score:.6f}" for score in column]
+                        for resume_id, category, column in zip(ids, categories, scores.T)
+                    )
+                    scores_file.flush()
+
+            done += len(texts)
+            count('stream.docs', len(texts))
+            if progress:
+                sys.stderr.write(f"\rStreaming: {done} resumes scored")
+                sys.stderr.flush()
+        if progress:
+            sys.stderr.write("\n")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if scores_file:
+            scores_file.close()
+
+    frames = []
+    for role, job_description, heap in zip(role_names, job_descriptions, heaps):
+        top = heap.results()
+        skill_lists = [skills for _, (_, _, skills) in top]
+        skill_matrix = extractor.skill_matrix(skill_lists)
+        jd_vector = extractor.skill_vector(extractor.extract_skills(job_description))
+        _, missing = extractor.gap_analysis(skill_matrix, jd_vector, np.arange(len(top)))
+        frames.append(pd.DataFrame({
+            'Role': role,
+            'Rank': np.arange(1, len(top) + 1),
+            'ID': [resume_id for _, (resume_id, _, _) in top],
+            'Category': [category for _, (_, category, _) in top],
+            'Similarity_Score': [score for score, _ in top],
+            'Skill_Coverage': skill_coverage(skill_matrix, jd_vector),
+            'Extracted_Skills': skill_lists,
+            'Missing_Skills': missing,
+        }))
+    return pd.concat(frames, ignore_index=True)
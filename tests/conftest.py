@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from src.ingest import PDF_ROOT, extract_pdf_text, list_pdf_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session')
+def resume_sample():
+    """
+    Text of every 100th resume in the bundled PDF tree (25 resumes
+    across all categories).
+    """
+    pytest.importorskip('pypdf')
+    pdf_root = os.path.join(ROOT, PDF_ROOT)
+    if not os.path.isdir(pdf_root):
+        pytest.skip(f"{pdf_root} not found")
+    return [extract_pdf_text(path) for path, _, _ in list_pdf_corpus(pdf_root)[::100]]
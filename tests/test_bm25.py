@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.artifacts import TokenColumn, encode_tokens
+from src.bm25 import BM25Ranker
+from src.skills import build_skill_matrix
+
+SKILL_VOCABULARY = ['c++', 'machine learning', 'node.js', 'python', 'sql', 'the']
+
+
+def token_column(texts):
+    vocabulary, token_ids, offsets = encode_tokens(texts)
+    return TokenColumn(token_ids, offsets, vocabulary)
+
+
+def assert_same_index(ranker, reference):
+    assert ranker.vectorizer.vocabulary_ == reference.vectorizer.vocabulary_
+    np.testing.assert_array_equal(ranker.lengths, reference.lengths)
+    np.testing.assert_array_equal(ranker.vectorizer.idf_, reference.vectorizer.idf_)
+    assert (ranker.resume_matrix != reference.resume_matrix).nnz == 0
+    assert ranker.fingerprint == reference.fingerprint
+
+
+@pytest.mark.parametrize('fielded', [False, True])
+def test_fit_tokens_matches_fit(fielded):
+    rng = np.random.default_rng(0)
+    # More distinct terms than max_features, with many tied frequencies,
+    # plus stop words, one-letter tokens and empty tokens (double spaces)
+    words = [f"term{i}" for i in range(6000)] + ['the', 'a', 'x', 'sql', 'python', 'node']
+    texts = [' '.join(rng.choice(words, rng.integers(0, 60))) for _ in range(600)]
+    texts[:3] = ["python  sql", "", "the a x"]
+    skills = [sorted(set(rng.choice(SKILL_VOCABULARY, rng.integers(0, 4)))) for _ in texts]
+
+    reference = BM25Ranker().fit(texts, skills=skills if fielded else None)
+    skill_matrix = build_skill_matrix(skills, SKILL_VOCABULARY) if fielded else None
+    ranker = BM25Ranker().fit_tokens(token_column(texts), skill_matrix=skill_matrix,
+                                     skill_vocabulary=SKILL_VOCABULARY)
+    assert len(ranker.vectorizer.vocabulary_) == 5000
+    assert_same_index(ranker, reference)
+    if fielded:
+        np.testing.assert_array_equal(ranker.skill_lengths, reference.skill_lengths)
+    np.testing.assert_array_equal(ranker.score("python sql term7"), reference.score("python sql term7"))
+
+
+def test_fit_tokens_rejects_stop_words_only():
+    with pytest.raises(ValueError):
+        BM25Ranker().fit_tokens(token_column(["the a", "x"]))
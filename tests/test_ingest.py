@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import src.ingest
+from src.ingest import extract_pdf_text, load_pdf_corpus
+
+
+@pytest.fixture
+def pdf_tree(tmp_path, monkeypatch):
+    """
+    A one-resume PDF tree whose "extraction" returns the file's bytes,
+    recording every extracted path.
+    """
+    root = tmp_path / 'pdfs'
+    (root / 'CHEF').mkdir(parents=True)
+    pdf = root / 'CHEF' / '17.pdf'
+    pdf.write_text("head chef")
+    extracted = []
+
+    def fake_extract(path):
+        extracted.append(path)
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    monkeypatch.setattr(src.ingest, 'extract_pdf_text', fake_extract)
+    return root, pdf, extracted
+
+
+def test_text_cache_is_reused_and_replaced(pdf_tree, tmp_path):
+    root, pdf, extracted = pdf_tree
+    cache_dir = tmp_path / 'cache'
+
+    def load():
+        return load_pdf_corpus(str(root), str(cache_dir), workers=1, progress=False)
+
+    df = load()
+    assert df['ID'].tolist() == [17]
+    assert df['Resume_str'].tolist() == ["head chef"]
+    assert load()['Resume_str'].tolist() == ["head chef"]
+    assert len(extracted) == 1
+
+    # An edited file is extracted again and its old entry is replaced
+    pdf.write_text("executive head chef\nmenus")
+    os.utime(pdf, ns=(1_000_000_000, 1_000_000_000))
+    assert load()['Resume_str'].tolist() == ["executive head chef\nmenus"]
+    assert len(extracted) == 2
+    assert len(os.listdir(cache_dir)) == 1
+    assert load()['Resume_str'].tolist() == ["executive head chef\nmenus"]
+    assert len(extracted) == 2
+
+
+def test_unreadable_pdf_warns_on_stderr(tmp_path, capsys):
+    pytest.importorskip('pypdf')
+    broken = tmp_path / 'broken.pdf'
+    broken.write_bytes(b"not a pdf")
+    assert extract_pdf_text(str(broken)) == ""
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "could not read" in captured.err
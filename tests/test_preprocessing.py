@@ -0,0 +1,35 @@
+import pytest
+
+from src import resources
+from src.preprocessing import Preprocessor, check_fast_parity
+
+# Treebank contractions, apostrophes and digits the fast tokenizer must split like NLTK
+EDGE_TEXTS = [
+    "I cannot attend; we're gonna ship it, wanna help? Gotta go, lemme know, gimme five.",
+    "Don't, can't, won't and 'tis: O'Neil's team (C++/C#, .NET) shipped 3.5x faster!",
+    "Résumé — naïve café owner; e-mail: jane.doe@example.com, tel. +1-555-0100",
+    "   \n\t",
+    "",
+]
+
+
+@pytest.fixture(scope='module', autouse=True)
+def nltk_data():
+    try:
+        resources.ensure(*resources.required())
+    except LookupError as e:
+        pytest.skip(str(e))
+
+
+def test_fast_path_matches_nltk_on_resumes(resume_sample):
+    assert check_fast_parity(resume_sample) == []
+
+
+def test_fast_path_matches_nltk_on_edge_cases():
+    assert check_fast_parity(EDGE_TEXTS) == []
+
+
+def test_clean_text_drops_stop_words_and_punctuation():
+    cleaned = Preprocessor(fast=True).clean_text("The engineer, and the manager!")
+    assert cleaned == "engineer manager"
+    assert Preprocessor(fast=True).clean_text(None) == ""
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from src.ranking import ResumeRanker
+
+CLEANED = [
+    "python developer machine learning sql",
+    "head chef kitchen menu food safety",
+    "accountant financial statement budget excel",
+    "python data analyst sql excel",
+    "sous chef pastry kitchen",
+]
+CATEGORIES = ['INFORMATION-TECHNOLOGY', 'CHEF', 'ACCOUNTANT', 'INFORMATION-TECHNOLOGY', 'CHEF']
+JDS = ["python sql", "kitchen chef", "budget excel python", "astronaut"]
+
+
+def assert_same_results(many, singles):
+    assert len(many) == len(singles)
+    for (rows, scores), (expected_rows, expected_scores) in zip(many, singles):
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_allclose(scores, expected_scores)
+
+
+@pytest.mark.parametrize('categories', [None, CATEGORIES])
+def test_top_k_many_matches_top_k(categories):
+    ranker = ResumeRanker().fit(CLEANED, categories=categories)
+    many = ranker.top_k_many(JDS, k=4)
+    assert_same_results(many, [ranker.top_k(jd, k=4) for jd in JDS])
+    # Resumes sharing no term with the JD are not returned
+    assert len(many[-1][0]) == 0
+    assert all((scores > 0).all() for _, scores in many)
+
+
+def test_top_k_many_category_filter():
+    ranker = ResumeRanker().fit(CLEANED, categories=CATEGORIES)
+    many = ranker.top_k_many(JDS, k=4, category='CHEF')
+    assert_same_results(many, [ranker.top_k(jd, k=4, category='CHEF') for jd in JDS])
+    assert_same_results(ranker.top_k_many(JDS, k=4, category='All'), ranker.top_k_many(JDS, k=4))
+
+
+def test_category_without_categories_raises():
+    ranker = ResumeRanker().fit(CLEANED)
+    with pytest.raises(ValueError):
+        ranker.top_k_many(JDS, k=4, category='CHEF')
+    with pytest.raises(ValueError):
+        ranker.top_k(JDS[0], k=4, category='CHEF')
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from src.retrieval import InvertedIndex
+
+
+def brute_force_top_k(matrix, query, k, allowed=None):
+    scores = (matrix @ query.T).toarray().ravel()
+    if allowed is not None:
+        scores = np.where(allowed, scores, 0.0)
+    top = np.lexsort((np.arange(len(scores)), -scores))[:k]
+    return top[scores[top] > 0]
+
+
+@pytest.mark.parametrize('k', [1, 5, 50])
+def test_search_matches_brute_force(k):
+    rng = np.random.default_rng(k)
+    n_docs, n_terms = 2000, 300
+    matrix = sp.random(n_docs, n_terms, density=0.03, random_state=k, format='csr')
+    # Coarse weights so that many scores tie at the k-th place
+    matrix.data = np.ceil(matrix.data * 4)
+    matrix = normalize(matrix).tocsr()
+    index = InvertedIndex(matrix)
+    allowed = rng.random(n_docs) < 0.5
+
+    for _ in range(20):
+        terms = rng.choice(n_terms, rng.integers(1, 15), replace=False)
+        query = normalize(sp.csr_matrix(
+            (rng.random(len(terms)), (np.zeros(len(terms), dtype=int), terms)), shape=(1, n_terms)))
+        for mask in (None, allowed):
+            rows, scores = index.search(query, k, mask)
+            np.testing.assert_array_equal(rows, brute_force_top_k(matrix, query, k, mask))
+            np.testing.assert_allclose(scores, (matrix[rows] @ query.T).toarray().ravel())
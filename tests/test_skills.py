@@ -0,0 +1,69 @@
+import re
+
+import pytest
+
+from src.skills import ALL_SKILLS, SkillExtractor, SkillMatcher
+
+# Symbols and overlapping prefixes: c / c# / c++, java / javascript,
+# node / node.js, .net, power / power bi, machine / machine learning
+EDGE_SKILLS = ALL_SKILLS | {'c', 'c#', '.net', 'asp.net', 'java', 'node', 'power', 'machine', 'data'}
+
+EDGE_TEXTS = [
+    "C++ developer; also c#, C and .NET (asp.net core).",
+    "Knows c++/c# and c++11, wrote c#-based tools, and 'c' bindings",
+    "java, javascript and javascripting; node.js and node . js",
+    "Used .net, vb.net, .network and the .NET framework",
+    "Power BI dashboards, power bidding, powerbi and power  bi",
+    "machine learning engineer, machine-learning, machine learnings",
+    "data analysis of big-data analysis_data",
+    "",
+]
+
+
+def regex_skills(skills, text):
+    # The per-skill loop SkillMatcher replaces
+    text = text.lower()
+    return {skill for skill in skills if re.search(r'\b' + re.escape(skill) + r'\b', text)}
+
+
+def regex_matches(skills, text):
+    text = text.lower()
+    return sorted(
+        (match.start(), match.end(), skill)
+        for skill in skills
+        for match in re.finditer(r'\b' + re.escape(skill) + r'\b', text)
+    )
+
+
+def matcher_matches(matcher, text):
+    return sorted((start, end, skill) for skill, start, end in matcher.finditer(text.lower()))
+
+
+@pytest.mark.parametrize('text', EDGE_TEXTS)
+def test_matcher_agrees_with_regex_on_edge_cases(text):
+    matcher = SkillMatcher(EDGE_SKILLS)
+    assert {skill for skill, _, _ in matcher.finditer(text.lower())} == regex_skills(EDGE_SKILLS, text)
+    assert matcher_matches(matcher, text) == regex_matches(EDGE_SKILLS, text)
+
+
+def test_symbol_skills_follow_word_boundaries():
+    matcher = SkillMatcher(EDGE_SKILLS)
+
+    def found(text):
+        return {skill for skill, _, _ in matcher.finditer(text)}
+
+    # As with `\b` in the regex loop, a skill that starts or ends with a
+    # symbol needs a word character on that side
+    assert found("c++, c# and .net") == regex_skills(EDGE_SKILLS, "c++, c# and .net") == {'c'}
+    assert found("c++11 and c#x") == {'c', 'c++', 'c#'}
+    assert found("vb.net") == {'.net'}
+    assert found("javascript") == {'javascript'}
+    assert found("power bi") == {'power', 'power bi'}
+
+
+def test_extractor_agrees_with_regex_on_resumes(resume_sample):
+    extractor = SkillExtractor()
+    matcher = SkillMatcher(EDGE_SKILLS)
+    for text in resume_sample:
+        assert set(extractor.extract_skills(text)) == regex_skills(extractor.skills, text)
+        assert matcher_matches(matcher, text) == regex_matches(EDGE_SKILLS, text)
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.store
+from src.artifacts import load_corpus, load_or_build_corpus
+from src.ranking import ResumeRanker
+from src.store import CorpusStore
+
+RESUMES = {
+    101: "Python developer building machine learning pipelines with SQL and AWS",
+    102: "Head chef managing a busy kitchen, menus and food safety",
+    103: "Accountant preparing financial statements and budgets in Excel",
+}
+CATEGORIES = ['INFORMATION-TECHNOLOGY', 'CHEF', 'ACCOUNTANT']
+QUERY = "python sql kitchen excel budget"
+
+
+def make_store(**kwargs):
+    store = CorpusStore(**kwargs)
+    store.upsert_many(list(RESUMES), list(RESUMES.values()), CATEGORIES)
+    return store
+
+
+def assert_matches_fit(store):
+    # Same vocabulary and scores as fitting a ranker on the live documents
+    frame = store.frame()
+    reference = ResumeRanker()
+    reference.vectorizer.max_features = store.max_features
+    reference.fit(frame['Cleaned_Resume'])
+    ranker = store.ranker()
+    assert ranker.resume_matrix.shape[0] == len(frame) == len(store)
+    assert set(ranker.vectorizer.vocabulary_) == set(reference.vectorizer.vocabulary_)
+    np.testing.assert_allclose(ranker.score(QUERY), reference.score(QUERY))
+
+
+def test_insert():
+    store = make_store()
+    assert len(store) == 3
+    assert 102 in store
+    assert store.frame()['ID'].tolist() == list(RESUMES)
+    assert_matches_fit(store)
+    with pytest.raises(ValueError):
+        store.add(101, "Another resume")
+
+
+def test_update_reprocesses_changed_resumes_only():
+    store = make_store()
+    fingerprint = store.ranker().fingerprint
+    assert store.upsert_many(list(RESUMES), list(RESUMES.values())) == 0
+    assert not store.update(101, RESUMES[101])
+    assert store.ranker().fingerprint == fingerprint
+
+    assert store.update(101, "Java engineer writing Spring microservices")
+    frame = store.frame()
+    assert len(store) == 3
+    assert frame.loc[frame['ID'] == 101, 'Resume_str'].item().startswith("Java")
+    assert store.ranker().fingerprint != fingerprint
+    assert_matches_fit(store)
+    with pytest.raises(KeyError):
+        store.update(999, "Unknown resume")
+
+
+def test_delete():
+    store = make_store()
+    store.delete(102)
+    assert len(store) == 2
+    assert 102 not in store
+    assert store.frame()['ID'].tolist() == [101, 103]
+    assert_matches_fit(store)
+
+    store.compact()
+    assert store.frame()['ID'].tolist() == [101, 103]
+    assert_matches_fit(store)
+
+
+def test_repeated_id_in_one_batch_keeps_last_occurrence():
+    store = CorpusStore()
+    processed = store.upsert_many([7, 8, 7], ["Python developer", "Head chef", "Senior accountant"])
+    assert processed == 2
+    assert len(store) == 2
+    frame = store.frame()
+    assert frame['ID'].tolist() == [7, 8]
+    assert frame['Resume_str'].tolist() == ["Senior accountant", "Head chef"]
+    assert store.ranker().resume_matrix.shape[0] == 2
+    assert_matches_fit(store)
+
+
+def test_rebuild_after_vocabulary_changes():
+    store = CorpusStore(max_features=3)
+    store.upsert_many([1, 2], ["alpha alpha alpha beta beta gamma", "alpha alpha beta gamma delta"])
+    assert set(store.ranker().vectorizer.vocabulary_) == {'alpha', 'beta', 'gamma'}
+    assert_matches_fit(store)
+
+    # A new term overtakes the kept ones and must enter the selection
+    store.upsert_many([3], ["omega omega omega omega omega omega epsilon"])
+    assert set(store.ranker().vectorizer.vocabulary_) == {'alpha', 'omega', 'beta'}
+    assert_matches_fit(store)
+
+    # Deleting its only document drops it again
+    store.delete(3)
+    assert set(store.ranker().vectorizer.vocabulary_) == {'alpha', 'beta', 'gamma'}
+    assert_matches_fit(store)
+
+
+def test_sync_sets_membership_and_row_order():
+    store = make_store()
+    processed = store.sync([103, 104, 101], [RESUMES[103], "Registered nurse in oncology", RESUMES[101]])
+    assert processed == 1
+    assert store.frame()['ID'].tolist() == [103, 104, 101]
+    assert_matches_fit(store)
+
+    fingerprint = store.ranker().fingerprint
+    store.sync([101, 103, 104], [RESUMES[101], RESUMES[103], "Registered nurse in oncology"])
+    assert store.frame()['ID'].tolist() == [101, 103, 104]
+    assert store.ranker().fingerprint != fingerprint
+    with pytest.raises(ValueError):
+        store.sync([101, 101], [RESUMES[101], RESUMES[101]])
+
+
+def test_load_or_build_corpus_reuses_stored_resumes(tmp_path, monkeypatch):
+    raw = pd.DataFrame({'ID': list(RESUMES), 'Category': CATEGORIES, 'Resume_str': list(RESUMES.values())})
+    load_or_build_corpus(raw, str(tmp_path), workers=1)
+
+    preprocessed = []
+    preprocess_corpus = src.store.preprocess_corpus
+
+    def recording_preprocess(texts, **kwargs):
+        preprocessed.extend(texts)
+        return preprocess_corpus(texts, **kwargs)
+
+    monkeypatch.setattr(src.store, 'preprocess_corpus', recording_preprocess)
+    changed = pd.concat([
+        raw.iloc[[2, 0]],
+        pd.DataFrame({'ID': [104], 'Category': ['HEALTHCARE'], 'Resume_str': ["Registered nurse in oncology"]}),
+    ])
+    df, ranker = load_or_build_corpus(changed, str(tmp_path), workers=1)
+    assert preprocessed == ["Registered nurse in oncology"]
+    assert df['ID'].tolist() == [103, 101, 104]
+    assert ranker.resume_matrix.shape[0] == 3
+    assert ranker.categories.tolist() == ['ACCOUNTANT', 'INFORMATION-TECHNOLOGY', 'HEALTHCARE']
+
+    stored, saved = load_corpus(str(tmp_path), columns=['ID', 'Cleaned_Resume'])
+    assert stored['ID'].tolist() == [103, 101, 104]
+    assert saved.fingerprint == ranker.fingerprint
+    reference = ResumeRanker().fit(stored['Cleaned_Resume'])
+    np.testing.assert_allclose(ranker.score(QUERY), reference.score(QUERY))